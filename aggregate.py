@@ -0,0 +1,124 @@
+"""
+Windowed aggregation of sensor measurements.
+
+Instead of publishing every sample, the samples are aggregated over a time window
+and single message with minimum/maximum/mean/last value of each metric is published
+at the end of the window. The memory used does not depend on the number of samples.
+"""
+
+import time
+
+try:
+    from typing import Dict
+except ImportError:
+    pass
+
+
+# pylint: disable=too-few-public-methods
+class Metric:
+    """
+    Running statistics of single metric.
+    """
+
+    def __init__(self, value) -> None:
+        self.count = 1
+        self.minimum = value
+        self.maximum = value
+        self.total = value
+        self.last = value
+
+    def add(self, value) -> None:
+        """
+        Account for new sample.
+        """
+        self.count += 1
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        self.total += value
+        self.last = value
+
+    @property
+    def mean(self) -> float:
+        """
+        Mean value of the samples.
+        """
+        return self.total / self.count
+
+
+def _format(value) -> str:
+    if isinstance(value, int):
+        return f"{value}"
+    return f"{value:.1f}"
+
+
+class Aggregator:
+    """
+    Aggregates samples of multiple metrics within time window.
+    """
+
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Metric] = {}
+        self.samples = 0
+        self.start = time.monotonic()
+
+    def reset(self) -> None:
+        """
+        Start new window.
+        """
+        self.metrics = {}
+        self.samples = 0
+        self.start = time.monotonic()
+
+    def elapsed(self) -> float:
+        """
+        Return number of seconds since the start of the window.
+        """
+        return time.monotonic() - self.start
+
+    def add(self, name: str, value) -> None:
+        """
+        Add sample of given metric. None values are ignored.
+        """
+        if value is None:
+            return
+
+        metric = self.metrics.get(name)
+        if metric is None:
+            self.metrics[name] = Metric(value)
+        else:
+            metric.add(value)
+
+    def add_measurements(self, humidity, temperature, co2_ppm, lux) -> None:
+        """
+        Add the values as returned from Sensors.get_measurements().
+        """
+        self.samples += 1
+        self.add("temperature", temperature)
+        self.add("humidity", humidity)
+        self.add("co2_ppm", co2_ppm)
+        self.add("lux", lux)
+
+    def get_dict(self, native: bool = False) -> Dict:
+        """
+        Return dictionary with the aggregated values.
+        The last value of each metric is stored under the metric name
+        so that the message is compatible with the non-aggregated one.
+        The values are formatted as strings unless native is True.
+        """
+        data = {}
+        for name, metric in self.metrics.items():
+            if native:
+                data[name] = metric.last
+                data[f"{name}_min"] = metric.minimum
+                data[f"{name}_max"] = metric.maximum
+                data[f"{name}_mean"] = metric.mean
+            else:
+                data[name] = _format(metric.last)
+                data[f"{name}_min"] = _format(metric.minimum)
+                data[f"{name}_max"] = _format(metric.maximum)
+                data[f"{name}_mean"] = f"{metric.mean:.1f}"
+
+        if data:
+            data["samples"] = self.samples if native else f"{self.samples}"
+
+        return data
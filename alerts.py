@@ -0,0 +1,125 @@
+"""
+Event driven wakes from deep sleep.
+
+Before entering deep sleep, the sensors with alert output are programmed
+with a window around the current reading and a pin alarm is armed on the board pin
+connected to their alert lines. The node then wakes only when a value leaves the window,
+or when the long backstop time alarm fires.
+
+The supported alert sources are the TMP117 (ALERT pin, window mode) and the MAX17048
+(ALRT pin, battery voltage window). Both alert outputs are open drain, active low,
+so they can share single board pin. The VEML7700 has no interrupt pin so it cannot wake the node.
+The sensors have to stay powered during the deep sleep.
+"""
+
+try:
+    from adafruit_tmp117 import AlertMode
+except ImportError:
+    pass
+
+import adafruit_logging as logging
+
+# pylint: disable=import-error
+try:
+    import alarm
+    import board
+    import digitalio
+except ImportError:
+    pass  # for testing
+
+# Window of the battery voltage in volts. The resolution of the MAX17048 voltage alert is 20 mV.
+BATTERY_VOLTAGE_DELTA = 0.1
+# Range of the MAX17048 voltage alert thresholds in volts.
+BATTERY_VOLTAGE_MAX = 5.1
+
+DEFAULT_TEMPERATURE_DELTA = 1.0
+DEFAULT_BACKSTOP_DURATION = 3600
+
+
+def arm_temperature_alert(tmp117, delta: float) -> None:
+    """
+    Program the TMP117 to assert the alert when the temperature leaves
+    the window of given width (in degrees of Celsius) around the current temperature.
+    """
+    temperature = tmp117.temperature
+    tmp117.low_limit = temperature - delta
+    tmp117.high_limit = temperature + delta
+    tmp117.alert_mode = AlertMode.WINDOW  # pylint: disable=no-member
+    # Reading the status clears the alert flags and hence deasserts the alert pin.
+    _ = tmp117.alert_status
+    logging.getLogger("").debug(
+        f"Temperature alert window: {tmp117.low_limit} - {tmp117.high_limit}"
+    )
+
+
+def arm_battery_alert(battery_monitor, delta: float) -> None:
+    """
+    Program the MAX17048 to assert the alert when the battery voltage leaves
+    the window of given width (in volts) around the current voltage.
+    The low state of charge alert stays as configured.
+    """
+    voltage = battery_monitor.cell_voltage
+    battery_monitor.voltage_alert_min = max(0.0, voltage - delta)
+    battery_monitor.voltage_alert_max = min(BATTERY_VOLTAGE_MAX, voltage + delta)
+    battery_monitor.voltage_high_alert = False
+    battery_monitor.voltage_low_alert = False
+    battery_monitor.SOC_change_alert = False
+    battery_monitor.active_alert = False
+    logging.getLogger("").debug(
+        f"Battery voltage alert window: {battery_monitor.voltage_alert_min} - "
+        f"{battery_monitor.voltage_alert_max}"
+    )
+
+
+def alert_asserted(pin) -> bool:
+    """
+    Return True if the (active low) alert line on given pin is asserted.
+    """
+    with digitalio.DigitalInOut(pin) as line:
+        line.switch_to_input(pull=digitalio.Pull.UP)
+        return not line.value
+
+
+def arm_alerts(pin_name: str, tmp117, battery_monitor, temperature_delta: float):
+    """
+    Program the alert windows of the available sensors and return pin alarm
+    for the board pin with given name, or None if the event driven wake cannot be used.
+    """
+    logger = logging.getLogger("")
+
+    armed = False
+    try:
+        if tmp117:
+            arm_temperature_alert(tmp117, temperature_delta)
+            armed = True
+        if battery_monitor:
+            arm_battery_alert(battery_monitor, BATTERY_VOLTAGE_DELTA)
+            armed = True
+    except (OSError, RuntimeError) as exc:
+        logger.warning(f"Failed to program the alerts: {exc}")
+        return None
+
+    if not armed:
+        logger.warning("No sensor with alert output, cannot use event driven wake")
+        return None
+
+    try:
+        pin = getattr(board, pin_name)
+        # Asserted line would wake the node immediately, over and over.
+        if alert_asserted(pin):
+            logger.warning(
+                f"Alert line on {pin_name} is asserted, not arming pin alarm"
+            )
+            return None
+
+        return alarm.pin.PinAlarm(pin, value=False, pull=True)
+    except (AttributeError, ValueError) as exc:
+        logger.warning(f"Cannot use alert pin {pin_name}: {exc}")
+        return None
+
+
+def woken_by_alert() -> bool:
+    """
+    Return True if the wake from deep sleep was caused by the pin alarm.
+    """
+    return isinstance(alarm.wake_alarm, alarm.pin.PinAlarm)
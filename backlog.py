@@ -0,0 +1,221 @@
+"""
+Store-and-forward backlog of measurements kept in a ring file on the filesystem.
+
+The file consists of fixed size records. Each record carries a sequence number
+which determines its position in the file, so there is no header that would have
+to be rewritten on every change and the writes are spread evenly across the file.
+The sequence number of the last written record and of the last flushed record
+is kept in sleep memory. Should the sleep memory be lost, the last written sequence
+number is recovered by scanning the file and the records are flushed again
+(i.e. the delivery is at least once).
+
+The filesystem has to be remounted as writable by CircuitPython for each write,
+which is not possible when the filesystem is visible via USB.
+"""
+
+import math
+import os
+import struct
+import time
+
+import adafruit_logging as logging
+
+try:
+    import storage
+except ImportError:
+    pass  # for testing
+
+import sleepmem
+
+BACKLOG_FILE = "/backlog.bin"
+
+# sequence number, timestamp, humidity, temperature, CO2, battery level, lux
+RECORD_FMT = ">IIffIff"
+RECORD_SIZE = struct.calcsize(RECORD_FMT)
+
+# Number of records read at once when flushing.
+READ_BATCH = 8
+
+
+class FilesystemWritable:
+    """
+    Context manager to make the root filesystem writable by CircuitPython
+    and writable by the USB host again on exit.
+    """
+
+    def __enter__(self):
+        try:
+            storage.remount("/", False)  # writeable by CircuitPython
+        except NameError:
+            pass  # for testing
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        try:
+            storage.remount("/", True)  # writeable by USB host
+        except NameError:
+            pass  # for testing
+
+
+def _float_or_nan(value) -> float:
+    if value is None:
+        return float("nan")
+    return value
+
+
+def _nan_to_none(value):
+    if math.isnan(value):
+        return None
+    return value
+
+
+class Backlog:
+    """
+    Bounded backlog of timestamped measurements.
+    """
+
+    def __init__(self, path: str, capacity: int) -> None:
+        self.path = path
+        self.capacity = capacity
+        self._record = bytearray(RECORD_SIZE)
+        self._buffer = bytearray(RECORD_SIZE * READ_BATCH)
+        self._view = memoryview(self._buffer)
+
+        if self._file_size() != capacity * RECORD_SIZE:
+            # The file will be (re)created on next append.
+            sleepmem.store(sleepmem.BACKLOG_SEQ, 0)
+            sleepmem.store(sleepmem.BACKLOG_FLUSHED, 0)
+        elif sleepmem.load(sleepmem.BACKLOG_SEQ) == 0:
+            self._recover()
+
+    def _file_size(self) -> int:
+        try:
+            return os.stat(self.path)[6]
+        except OSError:
+            return -1
+
+    def _offset(self, seq: int) -> int:
+        return ((seq - 1) % self.capacity) * RECORD_SIZE
+
+    def _recover(self) -> None:
+        """
+        Find the last written sequence number by scanning the file.
+        """
+        last_seq = 0
+        with open(self.path, "rb") as file_obj:
+            while True:
+                size = file_obj.readinto(self._view)
+                if not size:
+                    break
+                for offset in range(0, size - size % RECORD_SIZE, RECORD_SIZE):
+                    seq = struct.unpack_from(">I", self._view, offset)[0]
+                    last_seq = max(last_seq, seq)
+
+        sleepmem.store(sleepmem.BACKLOG_SEQ, last_seq)
+        logging.getLogger("").info(f"Recovered backlog sequence number {last_seq}")
+
+    def _create(self) -> None:
+        with open(self.path, "wb") as file_obj:
+            for _ in range(self.capacity):
+                file_obj.write(bytes(RECORD_SIZE))
+
+    def pending(self) -> int:
+        """
+        Return the number of records that were not flushed yet.
+        """
+        seq = sleepmem.load(sleepmem.BACKLOG_SEQ)
+        flushed = sleepmem.load(sleepmem.BACKLOG_FLUSHED)
+        return seq - max(flushed, seq - self.capacity)
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def append(
+        self, humidity, temperature, co2_ppm, battery_level, lux, timestamp=None
+    ) -> bool:
+        """
+        Append measurement to the backlog, overwriting the oldest record if full.
+        Return True on success.
+        """
+        logger = logging.getLogger("")
+
+        if timestamp is None:
+            timestamp = int(time.time())
+        if co2_ppm is None:
+            co2_ppm = 0
+
+        seq = sleepmem.load(sleepmem.BACKLOG_SEQ) + 1
+        struct.pack_into(
+            RECORD_FMT,
+            self._record,
+            0,
+            seq,
+            timestamp,
+            _float_or_nan(humidity),
+            _float_or_nan(temperature),
+            co2_ppm,
+            _float_or_nan(battery_level),
+            _float_or_nan(lux),
+        )
+
+        try:
+            with FilesystemWritable():
+                if self._file_size() != self.capacity * RECORD_SIZE:
+                    logger.info(f"Creating backlog file {self.path}")
+                    self._create()
+                with open(self.path, "r+b") as file_obj:
+                    file_obj.seek(self._offset(seq))
+                    file_obj.write(self._record)
+        except (OSError, RuntimeError) as exc:
+            logger.warning(f"Cannot write to the backlog: {exc}")
+            return False
+
+        sleepmem.store(sleepmem.BACKLOG_SEQ, seq)
+        logger.info(f"Stored measurement to the backlog, {self.pending()} pending")
+        return True
+
+    def flush(self, send_func) -> int:
+        """
+        Pass the pending records, from oldest to newest, to the send function
+        as timestamp, humidity, temperature, CO2, battery level and lux
+        (None for values that were not available).
+        Stop on first record for which the send function returns False.
+        Return the number of records flushed.
+        """
+        pending = self.pending()
+        if pending == 0:
+            return 0
+
+        logger = logging.getLogger("")
+        logger.info(f"Flushing {pending} records from the backlog")
+
+        seq = sleepmem.load(sleepmem.BACKLOG_SEQ)
+        next_seq = seq - pending + 1
+        flushed = 0
+        with open(self.path, "rb") as file_obj:
+            while next_seq <= seq:
+                # Read as many consecutive records as possible without wrapping around.
+                count = min(
+                    READ_BATCH,
+                    seq - next_seq + 1,
+                    self.capacity - (next_seq - 1) % self.capacity,
+                )
+                file_obj.seek(self._offset(next_seq))
+                file_obj.readinto(self._view[: count * RECORD_SIZE])
+                for i in range(count):
+                    values = struct.unpack_from(RECORD_FMT, self._view, i * RECORD_SIZE)
+                    if values[0] != next_seq:
+                        logger.warning(f"Backlog record {next_seq} corrupted, skipping")
+                    elif not send_func(
+                        values[1],
+                        _nan_to_none(values[2]),
+                        _nan_to_none(values[3]),
+                        values[4] if values[4] else None,
+                        _nan_to_none(values[5]),
+                        _nan_to_none(values[6]),
+                    ):
+                        return flushed
+                    else:
+                        flushed += 1
+                    sleepmem.store(sleepmem.BACKLOG_FLUSHED, next_seq)
+                    next_seq += 1
+
+        return flushed
@@ -0,0 +1,201 @@
+"""
+BLE advertisement transport, using the BTHome (v2) format.
+
+On boards with BLE (e.g. ESP32-S3), the measurements are broadcast in non-connectable
+advertisement for a short burst, without association or waiting for ACK, so the radio
+is on for a fraction of a second. The advertisement carries the service data
+with the BTHome UUID (0xFCD2): the device information byte followed by the objects
+(object ID and little endian value), in the order of the object IDs.
+The packet ID (the lower byte of the sequence number) lets the receivers drop the repeated
+advertisements. Home Assistant (and other BTHome receivers) decode the measurements natively.
+
+The captured advertisements (hex encoded, one per line) can be decoded with CPython:
+
+  python3 bthome.py < adverts.txt
+"""
+
+import struct
+import sys
+import time
+
+import adafruit_logging as logging
+
+BTHOME_UUID = 0xFCD2
+# BTHome version 2, not encrypted, regular interval.
+DEVICE_INFO = 0x40
+_VERSION_MASK = 0xE0
+_ENCRYPTED = 0x01
+
+_AD_FLAGS = 0x01
+_AD_SERVICE_DATA = 0x16
+# LE General Discoverable Mode, BR/EDR not supported.
+_FLAGS = 0x06
+
+# Maximum length of legacy advertisement.
+MAX_ADVERTISEMENT_LEN = 31
+
+PACKET_ID = "packet_id"
+BATTERY = "battery"
+TEMPERATURE = "temperature"
+HUMIDITY = "humidity"
+ILLUMINANCE = "illuminance"
+CO2 = "co2"
+
+# Object ID to (name, length in bytes, signed, factor).
+OBJECTS = {
+    0x00: (PACKET_ID, 1, False, 1),
+    0x01: (BATTERY, 1, False, 1),
+    0x02: (TEMPERATURE, 2, True, 0.01),
+    0x03: (HUMIDITY, 2, False, 0.01),
+    0x05: (ILLUMINANCE, 3, False, 0.01),
+    0x12: (CO2, 2, False, 1),
+}
+
+# Advertising burst duration and interval, in seconds.
+DEFAULT_DURATION = 0.5
+ADVERTISING_INTERVAL = 0.02
+
+
+def _pack_object(object_id: int, value: float) -> bytes:
+    _, length, signed, factor = OBJECTS[object_id]
+    raw = round(value / factor)
+    if signed:
+        limit = 1 << (8 * length - 1)
+        raw = max(-limit, min(limit - 1, raw))
+    else:
+        raw = max(0, min((1 << (8 * length)) - 1, raw))
+    return bytes([object_id]) + struct.pack("<i", raw)[:length]
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments
+def encode_advertisement(
+    humidity, temperature, co2_ppm, lux, battery_capacity, packet_id: int
+) -> bytes:
+    """
+    Return the advertisement data with the measurements (either can be None).
+    """
+    values = {
+        0x00: packet_id & 0xFF,
+        0x01: battery_capacity,
+        0x02: temperature,
+        0x03: humidity,
+        0x05: lux,
+        0x12: co2_ppm,
+    }
+    service_data = struct.pack("<HB", BTHOME_UUID, DEVICE_INFO)
+    for object_id in sorted(values):
+        if values[object_id] is not None:
+            service_data += _pack_object(object_id, values[object_id])
+
+    data = bytes([2, _AD_FLAGS, _FLAGS])
+    data += bytes([len(service_data) + 1, _AD_SERVICE_DATA]) + service_data
+    if len(data) > MAX_ADVERTISEMENT_LEN:
+        raise ValueError(f"advertisement too long: {len(data)} bytes")
+    return data
+
+
+def decode_advertisement(data: bytes) -> dict:
+    """
+    Return dictionary of the measurements in the BTHome service data of the advertisement.
+    Raise ValueError if the advertisement has no BTHome service data or it cannot be decoded.
+    """
+    pos = 0
+    while pos < len(data):
+        length = data[pos]
+        if length == 0:
+            break
+        structure = data[pos + 1 : pos + 1 + length]
+        pos += 1 + length
+        if len(structure) != length:
+            raise ValueError("truncated advertisement")
+        if (
+            structure[0] == _AD_SERVICE_DATA
+            and len(structure) >= 4
+            and struct.unpack_from("<H", structure, 1)[0] == BTHOME_UUID
+        ):
+            return _decode_service_data(structure[3:])
+    raise ValueError("no BTHome service data")
+
+
+def _decode_service_data(data: bytes) -> dict:
+    if data[0] & _VERSION_MASK != DEVICE_INFO & _VERSION_MASK:
+        raise ValueError(f"unsupported BTHome version: {data[0] >> 5}")
+    if data[0] & _ENCRYPTED:
+        raise ValueError("encrypted BTHome data")
+
+    values = {}
+    pos = 1
+    while pos < len(data):
+        object_id = data[pos]
+        if object_id not in OBJECTS:
+            raise ValueError(f"unknown object ID 0x{object_id:02x}")
+        name, length, signed, factor = OBJECTS[object_id]
+        raw = data[pos + 1 : pos + 1 + length]
+        if len(raw) != length:
+            raise ValueError("truncated service data")
+        value = int.from_bytes(raw, "little")
+        if signed and value >= 1 << (8 * length - 1):
+            value -= 1 << (8 * length)
+        values[name] = value if factor == 1 else round(value * factor, 2)
+        pos += 1 + length
+    return values
+
+
+# pylint: disable=too-few-public-methods
+class BleAdvertiser:
+    """
+    Broadcasts the measurements in non-connectable BLE advertisements.
+    """
+
+    def __init__(self, duration: float = DEFAULT_DURATION) -> None:
+        """
+        :param duration: how long to advertise, in seconds
+        """
+        # pylint: disable=import-outside-toplevel,import-error
+        import _bleio
+
+        if _bleio.adapter is None:
+            raise RuntimeError("no BLE adapter")
+        self.adapter = _bleio.adapter
+        self.adapter.enabled = True
+        self.duration = duration
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def advertise(
+        self, humidity, temperature, co2_ppm, lux, battery_capacity, packet_id: int
+    ) -> None:
+        """
+        Advertise the measurements for the burst duration.
+        """
+        data = encode_advertisement(
+            humidity, temperature, co2_ppm, lux, battery_capacity, packet_id
+        )
+        logging.getLogger("").debug(f"Advertising {data.hex()} for {self.duration} s")
+        self.adapter.start_advertising(
+            data, connectable=False, interval=ADVERTISING_INTERVAL
+        )
+        try:
+            time.sleep(self.duration)
+        finally:
+            self.adapter.stop_advertising()
+
+
+def main():
+    """
+    Decode the advertisements (hex encoded, one per line) from standard input.
+    """
+    if len(sys.argv) != 1:
+        print(f"usage: {sys.argv[0]} < adverts.txt")
+        sys.exit(1)
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            print(decode_advertisement(bytes.fromhex(line)))
+        except ValueError as exc:
+            print(f"Cannot decode advertisement: {exc}")
+
+
+if __name__ == "__main__":
+    main()
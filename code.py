@@ -28,15 +28,45 @@ import supervisor
 from microcontroller import watchdog
 from watchdog import WatchDogMode, WatchDogTimeout
 
+from aggregate import Aggregator
+from alerts import (
+    DEFAULT_BACKSTOP_DURATION,
+    DEFAULT_TEMPERATURE_DELTA,
+    arm_alerts,
+    woken_by_alert,
+)
+from backlog import BACKLOG_FILE, Backlog
+from codedlog import RadioLogHandler
 from confchecks import ConfCheckException, bail, check_tunables
-from data import send_data
+from connection import CONNECTION_ERRORS, DEFAULT_FAILURE_BUDGET, ConnectionManager
+from data import publish_aggregated, send_data
+from deadline import Deadline
+from downlink import apply_overrides, receive_config
+from events import (
+    HARD_RESET,
+    RELOAD,
+    RESET,
+    RESET_REASONS,
+    count_wake,
+    enum_code,
+    exception_code,
+    format_entry,
+    get_unreported,
+    record,
+)
+from i2cprofile import I2CProfiler
 from logutil import get_log_level
+from maintenance import DEFAULT_WINDOW_DURATION, maintenance_reason
 
 # pylint: disable=wildcard-import, unused-wildcard-import
+from modem import DEFAULT_PROFILE, PROFILES, DutyCycleLedger
+from mqtt import CONNECT_RETRIES
 from names import *
+from payload import JSON
 from sensors import Sensors
-from sleep import SleepKind, enter_sleep, get_deep_sleep_duration
-from transport import setup_transport
+from sleep import SleepKind, add_sleep_jitter, enter_sleep, get_deep_sleep_duration
+from transport import connect_wifi, setup_transport
+from txpower import ACK_RETRIES, DEFAULT_GATEWAY_TX_POWER, PowerControl, power_range
 
 try:
     from secrets import secrets  # type: ignore [attr-defined]
@@ -50,6 +80,15 @@ except ImportError:
 # This is used to compute the watchdog timeout.
 ESTIMATED_RUN_TIME = 20
 
+# The deadline for the run is set this many seconds before the watchdog fires.
+WATCHDOG_MARGIN = 2
+# Time in seconds reserved within the run for sending the data.
+# Optional work (waiting for slow sensors, publishing logs, blinking the LED)
+# is shed if it would cut into this reserve.
+SEND_RESERVE = 5
+
+BLINK_DURATION = 0.5
+
 
 #
 # Cannot add type hint for the argument because the neopixel import
@@ -61,7 +100,7 @@ def blink(pixel) -> None:
     """
     pixel.brightness = 0.3
     pixel.fill((0, 0, 255))
-    time.sleep(0.5)
+    time.sleep(BLINK_DURATION)
     pixel.brightness = 0
 
 
@@ -81,10 +120,37 @@ def main():
     logger = logging.getLogger("")
     logger.setLevel(log_level)
 
-    logger.info("Running")
+    # The configuration received from the gateway takes precedence.
+    apply_overrides(secrets)
+
+    # Keep the log records to be sent over the radio, if it turns out to be available.
+    # As with the MQTT handler, the console handler has to be added explicitly.
+    radio_log = None
+    radio_log_level = secrets.get(RADIO_LOG_LEVEL)
+    if radio_log_level:
+        radio_log = RadioLogHandler(get_log_level(radio_log_level))
+        logger.addHandler(logging.StreamHandler())
+        logger.addHandler(radio_log)
+
+    logger.info(f"Running, wake {count_wake()}")
+    if secrets.get(ALERT_PIN) and woken_by_alert():
+        logger.info("Woken up by sensor alert")
+    # The maintenance pin has to be held at wake.
+    maintenance = maintenance_reason(secrets.get(MAINTENANCE_PIN))
+
+    # Record resets other than wakes from deep sleep.
+    # pylint: disable=no-member
+    reset_reason = microcontroller.cpu.reset_reason
+    if (
+        supervisor.runtime.run_reason == supervisor.RunReason.STARTUP
+        and reset_reason != microcontroller.ResetReason.DEEP_SLEEP_ALARM
+    ):
+        logger.info(f"Reset reason: {reset_reason}")
+        record(RESET, enum_code(RESET_REASONS, reset_reason))
 
     watchdog.timeout = ESTIMATED_RUN_TIME
     watchdog.mode = WatchDogMode.RAISE
+    deadline = Deadline(ESTIMATED_RUN_TIME - WATCHDOG_MARGIN, SEND_RESERVE)
 
     # Create sensor objects, using the board's default I2C bus.
     try:
@@ -93,6 +159,11 @@ def main():
         # pylint: disable=no-member
         i2c = busio.I2C(board.SCL1, board.SDA1)  # QtPy
 
+    # Count the I2C transactions of the sensor drivers if asked to.
+    i2c_profiler = None
+    if secrets.get(I2C_PROFILE):
+        i2c = i2c_profiler = I2CProfiler(i2c)
+
     #
     # The presence of battery monitor changes the flow (see below),
     # hence it is not part of Sensors.
@@ -112,9 +183,125 @@ def main():
         # pylint: disable=no-member
         pixel = neopixel.NeoPixel(board.NEOPIXEL, 1)
 
-    sensors = Sensors(i2c, light_gain=secrets.get(LIGHT_GAIN))
+    sensors = Sensors(
+        i2c,
+        light_gain=secrets.get(LIGHT_GAIN),
+        sampling_periods=secrets.get(SAMPLING_PERIODS),
+        profiles=secrets.get(SENSOR_PROFILES),
+    )
+
+    failing = sensors.health.failing()
+    if failing:
+        logger.warning(f"Sensor failures in a row: {failing}")
 
-    mqtt_client, rfm69 = setup_transport(secrets)
+    backlog = None
+    backlog_size = secrets.get(BACKLOG_SIZE)
+    if backlog_size:
+        backlog = Backlog(BACKLOG_FILE, backlog_size)
+
+    try:
+        # The relay publishes the received frames via MQTT if possible.
+        # When not running on battery, the reconnects are backed off by the connection manager.
+        mqtt_client, rfm69, espnow_link, advertiser = setup_transport(
+            secrets,
+            deadline,
+            with_mqtt=bool(secrets.get(RELAY_NODES)),
+            connect_retries=CONNECT_RETRIES if battery_monitor else 1,
+        )
+    except Exception:
+        # Keep the measurement so that it can be sent once the transport is back.
+        if backlog:
+            battery_capacity = None
+            if battery_monitor:
+                battery_capacity = battery_monitor.cell_percent
+            humidity, temperature, co2_ppm, lux = sensors.get_measurements(deadline)
+            backlog.append(humidity, temperature, co2_ppm, battery_capacity, lux)
+        raise
+
+    # Adjust the radio transmit power based on the ACKs from the gateway.
+    power_control = None
+    target_rssi = secrets.get(TX_POWER_TARGET_RSSI)
+    if rfm69 and target_rssi is not None:
+        min_power, max_power = power_range(rfm69, secrets.get(TX_POWER))
+        power_control = PowerControl(
+            min_power,
+            max_power,
+            target_rssi,
+            secrets.get(GATEWAY_TX_POWER, DEFAULT_GATEWAY_TX_POWER),
+        )
+        rfm69.ack_retries = ACK_RETRIES
+
+    # Keep the radio transmissions within the duty cycle of the band.
+    ledger = None
+    duty_cycle = secrets.get(DUTY_CYCLE)
+    if rfm69 and duty_cycle:
+        ledger = DutyCycleLedger(
+            duty_cycle,
+            PROFILES[secrets.get(MODEM_PROFILE, DEFAULT_PROFILE)],
+            encrypted=bool(secrets.get(ENCRYPTION_KEY)),
+        )
+
+    # Report the events recorded since the last report via the MQTT log handler.
+    if mqtt_client:
+        for entry in get_unreported():
+            logger.warning(f"Event {format_entry(entry)}")
+
+    # For devices not running on battery, serve the readings over HTTP if configured.
+    cache = None
+    metrics_server = None
+    metrics_port = secrets.get(METRICS_PORT)
+    if metrics_port and mqtt_client and not battery_monitor:
+        # pylint: disable=import-outside-toplevel,import-error
+        import socketpool
+        import wifi
+
+        from metrics_server import MetricsServer, ReadingCache
+
+        metrics_ttl = secrets.get(METRICS_TTL)
+        if metrics_ttl is None:
+            metrics_ttl = 60
+        cache = ReadingCache(metrics_ttl)
+        metrics_server = MetricsServer(
+            socketpool.SocketPool(wifi.radio), cache, metrics_port
+        )
+
+    # For devices not running on battery, sample often and publish the aggregates.
+    aggregation_window = secrets.get(AGGREGATION_WINDOW)
+    aggregator = None
+    if aggregation_window and mqtt_client and not battery_monitor:
+        logger.info(f"Aggregating the samples over {aggregation_window} seconds")
+        aggregator = Aggregator()
+
+    payload_format = secrets.get(MQTT_PAYLOAD_FORMAT, JSON)
+
+    # For devices not running on battery, relay the frames of other nodes between the runs.
+    relay = None
+    relay_nodes = secrets.get(RELAY_NODES)
+    if relay_nodes and rfm69 and not battery_monitor:
+        # pylint: disable=import-outside-toplevel
+        from relay import DEFAULT_HOP_LIMIT, Relay
+
+        logger.info(f"Relaying frames from nodes {relay_nodes}")
+        relay = Relay(
+            rfm69,
+            relay_nodes,
+            mqtt_client=mqtt_client,
+            hop_limit=secrets.get(RELAY_HOP_LIMIT, DEFAULT_HOP_LIMIT),
+            payload_format=payload_format,
+        )
+
+    # For devices not running on battery, recover lost connection in place
+    # rather than by resetting.
+    connection = None
+    if mqtt_client and not battery_monitor:
+        connection = ConnectionManager(
+            mqtt_client,
+            wifi_connect=lambda: connect_wifi(secrets),
+            failure_budget=secrets.get(
+                CONNECTION_FAILURE_BUDGET, DEFAULT_FAILURE_BUDGET
+            ),
+            feed=watchdog.feed,
+        )
 
     while True:
         battery_capacity = None
@@ -122,13 +309,70 @@ def main():
             battery_capacity = battery_monitor.cell_percent
             logger.info(f"Battery capacity {battery_capacity:.2f} %")
 
-        # Note that MQTT topic is used for both transports.
-        send_data(rfm69, mqtt_client, secrets[MQTT_TOPIC], sensors, battery_capacity)
-
-        if pixel:
-            blink(pixel)
+        try:
+            if aggregator:
+                measurements = sensors.get_measurements(deadline)
+                aggregator.add_measurements(*measurements)
+                if cache:
+                    cache.update_measurements(*measurements)
+                if aggregator.elapsed() >= aggregation_window:
+                    publish_aggregated(
+                        mqtt_client,
+                        secrets[MQTT_TOPIC],
+                        aggregator,
+                        battery_capacity,
+                        payload_format=payload_format,
+                    )
+                    aggregator.reset()
+                    if pixel and deadline.allows(BLINK_DURATION):
+                        blink(pixel)
+            else:
+                # Note that MQTT topic is used for all transports.
+                # The ESP-NOW link takes the same frames as RFM69, without listen before talk.
+                send_data(
+                    rfm69 or espnow_link,
+                    mqtt_client,
+                    secrets[MQTT_TOPIC],
+                    sensors,
+                    battery_capacity,
+                    lbt_rssi_threshold=(
+                        secrets.get(LBT_RSSI_THRESHOLD) if rfm69 else None
+                    ),
+                    lbt_max_attempts=secrets.get(LBT_MAX_ATTEMPTS),
+                    backlog=backlog,
+                    deadline=deadline,
+                    cache=cache,
+                    payload_format=payload_format,
+                    power_control=power_control,
+                    ledger=ledger,
+                    advertiser=advertiser,
+                )
+
+                downlink_timeout = secrets.get(DOWNLINK_TIMEOUT)
+                if rfm69 and downlink_timeout:
+                    receive_config(
+                        rfm69,
+                        secrets,
+                        deadline.budget(downlink_timeout),
+                        secrets.get(GATEWAY_NODE),
+                    )
+
+                if rfm69 and radio_log:
+                    radio_log.send(rfm69, ledger)
+
+                if pixel and deadline.allows(BLINK_DURATION):
+                    blink(pixel)
+        except CONNECTION_ERRORS as exc:
+            if not connection:
+                raise
+            connection.recover(exc)
+
+        if i2c_profiler:
+            i2c_profiler.log_summary()
+            i2c_profiler.reset()
 
         watchdog.feed()
+        deadline.restart()
 
         # Assuming that if the battery monitor is present, the device is running on battery power.
         if battery_monitor:
@@ -136,29 +380,54 @@ def main():
             break
 
         sleep_duration_short = secrets.get(SLEEP_DURATION_SHORT)
-        if sleep_duration_short:
+        if aggregator:
+            timeout = secrets.get(SAMPLE_INTERVAL, 1)
+        elif sleep_duration_short:
             timeout = sleep_duration_short
         else:
             timeout = ESTIMATED_RUN_TIME // 2
-        if mqtt_client:
-            logger.info(f"Waiting for MQTT event with timeout {timeout} seconds")
-            mqtt_client.loop(timeout=timeout)
+        try:
+            if relay:
+                logger.info(f"Relaying frames for {timeout} seconds")
+                relay.serve_for(timeout)
+            elif metrics_server:
+                # pylint: disable=import-outside-toplevel
+                from metrics_server import serve_for
+
+                logger.info(f"Serving metrics for {timeout} seconds")
+                serve_for(metrics_server, timeout, mqtt_client)
+            elif mqtt_client:
+                logger.info(f"Waiting for MQTT event with timeout {timeout} seconds")
+                mqtt_client.loop(timeout=timeout)
+            else:
+                logger.info(f"Sleeping for {timeout} seconds")
+                time.sleep(timeout)
+        except CONNECTION_ERRORS as exc:
+            if not connection:
+                raise
+            connection.recover(exc)
+            # The recovery can take a while, start the next iteration with full budget.
+            watchdog.feed()
+            deadline.restart()
         else:
-            logger.info(f"Sleeping for {timeout} seconds")
-            time.sleep(timeout)
+            if connection:
+                connection.succeeded()
 
     #
     # The rest of the code in this function applies only to devices running on battery power.
     #
 
-    # Sleep a bit so one can break to the REPL when using console via web workflow.
-    light_sleep_duration = secrets.get(LIGHT_SLEEP_DURATION)
-    if light_sleep_duration is None:
-        light_sleep_duration = 10
-    if light_sleep_duration > 0:
-        enter_sleep(
-            light_sleep_duration, SleepKind(SleepKind.LIGHT)
-        )  # ugh, ESTIMATED_RUN_TIME
+    # Sleep a bit so one can break to the REPL (e.g. when using console via web workflow),
+    # only if asked to. Otherwise go straight to deep sleep.
+    if maintenance:
+        logger.info(f"Opening maintenance window: {maintenance}")
+        light_sleep_duration = secrets.get(
+            LIGHT_SLEEP_DURATION, DEFAULT_WINDOW_DURATION
+        )
+        # The light sleep must not trigger the watchdog.
+        light_sleep_duration = deadline.budget(light_sleep_duration)
+        if light_sleep_duration > 0:
+            enter_sleep(light_sleep_duration, SleepKind(SleepKind.LIGHT))
 
     if mqtt_client:
         mqtt_client.disconnect()
@@ -167,7 +436,26 @@ def main():
     watchdog.mode = None
 
     deep_sleep_duration = get_deep_sleep_duration(secrets, battery_monitor, logger)
-    enter_sleep(deep_sleep_duration, SleepKind(SleepKind.DEEP))
+
+    # In the event driven mode, wake when a reading leaves its window,
+    # with long time alarm as a backstop.
+    pin_alarm = None
+    alert_pin = secrets.get(ALERT_PIN)
+    if alert_pin:
+        pin_alarm = arm_alerts(
+            alert_pin,
+            sensors.tmp117,
+            battery_monitor,
+            secrets.get(ALERT_TEMPERATURE_DELTA, DEFAULT_TEMPERATURE_DELTA),
+        )
+        if pin_alarm:
+            deep_sleep_duration = add_sleep_jitter(
+                secrets,
+                secrets.get(ALERT_BACKSTOP_DURATION, DEFAULT_BACKSTOP_DURATION),
+                logger,
+            )
+
+    enter_sleep(deep_sleep_duration, SleepKind(SleepKind.DEEP), pin_alarm=pin_alarm)
 
 
 def hard_reset(exception):
@@ -176,6 +464,7 @@ def hard_reset(exception):
     """
     watchdog.mode = None
     print(f"Got exception: {exception}")
+    record(HARD_RESET, exception_code(exception))
     reset_time = 15
     print(f"Performing hard reset in {reset_time} seconds")
     time.sleep(reset_time)
@@ -202,6 +491,7 @@ except Exception as e:  # pylint: disable=broad-except
     watchdog.mode = None
     print("Code stopped by unhandled exception:")
     print(traceback.format_exception(None, e, e.__traceback__))
+    record(RELOAD, exception_code(e))
     RELOAD_TIME = 10
     print(f"Performing a supervisor reload in {RELOAD_TIME} seconds")
     time.sleep(RELOAD_TIME)
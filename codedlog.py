@@ -0,0 +1,325 @@
+"""
+Compact coded logging over the RFM69 radio.
+
+Instead of the text, each log record is sent as message identifier (index of the log call site
+in the table generated from the sources) with the values substituted into the message
+packed in binary form. The records at or above the configured level are buffered
+and sent after the data in frames of up to RFM69 payload size:
+
+  "LG" | table hash (2 bytes) | records
+
+where each record is level (1 byte), message identifier (2 bytes), number of arguments (1 byte)
+and the arguments, each being type tag (i, f, s) followed by the value
+(32-bit integer, 32-bit float, or length prefixed UTF-8 string).
+Messages not found in the table are sent as text, truncated.
+
+The table (logtable.py) has to be regenerated with CPython whenever the log calls change:
+
+  python3 codedlog.py generate *.py
+
+and the frames (hex encoded payloads, one per line) decoded back into text with:
+
+  python3 codedlog.py decode < frames.txt
+"""
+
+import struct
+import sys
+
+import adafruit_logging as logging
+
+# adafruit_logging defines log levels dynamically.
+# pylint: disable=no-name-in-module
+from adafruit_logging import NOTSET, Handler, LogRecord
+
+try:
+    from logtable import TABLE_HASH, TEMPLATES
+except ImportError:
+    TABLE_HASH = 0
+    TEMPLATES = ()  # type: ignore [assignment]
+
+LOG_PREFIX = b"LG"
+_HEADER_FMT = ">2sH"
+_RECORD_FMT = ">BHB"
+# Maximum payload of adafruit_rfm69 frame.
+MAX_FRAME_LEN = 60
+MAX_STRING_LEN = 16
+_MAX_RECORD_LEN = MAX_FRAME_LEN - struct.calcsize(_HEADER_FMT)
+# Identifier of messages not found in the table, sent as single string argument.
+TEXT_ID = 0xFFFF
+# Maximum number of records kept until sent, the oldest are dropped.
+MAX_PENDING = 16
+
+LOG_METHODS = ("debug", "info", "warning", "error", "critical", "exception")
+
+
+def _match(segments: tuple, message: str) -> list | None:
+    """
+    Return the list of strings substituted between the literal segments of the template
+    to produce the message, or None if the message does not match.
+    """
+    if not message.startswith(segments[0]):
+        return None
+    if len(segments) == 1:
+        return [] if message == segments[0] else None
+
+    args = []
+    pos = len(segments[0])
+    for segment in segments[1:-1]:
+        end = message.find(segment, pos)
+        if end < 0:
+            return None
+        args.append(message[pos:end])
+        pos = end + len(segment)
+    last = segments[-1]
+    if not message.endswith(last) or len(message) - len(last) < pos:
+        return None
+    args.append(message[pos : len(message) - len(last)])
+    return args
+
+
+def _pack_string(arg: str, max_len: int) -> bytes:
+    data = arg.encode("utf-8")[:max_len]
+    return b"s" + bytes([len(data)]) + data
+
+
+def _pack_arg(arg: str) -> bytes:
+    try:
+        return b"i" + struct.pack(">i", int(arg))
+    except (ValueError, OverflowError):
+        pass
+    try:
+        return b"f" + struct.pack(">f", float(arg))
+    except (ValueError, OverflowError):
+        pass
+    return _pack_string(arg, MAX_STRING_LEN)
+
+
+def encode_record(level: int, message: str, templates: tuple = TEMPLATES) -> bytes:
+    """
+    Encode the log message into record.
+    """
+    for index, segments in enumerate(templates):
+        args = _match(segments, message)
+        if args is not None:
+            record = struct.pack(_RECORD_FMT, level, index, len(args))
+            for arg in args:
+                record += _pack_arg(arg)
+            if len(record) <= _MAX_RECORD_LEN:
+                return record
+            break
+
+    # Not in the table or too many arguments, send as much of the text as fits.
+    record = struct.pack(_RECORD_FMT, level, TEXT_ID, 1)
+    return record + _pack_string(message, _MAX_RECORD_LEN - len(record) - 2)
+
+
+def _unpack_arg(data: bytes, pos: int) -> tuple:
+    tag = data[pos : pos + 1]
+    pos += 1
+    if tag == b"i":
+        return struct.unpack_from(">i", data, pos)[0], pos + 4
+    if tag == b"f":
+        value = struct.unpack_from(">f", data, pos)[0]
+        return f"{value:.6g}", pos + 4
+    if tag == b"s":
+        length = data[pos]
+        return data[pos + 1 : pos + 1 + length].decode("utf-8", "replace"), (
+            pos + 1 + length
+        )
+    raise ValueError(f"unknown argument type {tag!r}")
+
+
+def decode_frame(frame: bytes, templates: tuple = TEMPLATES) -> list:
+    """
+    Return list of (level, message) tuples decoded from the frame.
+    Raise ValueError if the frame is malformed.
+    """
+    if not frame.startswith(LOG_PREFIX):
+        raise ValueError("not a log frame")
+    _, table_hash = struct.unpack_from(_HEADER_FMT, frame)
+    if table_hash != TABLE_HASH:
+        raise ValueError(f"table hash mismatch: {table_hash:04x} != {TABLE_HASH:04x}")
+
+    records = []
+    pos = struct.calcsize(_HEADER_FMT)
+    try:
+        while pos < len(frame):
+            level, index, nargs = struct.unpack_from(_RECORD_FMT, frame, pos)
+            pos += struct.calcsize(_RECORD_FMT)
+            args = []
+            for _ in range(nargs):
+                arg, pos = _unpack_arg(frame, pos)
+                args.append(str(arg))
+            if index == TEXT_ID:
+                records.append((level, "".join(args)))
+            else:
+                segments = templates[index]
+                message = segments[0]
+                for arg, segment in zip(args, segments[1:]):
+                    message += arg + segment
+                records.append((level, message))
+    except (struct.error, IndexError) as exc:
+        raise ValueError(f"truncated frame: {exc}") from exc
+    return records
+
+
+class RadioLogHandler(Handler):
+    """
+    Log handler that keeps the coded log records until they are sent over the radio.
+    """
+
+    def __init__(self, level: int = NOTSET) -> None:
+        super().__init__(level)
+        self.pending: list = []
+        self._sending = False
+
+    def emit(self, record: LogRecord) -> None:
+        """
+        Encode the log record and keep it for sending.
+        """
+        if self._sending:
+            return
+        self.pending.append(encode_record(record.levelno, str(record.msg)))
+        if len(self.pending) > MAX_PENDING:
+            self.pending.pop(0)
+
+    # To make this work also in CPython's logging.
+    def handle(self, record: LogRecord) -> None:
+        """
+        Handle the log record. Here, it means just emit, if the level allows.
+        """
+        if record.levelno >= self.level:
+            self.emit(record)
+
+    def frames(self) -> list:
+        """
+        Return the pending records packed into frames.
+        """
+        header = struct.pack(_HEADER_FMT, LOG_PREFIX, TABLE_HASH)
+        frames = []
+        frame = header
+        for record in self.pending:
+            if len(frame) + len(record) > MAX_FRAME_LEN:
+                frames.append(frame)
+                frame = header
+            frame += record
+        if len(frame) > len(header):
+            frames.append(frame)
+        return frames
+
+    def send(self, rfm69, ledger=None) -> int:
+        """
+        Send the pending records over the radio, within the duty cycle if the ledger is set.
+        Return the number of frames sent.
+        """
+        self._sending = True
+        sent = 0
+        try:
+            for frame in self.frames():
+                airtime = 0.0
+                if ledger:
+                    airtime = ledger.airtime(len(frame))
+                    if not ledger.allows(airtime):
+                        break
+                if not rfm69.send(frame):
+                    break
+                if ledger:
+                    ledger.record(airtime)
+                sent += 1
+            self.pending = []
+        finally:
+            self._sending = False
+        return sent
+
+
+def _template(node) -> tuple | None:
+    """
+    Return the literal segments of string or f-string node, or None if it is neither.
+    """
+    # pylint: disable=import-outside-toplevel
+    import ast
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return (node.value,)
+    if not isinstance(node, ast.JoinedStr):
+        return None
+    segments = [""]
+    for value in node.values:
+        if isinstance(value, ast.Constant):
+            segments[-1] += str(value.value)
+        else:
+            segments.append("")
+    return tuple(segments)
+
+
+def generate_table(paths: list) -> list:
+    """
+    Return the templates of the log calls found in given source files, in stable order.
+    """
+    # pylint: disable=import-outside-toplevel
+    import ast
+
+    templates = []
+    for path in sorted(paths):
+        with open(path, encoding="utf-8") as source:
+            tree = ast.parse(source.read(), path)
+        for node in ast.walk(tree):
+            if (
+                isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Attribute)
+                and node.func.attr in LOG_METHODS
+                and node.args
+            ):
+                template = _template(node.args[0])
+                if template is not None and template not in templates:
+                    templates.append(template)
+    return templates
+
+
+def write_table(templates: list, path: str) -> int:
+    """
+    Write the table module and return the table hash.
+    """
+    # pylint: disable=import-outside-toplevel
+    import binascii
+
+    table_hash = binascii.crc32(repr(templates).encode("utf-8")) & 0xFFFF
+    with open(path, "w", encoding="utf-8") as table:
+        table.write('"""\nLog message templates, generated by codedlog.py.\n"""\n\n')
+        table.write(f"TABLE_HASH = 0x{table_hash:04x}\n\nTEMPLATES = (\n")
+        for template in templates:
+            table.write(f"    {template!r},\n")
+        table.write(")\n")
+    return table_hash
+
+
+def main():
+    """
+    Generate the table from the sources or decode the frames from standard input.
+    """
+    if len(sys.argv) > 2 and sys.argv[1] == "generate":
+        paths = [
+            path
+            for path in sys.argv[2:]
+            if not path.startswith("test_") and path != "logtable.py"
+        ]
+        templates = generate_table(paths)
+        table_hash = write_table(templates, "logtable.py")
+        print(f"Wrote {len(templates)} templates, table hash {table_hash:04x}")
+    elif len(sys.argv) == 2 and sys.argv[1] == "decode":
+        for line in sys.stdin:
+            try:
+                records = decode_frame(bytes.fromhex(line.strip()))
+            except ValueError as exc:
+                print(f"Cannot decode frame: {exc}")
+                continue
+            for level, message in records:
+                name = dict(logging.LEVELS).get(level, str(level))
+                print(f"{name} - {message}")
+    else:
+        print(f"usage: {sys.argv[0]} generate FILE... | decode")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,16 @@ Various functions for checking configuration.
 
 import sys
 
+from espnow_link import parse_mac
+from modem import PROFILES
+
 # pylint: disable=unused-wildcard-import, wildcard-import
 from names import *
+from payload import FORMATS
+from sampling import METRICS
+from sensorhealth import VEML7700
+from sensorprofile import AUTO
+from sensorprofile import PROFILES as SENSOR_PROFILE_NAMES
 
 
 class ConfCheckException(Exception):
@@ -50,6 +58,39 @@ def check_int(
         raise ConfCheckException(f"{name} value {value} higher than maximum {max_val}")
 
 
+def check_number(
+    secrets: dict, name: str, mandatory: bool = True, min_val=None
+) -> None:
+    """
+    Check is number (integer or float) with given name is present in secrets.
+    """
+    value = secrets.get(name)
+    if value is None:
+        if mandatory:
+            raise ConfCheckException(f"{name} is missing")
+        return
+
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ConfCheckException(f"not a number value for {name}: {value}")
+
+    if min_val is not None and value < min_val:
+        raise ConfCheckException(f"{name} value {value} smaller than minimum {min_val}")
+
+
+def check_bool(secrets: dict, name: str, mandatory: bool = True) -> None:
+    """
+    Check is boolean with given name is present in secrets.
+    """
+    value = secrets.get(name)
+    if value is None:
+        if mandatory:
+            raise ConfCheckException(f"{name} is missing")
+        return
+
+    if not isinstance(value, bool):
+        raise ConfCheckException(f"not a boolean value for {name}: {value}")
+
+
 def check_list(secrets: dict, name: str, subtype, mandatory: bool = True) -> None:
     """
     Check whether list with given name is present in secrets.
@@ -87,6 +128,27 @@ def check_bytes(secrets: dict, name: str, length: int, mandatory: bool = True) -
         )
 
 
+def check_dict(secrets: dict, name: str, subtype, mandatory: bool = True) -> None:
+    """
+    Check whether dictionary with given name is present in secrets
+    and its values are of given type.
+    """
+    value = secrets.get(name)
+    if value is None:
+        if mandatory:
+            raise ConfCheckException(f"{name} is missing")
+        return
+
+    if not isinstance(value, dict):
+        raise ConfCheckException(f"not a dictionary value for {name}: {value}")
+
+    for key, item in value.items():
+        if not isinstance(key, str):
+            raise ConfCheckException(f"not a string key in {name}: {key}")
+        if not isinstance(item, subtype):
+            raise ConfCheckException(f"not a {subtype} value in {name}: {item}")
+
+
 def bail(message: str) -> None:
     """
     Print message and exit with code 1.
@@ -95,12 +157,43 @@ def bail(message: str) -> None:
     sys.exit(1)
 
 
+def check_sensor_profiles(secrets: dict) -> None:
+    """
+    Check the light gain and the sensor profiles. Raise ConfCheckException on error.
+    """
+    check_int(secrets, LIGHT_GAIN, mandatory=False)
+    light_gain = secrets.get(LIGHT_GAIN)
+    if light_gain is not None and light_gain not in [1, 2]:
+        raise ConfCheckException(f"value of {LIGHT_GAIN} must be either 1 or 2")
+
+    check_dict(secrets, SENSOR_PROFILES, str, mandatory=False)
+    sensor_profiles = secrets.get(SENSOR_PROFILES)
+    if sensor_profiles:
+        for sensor, profile in sensor_profiles.items():
+            if sensor not in SENSOR_PROFILE_NAMES:
+                raise ConfCheckException(
+                    f"unknown sensor in {SENSOR_PROFILES}: {sensor}, "
+                    f"must be one of {list(SENSOR_PROFILE_NAMES)}"
+                )
+            if profile not in SENSOR_PROFILE_NAMES[sensor]:
+                raise ConfCheckException(
+                    f"unknown profile for {sensor} in {SENSOR_PROFILES}: {profile}, "
+                    f"must be one of {list(SENSOR_PROFILE_NAMES[sensor])}"
+                )
+        if light_gain is not None and sensor_profiles.get(VEML7700) == AUTO:
+            raise ConfCheckException(
+                f"{LIGHT_GAIN} cannot be used with the {AUTO} profile of veml7700"
+            )
+
+
+# pylint: disable=too-many-statements
 def check_tunables(secrets: dict) -> None:
     """
     Check that tunables are present and of correct type.
     Will exit the program on error.
     """
     check_string(secrets, LOG_LEVEL)
+    check_string(secrets, RADIO_LOG_LEVEL, mandatory=False)
 
     # Even though different transport can be selected than Wi-Fi, the related tunables
     # are still mandatory, because at this point it is known which will be selected.
@@ -111,8 +204,14 @@ def check_tunables(secrets: dict) -> None:
     # MQTT topic is used for all transports so is mandatory.
     check_string(secrets, MQTT_TOPIC)
     check_string(secrets, LOG_TOPIC, mandatory=False)
+    check_string(secrets, MQTT_PAYLOAD_FORMAT, mandatory=False)
+    payload_format = secrets.get(MQTT_PAYLOAD_FORMAT)
+    if payload_format is not None and payload_format not in FORMATS:
+        bail(f"value of {MQTT_PAYLOAD_FORMAT} must be one of {FORMATS}")
 
     check_int(secrets, BROKER_PORT, min_val=0, max_val=65535, mandatory=False)
+    check_bool(secrets, BROKER_TLS, mandatory=False)
+    check_string(secrets, BROKER_CA, mandatory=False)
 
     check_int(secrets, DEEP_SLEEP_DURATION)
     check_int(secrets, SLEEP_DURATION_SHORT, mandatory=False)
@@ -127,13 +226,66 @@ def check_tunables(secrets: dict) -> None:
         )
 
     check_int(secrets, LIGHT_SLEEP_DURATION, mandatory=False)
+    check_string(secrets, MAINTENANCE_PIN, mandatory=False)
+    check_int(secrets, SLEEP_JITTER, mandatory=False, min_val=0)
+
+    check_string(secrets, ALERT_PIN, mandatory=False)
+    check_number(secrets, ALERT_TEMPERATURE_DELTA, mandatory=False, min_val=0.1)
+    check_int(secrets, ALERT_BACKSTOP_DURATION, mandatory=False, min_val=1)
+
+    check_int(secrets, AGGREGATION_WINDOW, mandatory=False, min_val=1)
+    check_int(secrets, SAMPLE_INTERVAL, mandatory=False, min_val=1)
+
+    check_int(secrets, BACKLOG_SIZE, mandatory=False, min_val=0)
+
+    check_int(secrets, METRICS_PORT, mandatory=False, min_val=1, max_val=65535)
+    check_int(secrets, METRICS_TTL, mandatory=False, min_val=1)
+    check_int(secrets, CONNECTION_FAILURE_BUDGET, mandatory=False, min_val=1)
+
+    check_dict(secrets, SAMPLING_PERIODS, int, mandatory=False)
+    sampling_periods = secrets.get(SAMPLING_PERIODS)
+    if sampling_periods:
+        for metric in sampling_periods:
+            if metric not in METRICS:
+                bail(f"unknown metric in {SAMPLING_PERIODS}: {metric}")
 
     check_int(secrets, BATTERY_CAPACITY_THRESHOLD, mandatory=False)
 
     check_int(secrets, TX_POWER, mandatory=False)
     check_bytes(secrets, ENCRYPTION_KEY, 16, mandatory=False)
-
-    check_int(secrets, LIGHT_GAIN, mandatory=False)
-    light_gain = secrets.get(LIGHT_GAIN)
-    if light_gain is not None and light_gain not in [1, 2]:
-        bail(f"value of {LIGHT_GAIN} must be either 1 or 2")
+    check_int(secrets, LBT_RSSI_THRESHOLD, mandatory=False, min_val=-127, max_val=0)
+    check_int(secrets, LBT_MAX_ATTEMPTS, mandatory=False, min_val=1, max_val=10)
+    check_int(secrets, RFM69_NODE, mandatory=False, min_val=0, max_val=254)
+    check_string(secrets, MODEM_PROFILE, mandatory=False)
+    modem_profile = secrets.get(MODEM_PROFILE)
+    if modem_profile is not None and modem_profile not in PROFILES:
+        bail(f"value of {MODEM_PROFILE} must be one of {list(PROFILES)}")
+    check_number(secrets, DUTY_CYCLE, mandatory=False, min_val=0.001)
+    duty_cycle = secrets.get(DUTY_CYCLE)
+    if duty_cycle is not None and duty_cycle > 100:
+        bail(f"value of {DUTY_CYCLE} must be at most 100 (percent)")
+    check_int(secrets, GATEWAY_NODE, mandatory=False, min_val=0, max_val=254)
+    check_number(secrets, DOWNLINK_TIMEOUT, mandatory=False, min_val=0)
+    check_int(secrets, TX_POWER_TARGET_RSSI, mandatory=False, min_val=-127, max_val=0)
+    check_int(secrets, GATEWAY_TX_POWER, mandatory=False, min_val=-18, max_val=20)
+    if (
+        secrets.get(TX_POWER_TARGET_RSSI) is not None
+        and secrets.get(GATEWAY_NODE) is None
+    ):
+        bail(f"{TX_POWER_TARGET_RSSI} needs {GATEWAY_NODE} to be set to receive ACKs")
+    check_string(secrets, ESPNOW_PEER, mandatory=False)
+    espnow_peer = secrets.get(ESPNOW_PEER)
+    if espnow_peer is not None:
+        try:
+            parse_mac(espnow_peer)
+        except ValueError:
+            bail(f"value of {ESPNOW_PEER} must be MAC address like aa:bb:cc:dd:ee:ff")
+    check_int(secrets, ESPNOW_CHANNEL, mandatory=False, min_val=0, max_val=14)
+    check_number(secrets, ESPNOW_ACK_TIMEOUT, mandatory=False, min_val=0)
+    check_number(secrets, BLE_ADVERTISE_DURATION, mandatory=False, min_val=0.1)
+    check_list(secrets, RELAY_NODES, int, mandatory=False)
+    check_int(secrets, RELAY_HOP_LIMIT, mandatory=False, min_val=1, max_val=15)
+
+    check_bool(secrets, I2C_PROFILE, mandatory=False)
+
+    check_sensor_profiles(secrets)
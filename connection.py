@@ -0,0 +1,116 @@
+"""
+In-process recovery of the Wi-Fi and MQTT connection.
+
+When the MQTT broker restarts or the Wi-Fi access point goes away, the USB powered nodes
+reconnect in place (with jittered exponential backoff between the attempts)
+instead of resetting the microcontroller, so that the sensors stay initialized
+and the recovery takes single reconnect. Only after the failure budget is exhausted
+is the original exception propagated to trigger the reset.
+"""
+
+import random
+import time
+
+import adafruit_logging as logging
+import adafruit_minimqtt.adafruit_minimqtt as MQTT
+
+DEFAULT_FAILURE_BUDGET = 8
+BACKOFF_MIN = 1
+BACKOFF_MAX = 60
+# The backoff sleep is split into intervals of this many seconds
+# so that the watchdog can be fed in between.
+FEED_INTERVAL = 5
+
+# Exceptions that mean the connection is broken.
+CONNECTION_ERRORS = (MQTT.MMQTTException, OSError)
+
+
+# pylint: disable=too-many-instance-attributes
+class ConnectionManager:
+    """
+    Reconnects the Wi-Fi and the MQTT client after connection failure.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        mqtt_client,
+        wifi_connect=None,
+        failure_budget: int = DEFAULT_FAILURE_BUDGET,
+        backoff_min: float = BACKOFF_MIN,
+        backoff_max: float = BACKOFF_MAX,
+        feed=None,
+    ) -> None:
+        """
+        :param wifi_connect: function that (re)connects the Wi-Fi if it is not connected
+        :param failure_budget: number of consecutive failed reconnects before giving up
+        :param feed: function called while waiting, e.g. to feed the watchdog
+        """
+        self.mqtt_client = mqtt_client
+        self.wifi_connect = wifi_connect
+        self.failure_budget = failure_budget
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.feed = feed
+        self.failures = 0
+        self.reconnects = 0
+
+    def backoff(self) -> float:
+        """
+        Return random delay (in seconds) before the next reconnect attempt.
+        The upper bound doubles with each consecutive failure ("full jitter").
+        """
+        bound = min(self.backoff_max, self.backoff_min * 2 ** max(0, self.failures - 1))
+        return random.uniform(0, bound)
+
+    def _wait(self, duration: float) -> None:
+        end = time.monotonic() + duration
+        while True:
+            if self.feed:
+                self.feed()
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(FEED_INTERVAL, remaining))
+
+    def recover(self, exception: Exception) -> None:
+        """
+        Reconnect after given connection failure. Return once connected, or re-raise
+        the exception (chained to the last reconnect failure, if any) once the number
+        of consecutive failures exceeds the budget.
+        """
+        logger = logging.getLogger("")
+
+        last = None
+        while True:
+            self.failures += 1
+            if self.failures > self.failure_budget:
+                logger.error(
+                    f"Giving up reconnecting after {self.failures - 1} failures"
+                )
+                raise exception from last
+
+            delay = self.backoff()
+            logger.warning(
+                f"Connection failure {self.failures}/{self.failure_budget}: "
+                f"{last or exception}, reconnecting in {delay:.1f} seconds"
+            )
+            self._wait(delay)
+
+            try:
+                if self.wifi_connect:
+                    self.wifi_connect()
+                self.mqtt_client.reconnect()
+            except CONNECTION_ERRORS as exc:
+                last = exc
+                continue
+
+            self.reconnects += 1
+            logger.info("Reconnected to the MQTT broker")
+            return
+
+    def succeeded(self) -> None:
+        """
+        Record successful use of the connection, restoring the failure budget.
+        """
+        self.failures = 0
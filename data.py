@@ -2,12 +2,27 @@
 data manipulation functions
 """
 
-import json
 import struct
+import time
+
+try:
+    from typing import Dict
+except ImportError:
+    pass
 
 import adafruit_logging as logging
 
-from sensors import Sensors
+from aggregate import Aggregator
+from backlog import Backlog
+from deadline import Deadline
+from modem import DutyCycleLedger
+from payload import JSON
+from payload import encode as encode_payload
+from payload import topic as payload_topic
+from radio import send_with_lbt
+from sensors import Sensors, measurements_to_dict
+from sequence import NO_SEQ, next_sequence
+from txpower import PowerControl, send_with_power_control
 
 #
 # Note: at most 60 bytes can be sent in single packet so pack the data.
@@ -15,15 +30,33 @@ from sensors import Sensors
 #
 MAX_MQTT_TOPIC_LEN = 32
 MQTT_PREFIX = "MQTT:"
-DATA_PACK_FMT = f">{len(MQTT_PREFIX)}s{MAX_MQTT_TOPIC_LEN}sffIff"
+# Frames with backlog records have their own prefix (of the same length) so that the gateway
+# does not take them for fresh readings, and carry the age of the record (in minutes)
+# instead of the sequence number.
+BACKLOG_PREFIX = "BKLG:"
+FRAME_PREFIXES = (MQTT_PREFIX.encode("ascii"), BACKLOG_PREFIX.encode("ascii"))
+BACKLOG_AGE_MAX = 0xFFFF
+# The sequence number is at the end so that the preceding fields keep their position.
+DATA_PACK_FMT = f">{len(MQTT_PREFIX)}s{MAX_MQTT_TOPIC_LEN}sffIffH"
+
+# Estimated time in seconds needed to send single backlog record.
+BACKLOG_RECORD_TIME = 0.5
 
 
 # pylint: disable=too-many-arguments,too-many-positional-arguments
 def pack_data(
-    mqtt_topic: str, battery_capacity, co2_ppm, humidity, temperature, lux
+    mqtt_topic: str,
+    battery_capacity,
+    co2_ppm,
+    humidity,
+    temperature,
+    lux,
+    seq: int = NO_SEQ,
+    age: int | None = None,
 ) -> bytes:
     """
     Pack the structure with data.
+    If the age (in minutes) is set, the frame carries backlog record instead of fresh reading.
     """
     logger = logging.getLogger("")
 
@@ -48,48 +81,220 @@ def pack_data(
     if lux is None:
         lux = float("nan")
 
-    logger.info(f"Packing data: {(humidity, temperature, co2_ppm, battery_level, lux)}")
+    prefix = MQTT_PREFIX
+    if age is not None:
+        prefix = BACKLOG_PREFIX
+        seq = max(0, min(BACKLOG_AGE_MAX, age))
+
+    logger.info(
+        f"Packing data: {(humidity, temperature, co2_ppm, battery_level, lux, seq)}"
+    )
     data = struct.pack(
         DATA_PACK_FMT,
-        MQTT_PREFIX.encode("ascii"),
+        prefix.encode("ascii"),
         mqtt_topic.encode("ascii"),
         humidity,
         temperature,
         co2_ppm,
         battery_level,
         lux,
+        seq,
     )
     return data
 
 
 def unpack_data(data):
     """
-    Unpack data into tuple. Used only for testing.
+    Unpack data into tuple.
     """
     return struct.unpack(DATA_PACK_FMT, data)
 
 
+def is_frame(data: bytes) -> bool:
+    """
+    Return True if the data is a frame in the pack_data() format.
+    """
+    return (
+        len(data) == struct.calcsize(DATA_PACK_FMT)
+        and bytes(data[: len(MQTT_PREFIX)]) in FRAME_PREFIXES
+    )
+
+
+def is_backlog_frame(fields: tuple) -> bool:
+    """
+    Return True if the unpacked frame carries backlog record.
+    """
+    return fields[0] == FRAME_PREFIXES[1]
+
+
+def frame_seq(fields: tuple) -> int:
+    """
+    Return the sequence number of the unpacked frame (NO_SEQ for backlog records).
+    """
+    return NO_SEQ if is_backlog_frame(fields) else fields[-1]
+
+
+def _add_battery_level(data: Dict, battery_level, native: bool) -> None:
+    if battery_level is not None:
+        data["battery_level"] = battery_level if native else f"{battery_level:.2f}"
+
+
+def _add_sequence(data: Dict, native: bool) -> None:
+    seq = next_sequence()
+    data["seq"] = seq if native else f"{seq}"
+
+
+def _publish(mqtt_client, mqtt_topic: str, data: Dict, payload_format: str) -> None:
+    """
+    Publish the data encoded in given format.
+    """
+    mqtt_client.publish(
+        payload_topic(mqtt_topic, payload_format),
+        encode_payload(data, payload_format),
+    )
+
+
+def _record_fits(deadline: Deadline | None) -> bool:
+    """
+    Return True if the deadline allows sending one more backlog record.
+    """
+    if deadline is None or deadline.allows(BACKLOG_RECORD_TIME):
+        return True
+    logging.getLogger("").info("No time left to flush the rest of the backlog")
+    return False
+
+
+def _radio_send(
+    rfm69,
+    data: bytes,
+    lbt_rssi_threshold: int | None,
+    lbt_max_attempts: int | None,
+    power_control: PowerControl | None = None,
+    ledger: DutyCycleLedger | None = None,
+    deadline: Deadline | None = None,
+) -> bool:
+    """
+    Send the packed data over the radio, possibly with listen before talk
+    (backing off only as long as the deadline allows).
+    With power control, the data are sent with ACK.
+    With duty cycle ledger, the data are not sent if the airtime budget would be exceeded
+    (by all the retries, when sending with ACK) and each transmission is counted against it.
+    """
+    logger = logging.getLogger("")
+
+    airtime = 0.0
+    if ledger:
+        airtime = ledger.airtime(len(data))
+        transmissions = (rfm69.ack_retries or 1) if power_control else 1
+        if not ledger.allows(airtime * transmissions):
+            logger.warning("Airtime budget exhausted, deferring the transmission")
+            return False
+
+    def record() -> None:
+        if ledger:
+            ledger.record(airtime)
+
+    def send_func(data: bytes) -> bool:
+        if power_control:
+            return send_with_power_control(rfm69, data, power_control, record)
+        sent = rfm69.send(data)
+        record()
+        return sent
+
+    logger.debug(f"Raw data to be sent: {data!r}")
+    if lbt_rssi_threshold is not None:
+        sent = send_with_lbt(
+            rfm69, data, lbt_rssi_threshold, lbt_max_attempts, send_func, deadline
+        )
+    else:
+        sent = send_func(data)
+
+    if not sent:
+        logger.warning("Radio transmission timed out")
+    return sent
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals,too-many-branches
+# pylint: disable=too-many-statements
 def send_data(
-    rfm69, mqtt_client, mqtt_topic: str, sensors: Sensors, battery_capacity
+    rfm69,
+    mqtt_client,
+    mqtt_topic: str,
+    sensors: Sensors,
+    battery_capacity,
+    lbt_rssi_threshold: int | None = None,
+    lbt_max_attempts: int | None = None,
+    backlog: Backlog | None = None,
+    deadline: Deadline | None = None,
+    cache=None,
+    payload_format: str = JSON,
+    power_control: PowerControl | None = None,
+    ledger: DutyCycleLedger | None = None,
+    advertiser=None,
 ) -> None:
     """
     Pick a transport, acquire sensor data and send them.
+    Instead of RFM69, the radio can be ESP-NOW link as it takes the same frames.
+    If neither is set, the data are advertised over BLE if the advertiser is set.
+    If the RSSI threshold is set, the radio transport will listen before talk.
+    If the backlog is set, the data that could not be sent are stored in the backlog
+    and the backlog is flushed, as long as the deadline allows, after successful publish
+    via MQTT, or over the radio in frames marked as backlog records, before the fresh reading
+    if the whole backlog fits into the deadline, otherwise after it.
+    If the reading cache is set, it is refreshed with the measurements.
+    Each fresh reading carries sequence number, the backlog records do not.
+    The payload format (JSON or CBOR) applies to the MQTT transport only.
+    If the power control is set, the radio transmit power is adjusted based on the ACKs.
+    If the duty cycle ledger is set, the radio transmissions are kept within the airtime budget.
     """
     logger = logging.getLogger("")
 
+    humidity, temperature, co2_ppm, lux = sensors.get_measurements(deadline)
+    if cache:
+        cache.update_measurements(humidity, temperature, co2_ppm, lux)
+
     if mqtt_client:
-        data = sensors.get_measurements_dict()
+        # pylint: disable=import-outside-toplevel
+        import adafruit_minimqtt.adafruit_minimqtt as MQTT
+
+        native = payload_format != JSON
+        data = measurements_to_dict(humidity, temperature, co2_ppm, lux, native)
         if battery_capacity:
-            data["battery_level"] = f"{battery_capacity:.2f}"
+            _add_battery_level(data, battery_capacity, native)
 
         if len(data) == 0:
             logger.warning("No sensor data available, will not publish")
             return
 
+        _add_sequence(data, native)
         logger.info(f"Publishing to {mqtt_topic}: {data}")
-        mqtt_client.publish(mqtt_topic, json.dumps(data))
+        try:
+            _publish(mqtt_client, mqtt_topic, data, payload_format)
+        except (MQTT.MMQTTException, OSError):
+            if backlog:
+                backlog.append(humidity, temperature, co2_ppm, battery_capacity, lux)
+            raise
+
+        if backlog:
+
+            # pylint: disable=too-many-arguments,too-many-positional-arguments
+            def publish_record(
+                timestamp, humidity, temperature, co2_ppm, battery_level, lux
+            ) -> bool:
+                if not _record_fits(deadline):
+                    return False
+                data = measurements_to_dict(humidity, temperature, co2_ppm, lux, native)
+                _add_battery_level(data, battery_level, native)
+                data["timestamp"] = timestamp
+                try:
+                    _publish(mqtt_client, mqtt_topic, data, payload_format)
+                except (MQTT.MMQTTException, OSError) as exc:
+                    logger.warning(f"Failed to publish backlog record: {exc}")
+                    return False
+                return True
+
+            backlog.flush(publish_record)
     elif rfm69:
-        humidity, temperature, co2_ppm, lux = sensors.get_measurements()
         if (
             humidity is None
             and temperature is None
@@ -100,20 +305,115 @@ def send_data(
             logger.warning("No sensor data available, will not send anything")
             return
 
-        #
-        # mypy gets confused by the 'data' variable assignment in the adjacent
-        # if branch above and thinks it should be of type dict and complains:
-        #
-        #  Incompatible types in assignment (expression has type "bytes",
-        #  variable has type "dict[Any, Any] | None")
-        #
-        # So, the warning has to be suppressed (after several things were tried
-        # to make it happy).
-        #
-        data = pack_data(
-            mqtt_topic, battery_capacity, co2_ppm, humidity, temperature, lux
-        )  # type: ignore [assignment]
-        logger.debug(f"Raw data to be sent: {data}")
-        rfm69.send(data)
+        packet = pack_data(
+            mqtt_topic,
+            battery_capacity,
+            co2_ppm,
+            humidity,
+            temperature,
+            lux,
+            seq=next_sequence(),
+        )
+
+        def send_fresh() -> bool:
+            if _radio_send(
+                rfm69,
+                packet,
+                lbt_rssi_threshold,
+                lbt_max_attempts,
+                power_control,
+                ledger,
+                deadline,
+            ):
+                return True
+            if backlog:
+                backlog.append(humidity, temperature, co2_ppm, battery_capacity, lux)
+            return False
+
+        if not backlog:
+            send_fresh()
+            return
+
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        def send_record(
+            timestamp, humidity, temperature, co2_ppm, battery_level, lux
+        ) -> bool:
+            if not _record_fits(deadline):
+                return False
+            # The radio frame has no room for the timestamp, so it carries the age.
+            age = (int(time.time()) - timestamp) // 60
+            logger.debug(f"Sending backlog record from {timestamp}, age {age} min")
+            return _radio_send(
+                rfm69,
+                pack_data(
+                    mqtt_topic,
+                    battery_level,
+                    co2_ppm,
+                    humidity,
+                    temperature,
+                    lux,
+                    age=age,
+                ),
+                lbt_rssi_threshold,
+                lbt_max_attempts,
+                power_control,
+                ledger,
+                deadline,
+            )
+
+        # The backlog goes first so that the fresh reading is the last one received,
+        # unless the whole backlog might not fit into the time budget.
+        if deadline is None or deadline.allows(
+            (backlog.pending() + 1) * BACKLOG_RECORD_TIME
+        ):
+            backlog.flush(send_record)
+            send_fresh()
+        elif send_fresh():
+            backlog.flush(send_record)
+    elif advertiser:
+        if (
+            humidity is None
+            and temperature is None
+            and co2_ppm is None
+            and battery_capacity is None
+            and lux is None
+        ):
+            logger.warning("No sensor data available, will not advertise anything")
+            return
+
+        # There is no ACK so the backlog cannot be used.
+        advertiser.advertise(
+            humidity, temperature, co2_ppm, lux, battery_capacity, next_sequence()
+        )
+    elif backlog:
+        logger.warning("No way to send the data, storing them to the backlog")
+        backlog.append(humidity, temperature, co2_ppm, battery_capacity, lux)
     else:
         logger.error("No way to send the data")
+
+
+def publish_aggregated(
+    mqtt_client,
+    mqtt_topic: str,
+    aggregator: Aggregator,
+    battery_capacity,
+    payload_format: str = JSON,
+) -> None:
+    """
+    Publish the aggregated data to MQTT topic.
+    """
+    logger = logging.getLogger("")
+
+    native = payload_format != JSON
+    data = aggregator.get_dict(native)
+    if battery_capacity:
+        _add_battery_level(data, battery_capacity, native)
+
+    if len(data) == 0:
+        logger.warning("No sensor data aggregated, will not publish")
+        return
+
+    _add_sequence(data, native)
+
+    logger.info(f"Publishing aggregated data to {mqtt_topic}: {data}")
+    _publish(mqtt_client, mqtt_topic, data, payload_format)
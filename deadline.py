@@ -0,0 +1,62 @@
+"""
+Time budget of single wake (or single iteration of the main loop).
+
+The watchdog resets the microcontroller if the code runs for too long, wasting the whole wake.
+To avoid that, the individual phases of the run (sensor reading, transport setup,
+sending the data, ...) check the remaining time and shed optional work
+(waiting for slow sensors, publishing log messages, blinking the LED)
+so that there is always enough time left to send the data acquired so far.
+"""
+
+import time
+
+
+class Deadline:
+    """
+    Deadline with reserve of time kept for sending the data.
+    """
+
+    def __init__(self, duration: float, reserve: float = 0) -> None:
+        """
+        :param duration: the time budget in seconds
+        :param reserve: the time in seconds at the end of the budget that is not available
+        to the optional work
+        """
+        if reserve > duration:
+            raise ValueError(f"reserve {reserve} bigger than duration {duration}")
+
+        self.duration = duration
+        self.reserve = reserve
+        self.start = time.monotonic()
+
+    def restart(self) -> None:
+        """
+        Start new time budget.
+        """
+        self.start = time.monotonic()
+
+    def remaining(self) -> float:
+        """
+        Return the number of seconds till the deadline.
+        """
+        return self.duration - (time.monotonic() - self.start)
+
+    def available(self) -> float:
+        """
+        Return the number of seconds available for optional work.
+        """
+        return max(0.0, self.remaining() - self.reserve)
+
+    def allows(self, cost: float) -> bool:
+        """
+        Return True if work taking given number of seconds fits into the budget
+        without cutting into the reserve.
+        """
+        return self.available() >= cost
+
+    def budget(self, wanted: float) -> float:
+        """
+        Return the number of seconds that can be spent by work wanting given number
+        of seconds, i.e. the wanted time capped by the available time.
+        """
+        return min(wanted, self.available())
@@ -0,0 +1,202 @@
+"""
+Configuration overrides sent by the gateway over the radio.
+
+After sending the data, the node listens for a while for a downlink frame from the gateway.
+The frame carries the complete set of overrides as a sequence of (tunable identifier, value)
+pairs, with the value format given by the identifier (see DOWNLINK_TUNABLES).
+The overrides are validated together with the rest of the tunables and persisted in NVM,
+where they take precedence over the values from secrets on every following wake.
+Frame without any pairs clears the overrides.
+
+The gateway has to send the frame (see encode_config()) to the node address
+shortly after receiving its data. Besides the overrides, the frame can request
+the maintenance window on the next wake.
+"""
+
+import struct
+
+import adafruit_logging as logging
+
+try:
+    # pylint: disable=no-name-in-module
+    from microcontroller import nvm
+
+    _NVM = nvm
+except ImportError:
+    # for testing
+    _NVM = bytearray(2048)
+
+from confchecks import ConfCheckException, check_tunables
+from maintenance import request_maintenance
+
+# pylint: disable=unused-wildcard-import, wildcard-import
+from names import *
+
+CONFIG_PREFIX = b"CFG"
+
+# Tunables that can be overridden, the identifier is the index in this tuple.
+DOWNLINK_TUNABLES = (
+    (DEEP_SLEEP_DURATION, ">I"),
+    (SLEEP_DURATION_SHORT, ">I"),
+    (BATTERY_CAPACITY_THRESHOLD, ">B"),
+    (SLEEP_JITTER, ">H"),
+    (TX_POWER, ">b"),
+    (TX_POWER_TARGET_RSSI, ">b"),
+    (LBT_RSSI_THRESHOLD, ">b"),
+    (DUTY_CYCLE, ">f"),
+    (ALERT_TEMPERATURE_DELTA, ">f"),
+    (ALERT_BACKSTOP_DURATION, ">I"),
+)
+# Identifier (without value) requesting the maintenance window.
+MAINTENANCE_ID = 0xFF
+
+# NVM layout, placed after the event ring.
+_MAGIC = 0x4346  # "CF"
+_HEADER_FMT = ">HB"
+CONFIG_OFFSET = 1024
+CONFIG_CAPACITY = 64
+
+
+def encode_config(overrides: dict, maintenance: bool = False) -> bytes:
+    """
+    Encode the overrides (and the maintenance request) into downlink frame payload.
+    """
+    ids = {name: index for index, (name, _) in enumerate(DOWNLINK_TUNABLES)}
+    body = b""
+    for name, value in overrides.items():
+        if name not in ids:
+            raise ValueError(f"{name} cannot be set via downlink")
+        index = ids[name]
+        body += bytes([index]) + struct.pack(DOWNLINK_TUNABLES[index][1], value)
+    if maintenance:
+        body += bytes([MAINTENANCE_ID])
+    return CONFIG_PREFIX + body
+
+
+def _decode_body(body: bytes) -> tuple:
+    """
+    Return the (overrides, maintenance requested) encoded in the body.
+    Raise ValueError if the body is malformed.
+    """
+    overrides = {}
+    maintenance = False
+    pos = 0
+    while pos < len(body):
+        index = body[pos]
+        pos += 1
+        if index == MAINTENANCE_ID:
+            maintenance = True
+            continue
+        if index >= len(DOWNLINK_TUNABLES):
+            raise ValueError(f"unknown tunable identifier {index}")
+        name, fmt = DOWNLINK_TUNABLES[index]
+        size = struct.calcsize(fmt)
+        if pos + size > len(body):
+            raise ValueError(f"truncated value of {name}")
+        overrides[name] = struct.unpack_from(fmt, body, pos)[0]
+        pos += size
+    return overrides, maintenance
+
+
+def decode_config(payload: bytes) -> tuple:
+    """
+    Return the (overrides, maintenance requested) from downlink frame payload.
+    Raise ValueError if the payload is not valid downlink frame.
+    """
+    if not payload.startswith(CONFIG_PREFIX):
+        raise ValueError("not a downlink frame")
+    return _decode_body(payload[len(CONFIG_PREFIX) :])
+
+
+def _load_body() -> bytes:
+    magic, length = struct.unpack_from(_HEADER_FMT, _NVM, CONFIG_OFFSET)
+    if magic != _MAGIC or length > CONFIG_CAPACITY:
+        return b""
+    start = CONFIG_OFFSET + struct.calcsize(_HEADER_FMT)
+    return bytes(_NVM[start : start + length])
+
+
+def _store_body(body: bytes) -> None:
+    if len(body) > CONFIG_CAPACITY:
+        raise ValueError(f"overrides too long: {len(body)} bytes")
+    # The NVM is backed by flash, avoid needless writes.
+    if body == _load_body():
+        return
+    data = struct.pack(_HEADER_FMT, _MAGIC, len(body)) + body
+    _NVM[CONFIG_OFFSET : CONFIG_OFFSET + len(data)] = data
+
+
+def load_overrides() -> dict:
+    """
+    Return the overrides stored in NVM.
+    """
+    try:
+        overrides, _ = _decode_body(_load_body())
+    except ValueError:
+        return {}
+    return overrides
+
+
+def valid_overrides(secrets: dict, overrides: dict) -> bool:
+    """
+    Return True if the tunables with the overrides applied pass the configuration checks.
+    """
+    merged = dict(secrets)
+    merged.update(overrides)
+    try:
+        check_tunables(merged)
+    except (ConfCheckException, SystemExit) as exc:
+        # Some of the checks exit the program.
+        logging.getLogger("").warning(f"Invalid configuration overrides: {exc}")
+        return False
+    return True
+
+
+def apply_overrides(secrets: dict) -> dict:
+    """
+    Apply the overrides stored in NVM to the secrets, if they are (still) valid.
+    Return the applied overrides.
+    """
+    overrides = load_overrides()
+    if not overrides or not valid_overrides(secrets, overrides):
+        return {}
+    logging.getLogger("").info(f"Applying configuration overrides: {overrides}")
+    secrets.update(overrides)
+    return overrides
+
+
+def receive_config(
+    rfm69, secrets: dict, timeout: float, gateway: int | None = None
+) -> bool:
+    """
+    Listen for downlink frame from the gateway for given number of seconds.
+    The valid overrides are stored and take effect on the next wake.
+    Return True if valid frame was received.
+    """
+    logger = logging.getLogger("")
+
+    packet = rfm69.receive(with_header=True, timeout=timeout)
+    if packet is None:
+        logger.debug("No downlink frame received")
+        return False
+
+    source = packet[1]
+    if gateway is not None and source != gateway:
+        logger.debug(f"Ignoring frame from node {source}")
+        return False
+
+    try:
+        overrides, maintenance = decode_config(bytes(packet[4:]))
+    except ValueError as exc:
+        logger.warning(f"Malformed downlink frame: {exc}")
+        return False
+
+    if not valid_overrides(secrets, overrides):
+        return False
+
+    logger.info(f"Received configuration overrides: {overrides}")
+    _store_body(encode_config(overrides)[len(CONFIG_PREFIX) :])
+    if maintenance:
+        logger.info("Maintenance window requested by the gateway")
+        request_maintenance()
+    return True
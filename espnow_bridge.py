@@ -0,0 +1,85 @@
+"""
+ESP-NOW to MQTT bridge.
+
+To be run (copied as code.py) on ESP32 board with CircuitPython, connected to Wi-Fi.
+It receives the frames sent by the nodes using the ESP-NOW transport, publishes them
+to the MQTT topic found in the frame and acknowledges them. The secrets.py of the bridge
+needs the Wi-Fi and MQTT broker tunables (plus mqtt_topic and deep_sleep_duration
+for the configuration checks to pass).
+
+The MAC address and the Wi-Fi channel logged on start are to be used
+for the espnow_peer and espnow_channel tunables of the nodes.
+"""
+
+import time
+
+import adafruit_logging as logging
+
+from confchecks import ConfCheckException, bail, check_tunables
+from connection import CONNECTION_ERRORS, ConnectionManager
+from espnow_link import EspNowBridge, format_mac
+from logutil import get_log_level
+
+# pylint: disable=wildcard-import, unused-wildcard-import
+from names import *
+from payload import JSON
+from transport import connect_wifi, setup_mqtt
+
+try:
+    from secrets import secrets  # type: ignore [attr-defined]
+except ImportError:
+    print(
+        "WiFi credentials and configuration are kept in secrets.py, please add them there!"
+    )
+    raise
+
+# How long to sleep when there is no frame to handle, in seconds.
+POLL_INTERVAL = 0.01
+# How often to service the MQTT client, in seconds.
+MQTT_LOOP_INTERVAL = 10
+
+
+def main():
+    """
+    Bridge the ESP-NOW frames to MQTT forever.
+    """
+    try:
+        check_tunables(secrets)
+    except ConfCheckException as exception:
+        bail(str(exception))
+
+    logger = logging.getLogger("")
+    logger.setLevel(get_log_level(secrets.get(LOG_LEVEL)))
+
+    mqtt_client = setup_mqtt(secrets)
+
+    # pylint: disable=import-outside-toplevel,import-error
+    import espnow
+    import wifi
+
+    logger.info(
+        f"Bridging ESP-NOW frames received on {format_mac(wifi.radio.mac_address)}, "
+        f"channel {wifi.radio.ap_info.channel}"
+    )
+    bridge = EspNowBridge(
+        espnow.ESPNow(), mqtt_client, secrets.get(MQTT_PAYLOAD_FORMAT, JSON)
+    )
+    connection = ConnectionManager(
+        mqtt_client, wifi_connect=lambda: connect_wifi(secrets)
+    )
+
+    last_loop = time.monotonic()
+    while True:
+        try:
+            if not bridge.poll():
+                time.sleep(POLL_INTERVAL)
+            if time.monotonic() - last_loop >= MQTT_LOOP_INTERVAL:
+                mqtt_client.loop(timeout=1)
+                last_loop = time.monotonic()
+            connection.succeeded()
+        except CONNECTION_ERRORS as exception:
+            connection.recover(exception)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+ESP-NOW transport: connectionless alternative to Wi-Fi/MQTT for boards without radio FeatherWing.
+
+The frame in the pack_data() format is sent straight to the MAC address of the bridge
+(see espnow_bridge.py), without association, DHCP, TCP or MQTT CONNECT, so the node
+can be awake for a fraction of a second. The ESP-NOW layer acknowledges the delivery
+to the radio of the peer only, so optionally the sender waits for ACK from the bridge
+(the ACK prefix followed by the sequence number of the frame) confirming that the frame
+was handed over to the MQTT broker.
+
+The bridge has to be on the same Wi-Fi channel as the node, i.e. when the bridge
+is connected to an access point, the node has to use the channel of the access point.
+"""
+
+import time
+
+import adafruit_logging as logging
+
+from data import frame_seq, is_frame, unpack_data
+from payload import JSON
+from relay import publish_frame
+from sequence import NO_SEQ
+
+ACK_PREFIX = b"ACK"
+# Exceptions raised by the espnow module on failed send.
+SEND_ERRORS = (OSError, RuntimeError, ValueError)
+# How often to check for the ACK, in seconds.
+ACK_POLL_INTERVAL = 0.005
+# Number of recently published (MAC address, sequence number) pairs remembered.
+DUPLICATE_CACHE_SIZE = 32
+
+
+def parse_mac(mac: str) -> bytes:
+    """
+    Convert MAC address in the aa:bb:cc:dd:ee:ff form to bytes.
+    Raise ValueError if the address is not valid.
+    """
+    parts = mac.split(":")
+    if len(parts) != 6:
+        raise ValueError(f"invalid MAC address: {mac}")
+    return bytes(int(part, 16) for part in parts)
+
+
+def format_mac(mac: bytes) -> str:
+    """
+    Convert MAC address to the aa:bb:cc:dd:ee:ff form.
+    """
+    return ":".join(f"{byte:02x}" for byte in mac)
+
+
+def ack_for(frame: bytes) -> bytes:
+    """
+    Return the ACK for the frame, i.e. the prefix with the sequence number of the frame.
+    """
+    return ACK_PREFIX + frame[-2:]
+
+
+# pylint: disable=too-few-public-methods
+class EspNowLink:
+    """
+    Sends frames to the bridge over ESP-NOW.
+    """
+
+    def __init__(
+        self, peer_mac: bytes, channel: int = 0, ack_timeout: float | None = None
+    ) -> None:
+        """
+        :param channel: Wi-Fi channel of the bridge, 0 means the current channel
+        :param ack_timeout: time to wait for ACK from the bridge, None means no wait
+        """
+        # pylint: disable=import-outside-toplevel,import-error
+        import espnow
+
+        self.peer_mac = peer_mac
+        self.ack_timeout = ack_timeout
+        self.espnow = espnow.ESPNow()
+        self.peer = espnow.Peer(mac=peer_mac, channel=channel)
+        self.espnow.peers.append(self.peer)
+
+    def _wait_for_ack(self, ack: bytes, timeout: float) -> bool:
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            packet = self.espnow.read()
+            if packet is None:
+                time.sleep(ACK_POLL_INTERVAL)
+                continue
+            if bytes(packet.mac) == self.peer_mac and bytes(packet.msg) == ack:
+                return True
+        return False
+
+    def send(self, data: bytes) -> bool:
+        """
+        Send the frame to the bridge. Return True if it was sent
+        (and acknowledged by the bridge, if waiting for the ACK).
+        """
+        logger = logging.getLogger("")
+
+        try:
+            self.espnow.send(data, self.peer)
+        except SEND_ERRORS as exception:
+            logger.warning(f"ESP-NOW send failed: {exception}")
+            return False
+        if self.ack_timeout is None:
+            return True
+        if not self._wait_for_ack(ack_for(data), self.ack_timeout):
+            logger.warning(f"No ACK from {format_mac(self.peer_mac)}")
+            return False
+        return True
+
+
+class EspNowBridge:
+    """
+    Receives frames over ESP-NOW and publishes them via MQTT.
+    """
+
+    def __init__(
+        self, espnow_obj, mqtt_client, payload_format: str = JSON, ack: bool = True
+    ) -> None:
+        """
+        :param espnow_obj: the espnow.ESPNow object
+        :param ack: whether to acknowledge the published frames
+        """
+        self.espnow = espnow_obj
+        self.mqtt_client = mqtt_client
+        self.payload_format = payload_format
+        self.ack = ack
+        self._peers: dict = {}
+        self._recent: list = []
+        self.published = 0
+
+    def _remember(self, mac: bytes, seq: int) -> None:
+        """
+        Remember the frame as published so that its re-sends (when the ACK is lost)
+        are not published again.
+        """
+        if seq == NO_SEQ:
+            return
+        self._recent.append((mac, seq))
+        if len(self._recent) > DUPLICATE_CACHE_SIZE:
+            self._recent.pop(0)
+
+    def _send_ack(self, mac: bytes, frame: bytes) -> None:
+        # pylint: disable=import-outside-toplevel,import-error
+        import espnow
+
+        if mac not in self._peers:
+            self._peers[mac] = espnow.Peer(mac=mac)
+            self.espnow.peers.append(self._peers[mac])
+        try:
+            self.espnow.send(ack_for(frame), self._peers[mac])
+        except SEND_ERRORS as exception:
+            logging.getLogger("").warning(
+                f"Failed to send ACK to {format_mac(mac)}: {exception}"
+            )
+
+    def handle(self, mac: bytes, frame: bytes) -> bool:
+        """
+        Publish the frame received from given MAC address. Return True if published.
+        """
+        logger = logging.getLogger("")
+
+        if not is_frame(frame):
+            logger.debug(f"Ignoring frame of unknown format from {format_mac(mac)}")
+            return False
+
+        fields = unpack_data(frame)
+        seq = frame_seq(fields)
+        published = False
+        if seq != NO_SEQ and (mac, seq) in self._recent:
+            logger.debug(f"Dropping duplicate frame {seq} from {format_mac(mac)}")
+        else:
+            logger.info(f"Publishing frame from {format_mac(mac)}")
+            publish_frame(self.mqtt_client, fields, self.payload_format)
+            self._remember(mac, seq)
+            self.published += 1
+            published = True
+        # The duplicate is acknowledged too as the previous ACK was probably lost.
+        if self.ack:
+            self._send_ack(mac, frame)
+        return published
+
+    def poll(self) -> bool:
+        """
+        Handle single received frame, if any. Return True if a frame was published.
+        """
+        packet = self.espnow.read()
+        if packet is None:
+            return False
+        return self.handle(bytes(packet.mac), bytes(packet.msg))
@@ -0,0 +1,257 @@
+"""
+Compact binary ring of events (resets, safe mode, exceptions) kept in NVM.
+
+Each entry takes 8 bytes: sequence number, event type, event detail (e.g. reset reason)
+and the number of wakes since the sleep memory was initialized.
+The position of the entry in the ring is given by its sequence number.
+The sequence number of the last entry is kept in sleep memory and if that is lost,
+it is recovered by scanning the ring.
+
+The NVM is backed by flash so only the rare events are recorded, not every wake.
+
+The ring can be dumped on the microcontroller with dump() and the output
+decoded on a computer with:
+
+  python3 events.py dump.txt
+
+"""
+
+import struct
+import sys
+
+try:
+    # pylint: disable=no-name-in-module
+    from microcontroller import nvm
+
+    _NVM = nvm
+except ImportError:
+    # for testing
+    _NVM = bytearray(1024)
+
+import sleepmem
+
+# NVM layout
+_MAGIC = 0x4556  # "EV"
+_MAGIC_FMT = ">H"
+EVENTS_OFFSET = 0
+CAPACITY = 64
+# sequence number, type, detail, wake count
+ENTRY_FMT = ">IBBH"
+ENTRY_SIZE = struct.calcsize(ENTRY_FMT)
+_ENTRIES_OFFSET = EVENTS_OFFSET + struct.calcsize(_MAGIC_FMT)
+EVENTS_END = _ENTRIES_OFFSET + CAPACITY * ENTRY_SIZE
+
+# Event types
+RESET = 1
+SAFE_MODE = 2
+EXCEPTION = 3
+HARD_RESET = 4
+RELOAD = 5
+
+EVENT_NAMES = {
+    RESET: "reset",
+    SAFE_MODE: "safe mode",
+    EXCEPTION: "exception",
+    HARD_RESET: "hard reset",
+    RELOAD: "reload",
+}
+
+# The details are stored as index into these lists.
+RESET_REASONS = (
+    "POWER_ON",
+    "BROWNOUT",
+    "SOFTWARE",
+    "DEEP_SLEEP_ALARM",
+    "RESET_PIN",
+    "WATCHDOG",
+    "UNKNOWN",
+    "RESCUE_DEBUG",
+)
+SAFE_MODE_REASONS = (
+    "NONE",
+    "BROWNOUT",
+    "FLASH_WRITE_FAIL",
+    "GC_ALLOC_OUTSIDE_VM",
+    "HARD_FAULT",
+    "INTERRUPT_ERROR",
+    "NLR_JUMP_FAIL",
+    "NO_CIRCUITPY",
+    "NO_HEAP",
+    "PROGRAMMATIC",
+    "SDK_FATAL_ERROR",
+    "STACK_OVERFLOW",
+    "USB_BOOT_DEVICE_NOT_INTERFACE_ZERO",
+    "USB_TOO_MANY_ENDPOINTS",
+    "USB_TOO_MANY_INTERFACE_NAMES",
+    "USER",
+    "WATCHDOG",
+)
+EXCEPTION_NAMES = (
+    "Exception",
+    "ConnectionError",
+    "MemoryError",
+    "WatchDogTimeout",
+    "OSError",
+    "RuntimeError",
+    "ValueError",
+    "TimeoutError",
+    "MMQTTException",
+    "KeyError",
+    "TypeError",
+    "AttributeError",
+)
+
+UNKNOWN_DETAIL = 0xFF
+
+
+def _detail_code(names: tuple, name: str) -> int:
+    try:
+        return names.index(name)
+    except ValueError:
+        return UNKNOWN_DETAIL
+
+
+def enum_code(names: tuple, value) -> int:
+    """
+    Convert CircuitPython enum value (e.g. microcontroller.ResetReason.POWER_ON)
+    to index into the list of names.
+    """
+    return _detail_code(names, str(value).rsplit(".", maxsplit=1)[-1])
+
+
+def exception_code(exception: BaseException) -> int:
+    """
+    Convert exception to index into the list of exception names.
+    """
+    return _detail_code(EXCEPTION_NAMES, type(exception).__name__)
+
+
+def _check() -> None:
+    """
+    Zero the ring if it does not contain valid data.
+    """
+    if struct.unpack_from(_MAGIC_FMT, _NVM, EVENTS_OFFSET)[0] != _MAGIC:
+        _NVM[EVENTS_OFFSET:EVENTS_END] = bytes(EVENTS_END - EVENTS_OFFSET)
+        _NVM[EVENTS_OFFSET:_ENTRIES_OFFSET] = struct.pack(_MAGIC_FMT, _MAGIC)
+        sleepmem.store(sleepmem.EVENTS_SEQ, 0)
+
+
+def _last_seq() -> int:
+    seq = sleepmem.load(sleepmem.EVENTS_SEQ)
+    if seq == 0:
+        # Either empty ring or the sleep memory was lost.
+        for offset in range(_ENTRIES_OFFSET, EVENTS_END, ENTRY_SIZE):
+            seq = max(seq, struct.unpack_from(">I", _NVM, offset)[0])
+        sleepmem.store(sleepmem.EVENTS_SEQ, seq)
+    return seq
+
+
+def _entry_offset(seq: int) -> int:
+    return _ENTRIES_OFFSET + ((seq - 1) % CAPACITY) * ENTRY_SIZE
+
+
+def count_wake() -> int:
+    """
+    Increment the wake counter kept in sleep memory (not in NVM) and return its value.
+    """
+    return sleepmem.increment(sleepmem.WAKE_COUNT)
+
+
+def record(event_type: int, detail: int = UNKNOWN_DETAIL) -> None:
+    """
+    Append event to the ring, overwriting the oldest one if full.
+    """
+    _check()
+    seq = _last_seq() + 1
+    # Write the entry at once to avoid multiple flash writes.
+    _NVM[_entry_offset(seq) : _entry_offset(seq) + ENTRY_SIZE] = struct.pack(
+        ENTRY_FMT, seq, event_type, detail, sleepmem.load(sleepmem.WAKE_COUNT)
+    )
+    sleepmem.store(sleepmem.EVENTS_SEQ, seq)
+
+
+def get_events(since: int = 0) -> list:
+    """
+    Return list of (sequence number, type, detail, wake count) tuples
+    of the entries with sequence number bigger than given one, from oldest to newest.
+    """
+    _check()
+    last_seq = _last_seq()
+    first_seq = max(since, last_seq - CAPACITY) + 1
+    return [
+        struct.unpack_from(ENTRY_FMT, _NVM, _entry_offset(seq))
+        for seq in range(first_seq, last_seq + 1)
+    ]
+
+
+def get_unreported() -> list:
+    """
+    Return the entries recorded since the last call of this function.
+    """
+    entries = get_events(sleepmem.load(sleepmem.EVENTS_REPORTED))
+    if entries:
+        sleepmem.store(sleepmem.EVENTS_REPORTED, entries[-1][0])
+    return entries
+
+
+def dump() -> None:
+    """
+    Print the raw ring as hexadecimal string, to be decoded by decode().
+    """
+    print("".join(f"{byte:02x}" for byte in _NVM[EVENTS_OFFSET:EVENTS_END]))
+
+
+def format_entry(entry: tuple) -> str:
+    """
+    Return human readable representation of the entry.
+    """
+    seq, event_type, detail, wakes = entry
+    names: tuple = ()
+    if event_type in (RESET, HARD_RESET):
+        names = RESET_REASONS if event_type == RESET else EXCEPTION_NAMES
+    elif event_type == SAFE_MODE:
+        names = SAFE_MODE_REASONS
+    elif event_type in (EXCEPTION, RELOAD):
+        names = EXCEPTION_NAMES
+
+    detail_str = names[detail] if detail < len(names) else str(detail)
+    return (
+        f"{seq}: {EVENT_NAMES.get(event_type, str(event_type))} "
+        f"{detail_str} (wake {wakes})"
+    )
+
+
+def decode(data: bytes) -> list:
+    """
+    Decode the raw ring (as produced by dump()) into list of entries,
+    ordered by sequence number.
+    """
+    if struct.unpack_from(_MAGIC_FMT, data, 0)[0] != _MAGIC:
+        raise ValueError("not an event ring")
+
+    entries = []
+    for offset in range(
+        struct.calcsize(_MAGIC_FMT), len(data) - ENTRY_SIZE + 1, ENTRY_SIZE
+    ):
+        entry = struct.unpack_from(ENTRY_FMT, data, offset)
+        if entry[0] != 0:
+            entries.append(entry)
+    return sorted(entries)
+
+
+def main():
+    """
+    Decode the dump (hexadecimal string) given as file or on standard input.
+    """
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="ascii") as file_obj:
+            text = file_obj.read()
+    else:
+        text = sys.stdin.read()
+
+    for entry in decode(bytes.fromhex(text.strip())):
+        print(format_entry(entry))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Sensors with fake devices, for the tests.
+"""
+
+from unittest.mock import Mock
+
+import sensors as sensors_module
+from sensors import Sensors
+
+
+def _driver(sensor, error):
+    """
+    Return driver class mock that returns the sensor, or raises the error
+    (as if the device was not found) if the sensor is None.
+    """
+    if sensor is None:
+        return Mock(side_effect=error("device not found"))
+    return Mock(return_value=sensor)
+
+
+# pylint: disable=too-many-arguments
+def make_sensors(
+    monkeypatch,
+    *,
+    tmp117=None,
+    sht40=None,
+    aht20=None,
+    bme280=None,
+    scd4x=None,
+    stcc4=None,
+    veml7700=None,
+    **kwargs,
+) -> Sensors:
+    """
+    Create Sensors through __init__ with the driver modules patched, so that the given
+    sensor objects are found on the bus and the sensors not given are missing.
+    The rest of the keyword arguments is passed to the Sensors constructor.
+    """
+    drivers = {
+        "adafruit_tmp117": Mock(TMP117=_driver(tmp117, ValueError)),
+        "adafruit_sht4x": Mock(SHT4x=_driver(sht40, ValueError)),
+        "adafruit_ahtx0": Mock(AHTx0=_driver(aht20, ValueError)),
+        "adafruit_bme280": Mock(Adafruit_BME280_I2C=_driver(bme280, ValueError)),
+        "adafruit_scd4x": Mock(SCD4X=_driver(scd4x, ValueError)),
+        "adafruit_stcc4": Mock(STCC4=_driver(stcc4, RuntimeError)),
+        "adafruit_veml7700": Mock(VEML7700=_driver(veml7700, ValueError)),
+    }
+    for name, driver in drivers.items():
+        monkeypatch.setattr(sensors_module, name, driver, raising=False)
+    return Sensors(Mock(), **kwargs)
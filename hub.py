@@ -0,0 +1,315 @@
+"""
+Daemon for single board computer hubs (e.g. Raspberry Pi with Blinka) with multiple I2C buses
+and I2C multiplexers (TCA9548A), each bus or multiplexer channel having its own set of sensors.
+
+Each sensor group is read by its own Sensors instance and published to its own MQTT topic
+over single shared MQTT connection. The groups are sampled concurrently on a thread pool,
+so the time it takes to sample all the groups is given by the slowest bus rather than
+the sum of all the groups. The groups behind the same bus (i.e. on different channels
+of multiplexer) are sampled one after another as the bus can be switched to single channel
+at a time. The publishing is done from the main thread as MiniMQTT is not thread safe.
+
+The configuration is kept in single JSON file, e.g.:
+
+  {
+    "log_level": "info",
+    "broker": "broker.local",
+    "sample_interval": 60,
+    "groups": [
+      {"mqtt_topic": "devices/greenhouse", "bus": 1},
+      {"mqtt_topic": "devices/cellar", "bus": 3, "mux": 112, "channel": 0},
+      {"mqtt_topic": "devices/garage", "bus": 3, "mux": 112, "channel": 1,
+       "sensor_profiles": {"veml7700": "auto"}}
+    ]
+  }
+
+The buses are opened with the adafruit_extended_bus library (by the number of /dev/i2c-N)
+and the multiplexers with the adafruit_tca9548a library. To run the daemon:
+
+  python3 hub.py hub.json
+"""
+
+import json
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import adafruit_logging as logging
+
+from confchecks import (
+    ConfCheckException,
+    check_bool,
+    check_int,
+    check_list,
+    check_sensor_profiles,
+    check_string,
+)
+from connection import CONNECTION_ERRORS, ConnectionManager
+from logutil import get_log_level
+from mqtt import mqtt_client_setup
+
+# pylint: disable=unused-wildcard-import, wildcard-import
+from names import *
+from payload import FORMATS, JSON
+from payload import encode as encode_payload
+from payload import topic as payload_topic
+from sensorhealth import READ_ERRORS
+from sensors import Sensors, measurements_to_dict
+from tls import create_context, tls_enabled
+
+GROUPS = "groups"
+BUS = "bus"
+MUX = "mux"
+CHANNEL = "channel"
+WORKERS = "workers"
+
+DEFAULT_BUS = 1
+DEFAULT_SAMPLE_INTERVAL = 60
+# Upper bound of single MQTT loop call while waiting for the next sample,
+# to keep the connection alive.
+LOOP_TIMEOUT = 10
+
+
+# pylint: disable=too-few-public-methods
+class Group:
+    """
+    Set of sensors on single bus or multiplexer channel, published to single topic.
+    """
+
+    def __init__(self, topic: str, sensors, bus_lock) -> None:
+        """
+        :param bus_lock: lock shared by all the groups on the same bus
+        """
+        self.topic = topic
+        self.sensors = sensors
+        self.bus_lock = bus_lock
+
+
+def check_config(config: dict) -> None:
+    """
+    Check the hub configuration. Raise ConfCheckException on error.
+    """
+    check_string(config, LOG_LEVEL, mandatory=False)
+    check_string(config, BROKER)
+    check_int(config, BROKER_PORT, min_val=0, max_val=65535, mandatory=False)
+    check_bool(config, BROKER_TLS, mandatory=False)
+    check_string(config, BROKER_CA, mandatory=False)
+    check_string(config, MQTT_PAYLOAD_FORMAT, mandatory=False)
+    if config.get(MQTT_PAYLOAD_FORMAT, JSON) not in FORMATS:
+        raise ConfCheckException(
+            f"value of {MQTT_PAYLOAD_FORMAT} must be one of {FORMATS}"
+        )
+    check_int(config, SAMPLE_INTERVAL, min_val=1, mandatory=False)
+    check_int(config, WORKERS, min_val=1, mandatory=False)
+
+    check_list(config, GROUPS, dict)
+    if not config[GROUPS]:
+        raise ConfCheckException(f"{GROUPS} is empty")
+    for group in config[GROUPS]:
+        check_string(group, MQTT_TOPIC)
+        check_int(group, BUS, min_val=0, mandatory=False)
+        check_int(group, MUX, min_val=0, max_val=127, mandatory=False)
+        check_int(
+            group, CHANNEL, min_val=0, max_val=7, mandatory=group.get(MUX) is not None
+        )
+        check_sensor_profiles(group)
+
+
+def open_bus(number: int):
+    """
+    Open the I2C bus /dev/i2c-<number>.
+    """
+    # pylint: disable=import-outside-toplevel,import-error
+    from adafruit_extended_bus import ExtendedI2C
+
+    return ExtendedI2C(number)
+
+
+def open_mux(i2c, address: int):
+    """
+    Open the TCA9548A multiplexer on given bus.
+    """
+    # pylint: disable=import-outside-toplevel,import-error
+    import adafruit_tca9548a
+
+    return adafruit_tca9548a.TCA9548A(i2c, address=address)
+
+
+def build_groups(config: dict, bus_opener=open_bus, mux_opener=open_mux) -> list:
+    """
+    Open the buses and multiplexers and initialize the sensors of each group.
+    Return list of Group objects.
+    """
+    buses: dict = {}
+    locks: dict = {}
+    muxes: dict = {}
+    groups = []
+    for group_config in config[GROUPS]:
+        number = group_config.get(BUS, DEFAULT_BUS)
+        if number not in buses:
+            buses[number] = bus_opener(number)
+            locks[number] = threading.Lock()
+        i2c = buses[number]
+
+        mux_address = group_config.get(MUX)
+        if mux_address is not None:
+            if (number, mux_address) not in muxes:
+                muxes[(number, mux_address)] = mux_opener(i2c, mux_address)
+            i2c = muxes[(number, mux_address)][group_config[CHANNEL]]
+
+        topic = group_config[MQTT_TOPIC]
+        logging.getLogger("").info(f"Initializing sensors for {topic}")
+        sensors = Sensors(
+            i2c,
+            light_gain=group_config.get(LIGHT_GAIN),
+            profiles=group_config.get(SENSOR_PROFILES),
+            # The sensors of each group have their own health and auto-ranging state.
+            memory={},
+        )
+        groups.append(Group(topic, sensors, locks[number]))
+    return groups
+
+
+def _sample(group: Group) -> tuple:
+    with group.bus_lock:
+        return group.sensors.get_measurements()
+
+
+class Hub:
+    """
+    Samples the sensor groups concurrently and publishes them over single MQTT connection.
+    """
+
+    def __init__(
+        self,
+        groups: list,
+        mqtt_client,
+        payload_format: str = JSON,
+        workers: int | None = None,
+    ) -> None:
+        """
+        :param workers: number of threads sampling the groups, by default one per bus
+        """
+        self.groups = groups
+        self.mqtt_client = mqtt_client
+        self.payload_format = payload_format
+        if workers is None:
+            workers = len({id(group.bus_lock) for group in groups})
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def sample(self) -> list:
+        """
+        Sample all the groups concurrently. Return list of (group, measurements) tuples
+        in the order of completion. Groups that failed to be sampled are skipped.
+        """
+        logger = logging.getLogger("")
+
+        futures = {self.executor.submit(_sample, group): group for group in self.groups}
+        results = []
+        for future in as_completed(futures):
+            group = futures[future]
+            try:
+                results.append((group, future.result()))
+            except READ_ERRORS as exception:
+                logger.error(f"Failed to sample {group.topic}: {exception}")
+        return results
+
+    def publish(self, results: list) -> None:
+        """
+        Publish the measurements of each group to its topic.
+        """
+        native = self.payload_format != JSON
+        for group, measurements in results:
+            humidity, temperature, co2_ppm, lux = measurements
+            data = measurements_to_dict(humidity, temperature, co2_ppm, lux, native)
+            if not data:
+                continue
+            self.mqtt_client.publish(
+                payload_topic(group.topic, self.payload_format),
+                encode_payload(data, self.payload_format),
+            )
+
+    def _wait(self, until: float) -> None:
+        """
+        Keep the MQTT connection alive until given time.
+        """
+        while True:
+            remaining = until - time.monotonic()
+            if remaining <= 0:
+                return
+            self.mqtt_client.loop(max(1, min(LOOP_TIMEOUT, remaining)))
+
+    def run(self, interval: float, connection, iterations: int | None = None) -> None:
+        """
+        Sample and publish the groups every interval seconds,
+        recovering the MQTT connection on failure.
+        """
+        logger = logging.getLogger("")
+
+        next_time = time.monotonic()
+        count = 0
+        while iterations is None or count < iterations:
+            start = time.monotonic()
+            results = self.sample()
+            logger.debug(
+                f"Sampled {len(results)} groups in {time.monotonic() - start:.2f} seconds"
+            )
+            try:
+                self.publish(results)
+                connection.succeeded()
+                next_time += interval
+                self._wait(next_time)
+            except CONNECTION_ERRORS as exception:
+                connection.recover(exception)
+            count += 1
+
+
+def main():
+    """
+    Run the hub daemon with the configuration file given on the command line.
+    """
+    if len(sys.argv) != 2:
+        print(f"usage: {sys.argv[0]} config.json")
+        sys.exit(1)
+
+    with open(sys.argv[1], encoding="utf-8") as config_file:
+        config = json.load(config_file)
+    try:
+        check_config(config)
+    except ConfCheckException as exception:
+        print(f"Invalid configuration: {exception}")
+        sys.exit(1)
+
+    logger = logging.getLogger("")
+    log_level = get_log_level(config.get(LOG_LEVEL))
+    logger.setLevel(log_level)
+
+    groups = build_groups(config)
+
+    broker_port = config.get(BROKER_PORT, 1883)
+    ssl_context = None
+    if tls_enabled(config.get(BROKER_TLS), broker_port):
+        ssl_context = create_context(config.get(BROKER_CA))
+    mqtt_client = mqtt_client_setup(
+        socket, config[BROKER], broker_port, log_level, ssl_context=ssl_context
+    )
+    logger.info(f"Connecting to MQTT broker {config[BROKER]}:{broker_port}")
+    mqtt_client.connect()
+
+    hub = Hub(
+        groups,
+        mqtt_client,
+        config.get(MQTT_PAYLOAD_FORMAT, JSON),
+        config.get(WORKERS),
+    )
+    # The daemon is expected to be restarted by the service manager on failure.
+    hub.run(
+        config.get(SAMPLE_INTERVAL, DEFAULT_SAMPLE_INTERVAL),
+        ConnectionManager(mqtt_client),
+    )
+
+
+if __name__ == "__main__":
+    main()
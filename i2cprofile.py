@@ -0,0 +1,186 @@
+"""
+Profiling proxy for the I2C bus.
+
+The proxy wraps the I2C bus object handed to the sensor drivers and counts the transactions,
+bytes transferred, errors and time spent per device address, so that drivers doing redundant
+register reads stand out. The statistics cover single wake (or main loop iteration
+when not running on battery) and are logged as compact summary.
+
+The proxy works with any object with the busio.I2C interface, so it can be used
+in CPython with fake bus to profile the access patterns of the drivers.
+"""
+
+import time
+
+try:
+    from typing import Dict
+except ImportError:
+    pass
+
+import adafruit_logging as logging
+
+# Default addresses of the supported devices, for the summary.
+DEVICE_NAMES = {
+    0x10: "VEML7700",
+    0x36: "MAX17048",
+    0x38: "AHT20",
+    0x44: "SHT40",
+    0x48: "TMP117",
+    0x62: "SCD4x",
+    0x64: "STCC4",
+    0x77: "BME280",
+}
+
+
+def _end(buffer, end: int | None) -> int:
+    # The native busio.I2C accepts only int end, so None is replaced by the buffer length.
+    return len(buffer) if end is None else end
+
+
+def _length(buffer, start: int, end: int) -> int:
+    return max(0, min(end, len(buffer)) - start)
+
+
+# pylint: disable=too-few-public-methods
+class DeviceStats:
+    """
+    Transaction statistics of single device address.
+    """
+
+    def __init__(self) -> None:
+        self.transactions = 0
+        self.written = 0
+        self.read = 0
+        self.errors = 0
+        self.time_ns = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.transactions} transactions, {self.written} B written, "
+            f"{self.read} B read, {self.errors} errors, {self.time_ns / 1e6:.2f} ms"
+        )
+
+
+class I2CProfiler:
+    """
+    Proxy of I2C bus object that keeps statistics of the transactions.
+    """
+
+    def __init__(self, i2c) -> None:
+        self.i2c = i2c
+        self.stats: Dict[int, DeviceStats] = {}
+
+    def reset(self) -> None:
+        """
+        Start new statistics.
+        """
+        self.stats = {}
+
+    def _account(self, address: int, written: int, read: int, func, *args, **kwargs):
+        stats = self.stats.get(address)
+        if stats is None:
+            stats = self.stats[address] = DeviceStats()
+        stats.transactions += 1
+        start = time.monotonic_ns()
+        try:
+            return func(*args, **kwargs)
+        except OSError:
+            stats.errors += 1
+            raise
+        finally:
+            stats.time_ns += time.monotonic_ns() - start
+            stats.written += written
+            stats.read += read
+
+    def readfrom_into(self, address: int, buffer, *, start: int = 0, end=None):
+        """
+        Read from device with given address into the buffer.
+        """
+        end = _end(buffer, end)
+        return self._account(
+            address,
+            0,
+            _length(buffer, start, end),
+            self.i2c.readfrom_into,
+            address,
+            buffer,
+            start=start,
+            end=end,
+        )
+
+    def writeto(self, address: int, buffer, *, start: int = 0, end=None):
+        """
+        Write the buffer to device with given address.
+        """
+        end = _end(buffer, end)
+        return self._account(
+            address,
+            _length(buffer, start, end),
+            0,
+            self.i2c.writeto,
+            address,
+            buffer,
+            start=start,
+            end=end,
+        )
+
+    # pylint: disable=too-many-arguments
+    def writeto_then_readfrom(
+        self,
+        address: int,
+        out_buffer,
+        in_buffer,
+        *,
+        out_start: int = 0,
+        out_end=None,
+        in_start: int = 0,
+        in_end=None,
+    ):
+        """
+        Write the output buffer to device with given address and read into the input buffer
+        in single transaction (repeated start).
+        """
+        out_end = _end(out_buffer, out_end)
+        in_end = _end(in_buffer, in_end)
+        return self._account(
+            address,
+            _length(out_buffer, out_start, out_end),
+            _length(in_buffer, in_start, in_end),
+            self.i2c.writeto_then_readfrom,
+            address,
+            out_buffer,
+            in_buffer,
+            out_start=out_start,
+            out_end=out_end,
+            in_start=in_start,
+            in_end=in_end,
+        )
+
+    def __getattr__(self, name: str):
+        # try_lock(), unlock(), scan(), deinit() etc. are passed through.
+        return getattr(self.i2c, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.i2c.deinit()
+
+    def summary(self) -> str:
+        """
+        Return the statistics, one device per line.
+        """
+        lines = []
+        for address, stats in sorted(self.stats.items()):
+            name = DEVICE_NAMES.get(address, "unknown")
+            lines.append(f"0x{address:02x} ({name}): {stats}")
+        return "\n".join(lines)
+
+    def log_summary(self) -> None:
+        """
+        Log the statistics.
+        """
+        logger = logging.getLogger("")
+        for line in self.summary().split("\n"):
+            if line:
+                logger.info(f"I2C {line}")
@@ -0,0 +1,157 @@
+"""
+Log message templates, generated by codedlog.py.
+"""
+
+TABLE_HASH = 0x68A9
+
+TEMPLATES = (
+    ("Temperature alert window: ", " - ", ""),
+    ("Battery voltage alert window: ", " - ", ""),
+    ("No sensor with alert output, cannot use event driven wake",),
+    ("Failed to program the alerts: ", ""),
+    ("Alert line on ", " is asserted, not arming pin alarm"),
+    ("Cannot use alert pin ", ": ", ""),
+    ("Recovered backlog sequence number ", ""),
+    ("Stored measurement to the backlog, ", " pending"),
+    ("Flushing ", " records from the backlog"),
+    ("Cannot write to the backlog: ", ""),
+    ("Creating backlog file ", ""),
+    ("Backlog record ", " corrupted, skipping"),
+    ("Advertising ", " for ", " s"),
+    ("Running, wake ", ""),
+    ("Woken up by sensor alert",),
+    ("Reset reason: ", ""),
+    ("Sensor failures in a row: ", ""),
+    ("Aggregating the samples over ", " seconds"),
+    ("Relaying frames from nodes ", ""),
+    ("Opening maintenance window: ", ""),
+    ("No library for battery gauge (max17048)",),
+    ("Event ", ""),
+    ("Battery capacity ", " %"),
+    ("Running on battery power, breaking out",),
+    ("Relaying frames for ", " seconds"),
+    ("Serving metrics for ", " seconds"),
+    ("Waiting for MQTT event with timeout ", " seconds"),
+    ("Sleeping for ", " seconds"),
+    ("Connection failure ", "/", ": ", ", reconnecting in ", " seconds"),
+    ("Reconnected to the MQTT broker",),
+    ("Giving up reconnecting after ", " failures"),
+    ("Packing data: ", ""),
+    ("No time left to flush the rest of the backlog",),
+    ("Raw data to be sent: ", ""),
+    ("Publishing aggregated data to ", ": ", ""),
+    ("Radio transmission timed out",),
+    ("Publishing to ", ": ", ""),
+    ("No sensor data aggregated, will not publish",),
+    ("Airtime budget exhausted, deferring the transmission",),
+    ("No sensor data available, will not publish",),
+    ("No sensor data available, will not send anything",),
+    ("Sending backlog record from ", ", age ", " min"),
+    ("No sensor data available, will not advertise anything",),
+    ("No way to send the data, storing them to the backlog",),
+    ("No way to send the data",),
+    ("Failed to publish backlog record: ", ""),
+    ("Applying configuration overrides: ", ""),
+    ("Received configuration overrides: ", ""),
+    ("No downlink frame received",),
+    ("Ignoring frame from node ", ""),
+    ("Maintenance window requested by the gateway",),
+    ("Invalid configuration overrides: ", ""),
+    ("Malformed downlink frame: ", ""),
+    ("Bridging ESP-NOW frames received on ", ", channel ", ""),
+    ("No ACK from ", ""),
+    ("Ignoring frame of unknown format from ", ""),
+    ("Dropping duplicate frame ", " from ", ""),
+    ("Publishing frame from ", ""),
+    ("ESP-NOW send failed: ", ""),
+    ("Failed to send ACK to ", ": ", ""),
+    ("Connecting to MQTT broker ", ":", ""),
+    ("Initializing sensors for ", ""),
+    ("Sampled ", " groups in ", " seconds"),
+    ("Failed to sample ", ": ", ""),
+    ("I2C ", ""),
+    ("Cannot read maintenance pin ", ": ", ""),
+    ("Serving metrics on ", ":", ""),
+    ("Used ", " out of ", " seconds of airtime"),
+    ("Connected to MQTT Broker!",),
+    ("Flags: ", "\n RC: ", ""),
+    ("Disconnected from MQTT Broker!",),
+    ("Published to ", " with PID ", ""),
+    ("RSSI ", " dBm"),
+    ("Channel busy in ", " out of ", " checks"),
+    ("Channel busy, backing off for ", " seconds"),
+    ("Channel busy after ", " checks, sending anyway"),
+    ("Channel busy and no time left to back off, sending anyway",),
+    ("Ignoring frame of unknown format from node ", ""),
+    ("Dropping duplicate frame ", " from node ", ""),
+    ("Publishing frame from node ", ""),
+    ("Re-transmitting frame from node ", ", hop ", ""),
+    ("Frame from node ", " reached the hop limit"),
+    ("Metrics due: ", ""),
+    ("Failed to read ", " (", " failures in a row): ", ", disabled for ", " seconds"),
+    ("Sensor ", " recovered"),
+    ("Using ", " profile for ", ""),
+    ("VEML7700 count ", ", changing range ", " -> ", ""),
+    ("data: ", ""),
+    ("Acquired ", " from ", ""),
+    ("Temperature: ", " C"),
+    ("Humidity: ", " %"),
+    ("CO2 = ", " ppm"),
+    ("light = ", " lux"),
+    ("Sleeping for half second",),
+    ("TMP117 sensor initialized",),
+    ("SHT40 initialized",),
+    ("AHT20 sensor initialized",),
+    ("BME280 sensor initialized",),
+    ("SCD-40 sensor initialized",),
+    ("STCC4 sensor initialized",),
+    ("No library for the tmp117 sensor",),
+    ("No TMP117 sensor found: ", ""),
+    ("No library for the sht40 sensor",),
+    ("No SHT40 sensor found: ", ""),
+    ("No library for the ath20 sensor",),
+    ("No AHT20 sensor found: ", ""),
+    ("No library for the bme280 sensor",),
+    ("No BME280 sensor found: ", ""),
+    ("Waiting for the first measurement from the SCD-40 sensor",),
+    ("cannot find SCD4x sensor: ", ""),
+    ("No library for the SCD4x sensor",),
+    ("Starting continuous measurement on STCC4 sensor...",),
+    ("cannot find STCC4 sensor: ", ""),
+    ("No library for the STCC4 sensor",),
+    ("Setting light gain to ", ""),
+    ("cannot find VEML7700 sensor: ", ""),
+    ("No library for the VEML7700 sensor",),
+    ("SCD4x data not ready within the time budget, skipping",),
+    ("CO2 ppm=", ""),
+    ("number of sleep values has to be 1 or match the number of nodes",),
+    ("Going to ", " sleep for ", " seconds"),
+    ("time now: ", ""),
+    ("alarm time: ", ""),
+    ("Will also wake on sensor alert",),
+    ("Adding ", " seconds of sleep jitter"),
+    ("Connecting to wifi with timeout ", " seconds"),
+    ("Connected to ", ""),
+    ("IP: ", ""),
+    ("SSL context takes ", " bytes of heap"),
+    ("MAC address: ", ""),
+    ("Attempting to connect to MQTT broker ", ":", ""),
+    ("Setting up ESP-NOW link to ", ""),
+    ("Setting up BLE advertising for ", " seconds"),
+    ("", " not set in secrets, no Wi-Fi fallback"),
+    ("", " not set in secrets, no WiFi fallback"),
+    ("Broker port not set in secrets, using default value of ", ""),
+    ("Setting up RFM69",),
+    ("will attempt to connect to Wi-Fi",),
+    ("ESP-NOW failed to initialize: ", ""),
+    ("BLE failed to initialize: ", ""),
+    ("Using modem profile ", ""),
+    ("Setting TX power to ", ""),
+    ("Setting RFM69 node address to ", ""),
+    ("Setting RFM69 destination to ", ""),
+    ("Setting encryption key",),
+    ("RFM69 failed to initialize: ", ""),
+    ("ACK missed, raising TX power to ", " dBm"),
+    ("Estimated RSSI at the gateway ", " dBm, margin ", " dB"),
+    ("Changing TX power from ", " to ", " dBm"),
+)
@@ -0,0 +1,65 @@
+"""
+On-demand maintenance window.
+
+Battery powered node goes to deep sleep right after sending the data. To allow breaking
+into the REPL (via USB serial console or web workflow), the node stays awake
+in light sleep for a while only if it was asked to:
+
+  - USB host is connected (the node is at the desk rather than in the field)
+  - the maintenance pin (e.g. the BOOT button, active low) is held at wake
+  - the gateway requested it, which sets a flag in sleep memory for the next wake
+"""
+
+import adafruit_logging as logging
+
+import sleepmem
+
+# pylint: disable=import-error
+try:
+    import board
+    import digitalio
+    import supervisor
+except ImportError:
+    pass  # for testing
+
+DEFAULT_WINDOW_DURATION = 10
+
+
+def request_maintenance() -> None:
+    """
+    Open the maintenance window on the next wake.
+    """
+    sleepmem.store(sleepmem.MAINTENANCE_REQUESTED, 1)
+
+
+def pin_held(pin_name: str) -> bool:
+    """
+    Return True if the (active low) button on the board pin with given name is held.
+    """
+    with digitalio.DigitalInOut(getattr(board, pin_name)) as button:
+        button.switch_to_input(pull=digitalio.Pull.UP)
+        return not button.value
+
+
+def maintenance_reason(pin_name: str | None = None) -> str | None:
+    """
+    Return the reason for opening the maintenance window, or None if it was not requested.
+    The request from the gateway is consumed.
+    """
+    logger = logging.getLogger("")
+
+    if sleepmem.load(sleepmem.MAINTENANCE_REQUESTED):
+        sleepmem.store(sleepmem.MAINTENANCE_REQUESTED, 0)
+        return "requested by the gateway"
+
+    if pin_name:
+        try:
+            if pin_held(pin_name):
+                return f"pin {pin_name} held"
+        except (AttributeError, ValueError) as exc:
+            logger.warning(f"Cannot read maintenance pin {pin_name}: {exc}")
+
+    if supervisor.runtime.usb_connected:
+        return "USB connected"
+
+    return None
@@ -0,0 +1,243 @@
+"""
+Lightweight HTTP endpoint serving the last sensor readings.
+
+Meant for devices not running on battery power. The readings are taken
+from a cache refreshed by the main loop so that serving a request
+never triggers I2C transaction. The server is non-blocking and is polled from the main loop,
+handling multiple clients at once.
+
+The readings are available in OpenMetrics text format on /metrics and in JSON on /json.
+"""
+
+import json
+import time
+
+try:
+    from typing import Dict
+except ImportError:
+    pass
+
+import adafruit_logging as logging
+
+METRIC_PREFIX = "shield_"
+
+# Clients that do not complete the request within this many seconds are disconnected.
+CLIENT_TIMEOUT = 5
+MAX_CLIENTS = 4
+REQUEST_BUFFER_SIZE = 512
+
+# How often to poll the server when waiting, in seconds.
+POLL_INTERVAL = 0.01
+# How often to service the MQTT client when waiting, in seconds.
+MQTT_LOOP_INTERVAL = 10
+
+
+class ReadingCache:
+    """
+    Last value of each metric, valid for given number of seconds.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._values: Dict[str, tuple] = {}
+
+    def update(self, name: str, value) -> None:
+        """
+        Store the value of the metric. None values are ignored.
+        """
+        if value is not None:
+            self._values[name] = (value, time.monotonic())
+
+    def update_measurements(self, humidity, temperature, co2_ppm, lux) -> None:
+        """
+        Store the values as returned from Sensors.get_measurements().
+        """
+        self.update("temperature", temperature)
+        self.update("humidity", humidity)
+        self.update("co2_ppm", co2_ppm)
+        self.update("lux", lux)
+
+    def get(self, name: str):
+        """
+        Return the value of the metric or None if not present or expired.
+        """
+        entry = self._values.get(name)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            return None
+        return entry[0]
+
+    def snapshot(self) -> Dict:
+        """
+        Return dictionary with all the values that have not expired.
+        """
+        data = {}
+        for name in self._values:
+            value = self.get(name)
+            if value is not None:
+                data[name] = value
+        return data
+
+
+def render_openmetrics(data: Dict) -> str:
+    """
+    Render the metrics in the OpenMetrics text format.
+    """
+    lines = []
+    for name, value in data.items():
+        lines.append(f"# TYPE {METRIC_PREFIX}{name} gauge")
+        lines.append(f"{METRIC_PREFIX}{name} {value}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def _response(status: str, content_type: str, body: str) -> bytes:
+    body_bytes = body.encode("utf-8")
+    return (
+        f"HTTP/1.1 {status}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body_bytes)}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode("ascii") + body_bytes
+
+
+# pylint: disable=too-few-public-methods
+class _Client:
+    """
+    State of single client connection.
+    """
+
+    def __init__(self, sock) -> None:
+        self.sock = sock
+        self.start = time.monotonic()
+        self.request = bytearray(REQUEST_BUFFER_SIZE)
+        self.received = 0
+        self.response = b""
+        self.sent = 0
+
+
+class MetricsServer:
+    """
+    Non-blocking HTTP server. The poll() method has to be called periodically.
+    """
+
+    def __init__(self, pool, cache: ReadingCache, port: int, host: str = "0.0.0.0"):
+        self._pool = pool
+        self._cache = cache
+        self._clients: list = []
+
+        self._sock = pool.socket(pool.AF_INET, pool.SOCK_STREAM)
+        try:
+            self._sock.setsockopt(pool.SOL_SOCKET, pool.SO_REUSEADDR, 1)
+        except (AttributeError, OSError):
+            pass  # not supported by given CircuitPython version
+        self._sock.bind((host, port))
+        self._sock.listen(MAX_CLIENTS)
+        self._sock.setblocking(False)
+
+        logging.getLogger("").info(f"Serving metrics on {host}:{port}")
+
+    def close(self) -> None:
+        """
+        Close the listening socket and all the client connections.
+        """
+        for client in self._clients:
+            client.sock.close()
+        self._clients = []
+        self._sock.close()
+
+    def _accept(self) -> None:
+        while len(self._clients) < MAX_CLIENTS:
+            try:
+                sock, _ = self._sock.accept()
+            except OSError:
+                return  # no pending connection
+            sock.setblocking(False)
+            self._clients.append(_Client(sock))
+
+    def _build_response(self, request: bytes) -> bytes:
+        try:
+            method, path = request.split(b" ", 2)[:2]
+        except ValueError:
+            return _response("400 Bad Request", "text/plain", "bad request\n")
+
+        if method != b"GET":
+            return _response("405 Method Not Allowed", "text/plain", "GET only\n")
+
+        if path == b"/metrics":
+            return _response(
+                "200 OK",
+                "application/openmetrics-text; version=1.0.0; charset=utf-8",
+                render_openmetrics(self._cache.snapshot()),
+            )
+        if path == b"/json":
+            return _response(
+                "200 OK", "application/json", json.dumps(self._cache.snapshot())
+            )
+
+        return _response("404 Not Found", "text/plain", "not found\n")
+
+    def _receive(self, client: _Client) -> bool:
+        """
+        Read the request. Return False if the connection should be closed.
+        """
+        view = memoryview(client.request)
+        try:
+            size = client.sock.recv_into(view[client.received :])
+        except OSError:
+            return True  # no data yet
+        if size == 0:
+            return False
+        client.received += size
+
+        request = bytes(view[: client.received])
+        if b"\r\n\r\n" in request or client.received == len(client.request):
+            client.response = self._build_response(request)
+        return True
+
+    def _send(self, client: _Client) -> bool:
+        """
+        Send as much of the response as possible.
+        Return False once the response is sent completely.
+        """
+        try:
+            client.sent += client.sock.send(client.response[client.sent :])
+        except OSError:
+            return True  # cannot send now
+        return client.sent < len(client.response)
+
+    def poll(self) -> None:
+        """
+        Accept new connections and make progress on the existing ones without blocking.
+        """
+        self._accept()
+
+        active = []
+        for client in self._clients:
+            if not client.response:
+                keep = self._receive(client)
+            else:
+                keep = self._send(client)
+
+            if keep and time.monotonic() - client.start > CLIENT_TIMEOUT:
+                keep = False
+            if keep:
+                active.append(client)
+            else:
+                client.sock.close()
+        self._clients = active
+
+
+def serve_for(server: MetricsServer, duration: float, mqtt_client=None) -> None:
+    """
+    Serve the metrics for given number of seconds, servicing the MQTT client in between.
+    """
+    end = time.monotonic() + duration
+    last_loop = time.monotonic()
+    while time.monotonic() < end:
+        server.poll()
+        if mqtt_client and time.monotonic() - last_loop >= MQTT_LOOP_INTERVAL:
+            # This will block for up to the socket timeout.
+            mqtt_client.loop(timeout=1)
+            last_loop = time.monotonic()
+        else:
+            time.sleep(POLL_INTERVAL)
@@ -0,0 +1,185 @@
+"""
+RFM69 modem profiles, frame airtime and duty cycle accounting.
+
+The profiles trade range against airtime (and hence energy per frame):
+lower bitrate with narrower receiver bandwidth gives better sensitivity
+at the cost of longer transmission. The gateway has to use the same profile.
+
+The duty cycle ledger keeps track of the airtime used within sliding window
+(leaky bucket kept in sleep memory) so that the node stays within the duty cycle limit
+of the band (e.g. 10 % in the EU 433 MHz band).
+"""
+
+import math
+import time
+
+import adafruit_logging as logging
+
+import sleepmem
+
+# Defaults of the adafruit_rfm69 library.
+RFM69_BITRATE = 250000
+RFM69_PREAMBLE_LEN = 4
+RFM69_SYNC_WORD_LEN = 2
+# RadioHead compatible header (to, from, id, flags) prepended by adafruit_rfm69.
+RFM69_HEADER_LEN = 4
+RFM69_CRC_LEN = 2
+# Block size of the AES encryption performed by the radio.
+RFM69_AES_BLOCK_LEN = 16
+# Crystal oscillator frequency, used to compute the receiver bandwidth settings.
+RFM69_FXOSC = 32000000
+
+BITRATE = "bitrate"
+FREQUENCY_DEVIATION = "frequency_deviation"
+PREAMBLE_LENGTH = "preamble_length"
+RX_BANDWIDTH = "rx_bandwidth"
+
+DEFAULT_PROFILE = "fast"
+# The (single side) receiver bandwidth has to cover the deviation plus half the bitrate
+# plus the frequency offset of the crystals.
+PROFILES = {
+    # The adafruit_rfm69 defaults.
+    "fast": {
+        BITRATE: 250000,
+        FREQUENCY_DEVIATION: 250000,
+        PREAMBLE_LENGTH: 4,
+        RX_BANDWIDTH: 500000,
+    },
+    "balanced": {
+        BITRATE: 55555,
+        FREQUENCY_DEVIATION: 50000,
+        PREAMBLE_LENGTH: 4,
+        RX_BANDWIDTH: 166000,
+    },
+    "long_range": {
+        BITRATE: 4800,
+        FREQUENCY_DEVIATION: 9600,
+        PREAMBLE_LENGTH: 8,
+        RX_BANDWIDTH: 31250,
+    },
+}
+
+# Receiver bandwidth mantissa values and their register encoding.
+_RX_BW_MANTISSAS = ((16, 0), (20, 1), (24, 2))
+
+DUTY_CYCLE_WINDOW = 3600
+
+
+def frame_airtime(
+    payload_len: int,
+    bitrate: float = RFM69_BITRATE,
+    preamble_len: int = RFM69_PREAMBLE_LEN,
+    encrypted: bool = False,
+) -> float:
+    """
+    Compute the time (in seconds) it takes to transmit a frame with given payload
+    length using variable length packet format of the RFM69 radio.
+    """
+    body_len = RFM69_HEADER_LEN + payload_len
+    if encrypted:
+        # The encrypted part is padded to whole AES blocks.
+        body_len = math.ceil(body_len / RFM69_AES_BLOCK_LEN) * RFM69_AES_BLOCK_LEN
+    # The length byte is not part of the body.
+    frame_len = preamble_len + RFM69_SYNC_WORD_LEN + 1 + body_len + RFM69_CRC_LEN
+    return frame_len * 8 / bitrate
+
+
+def profile_airtime(profile: dict, payload_len: int, encrypted: bool = False) -> float:
+    """
+    Compute the airtime (in seconds) of frame with given payload length
+    sent with given modem profile.
+    """
+    return frame_airtime(
+        payload_len, profile[BITRATE], profile[PREAMBLE_LENGTH], encrypted
+    )
+
+
+def rx_bandwidth_settings(bandwidth: float) -> tuple:
+    """
+    Return the (mantissa register value, exponent) of the narrowest FSK receiver bandwidth
+    that is at least the given bandwidth in Hz.
+    """
+    best_bandwidth = 0.0
+    best = None
+    for exponent in range(8):
+        for mantissa, value in _RX_BW_MANTISSAS:
+            actual = RFM69_FXOSC / (mantissa * 2 ** (exponent + 2))
+            if actual >= bandwidth and (best is None or actual < best_bandwidth):
+                best_bandwidth = actual
+                best = (value, exponent)
+    if best is None:
+        raise ValueError(f"receiver bandwidth {bandwidth} too wide")
+    return best
+
+
+def apply_profile(rfm69, profile: dict) -> None:
+    """
+    Configure the radio with given modem profile.
+    """
+    rfm69.bitrate = profile[BITRATE]
+    rfm69.frequency_deviation = profile[FREQUENCY_DEVIATION]
+    rfm69.preamble_length = profile[PREAMBLE_LENGTH]
+    mantissa, exponent = rx_bandwidth_settings(profile[RX_BANDWIDTH])
+    rfm69.rx_bw_mantissa = mantissa
+    rfm69.rx_bw_exponent = exponent
+
+
+class DutyCycleLedger:
+    """
+    Airtime budget kept in sleep memory. The used airtime drains at the duty cycle rate
+    (leaky bucket) so the long term airtime is kept at the duty cycle,
+    with bursts of up to the budget of single window.
+    """
+
+    def __init__(
+        self,
+        duty_cycle: float,
+        profile: dict,
+        encrypted: bool = False,
+        window: float = DUTY_CYCLE_WINDOW,
+    ) -> None:
+        """
+        :param duty_cycle: the maximum ratio of the time spent transmitting, in percent
+        """
+        self.ratio = duty_cycle / 100
+        self.budget = self.ratio * window
+        self.profile = profile
+        self.encrypted = encrypted
+
+    def airtime(self, payload_len: int) -> float:
+        """
+        Return the airtime (in seconds) of frame with given payload length.
+        """
+        return profile_airtime(self.profile, payload_len, self.encrypted)
+
+    def used(self, now: int | None = None) -> float:
+        """
+        Return the airtime (in seconds) counted against the budget at given time.
+        """
+        if now is None:
+            now = int(time.time())
+        last = sleepmem.load(sleepmem.DUTY_CYCLE_TIME)
+        used = sleepmem.load(sleepmem.DUTY_CYCLE_USED)
+        if now < last or math.isnan(used):
+            # The clock was set or the sleep memory garbled.
+            return 0.0
+        return max(0.0, used - (now - last) * self.ratio)
+
+    def allows(self, airtime: float, now: int | None = None) -> bool:
+        """
+        Return True if transmission of given airtime fits into the budget.
+        """
+        return self.used(now) + airtime <= self.budget
+
+    def record(self, airtime: float, now: int | None = None) -> None:
+        """
+        Count transmission of given airtime against the budget.
+        """
+        if now is None:
+            now = int(time.time())
+        used = self.used(now) + airtime
+        sleepmem.store(sleepmem.DUTY_CYCLE_USED, used)
+        sleepmem.store(sleepmem.DUTY_CYCLE_TIME, now)
+        logging.getLogger("").debug(
+            f"Used {used:.3f} out of {self.budget:.3f} seconds of airtime"
+        )
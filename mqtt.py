@@ -2,14 +2,15 @@
 MQTT utility functions
 """
 
-import ssl
-
 import adafruit_logging as logging
 import adafruit_minimqtt.adafruit_minimqtt as MQTT
 
 # Avoid infinite recursion by using non-default logger in the MQTT callbacks.
 MQTT_LOGGER_NAME = "mqtt"
 
+# The default of the MiniMQTT library.
+CONNECT_RETRIES = 5
+
 
 # pylint: disable=unused-argument, redefined-outer-name, invalid-name
 def connect(mqtt_client, userdata, flags, rc):
@@ -42,11 +43,20 @@ def publish(mqtt_client, userdata, topic: str, pid):
     logger.info(f"Published to {topic} with PID {pid}")
 
 
+# pylint: disable=too-many-arguments,too-many-positional-arguments
 def mqtt_client_setup(
-    pool, broker: str, port: int, log_level: int, socket_timeout=1
+    pool,
+    broker: str,
+    port: int,
+    log_level: int,
+    socket_timeout=1,
+    connect_retries: int = CONNECT_RETRIES,
+    ssl_context=None,
 ) -> MQTT.MQTT:
     """
-    Set up a MiniMQTT Client
+    Set up a MiniMQTT Client.
+    The connect_retries is the number of connect attempts (with exponential backoff)
+    made by each connect. The connection uses TLS if the SSL context is set.
     """
 
     logger = logging.getLogger(MQTT_LOGGER_NAME)
@@ -56,8 +66,10 @@ def mqtt_client_setup(
         broker=broker,
         port=port,
         socket_pool=pool,
-        ssl_context=ssl.create_default_context(),
+        is_ssl=ssl_context is not None,
+        ssl_context=ssl_context,
         socket_timeout=socket_timeout,
+        connect_retries=connect_retries,
     )
 
     # Connect callback handlers to mqtt_client
@@ -10,20 +10,30 @@ import adafruit_minimqtt.adafruit_minimqtt as MQTT
 # pylint: disable=no-name-in-module
 from adafruit_logging import NOTSET, Handler, LogRecord
 
+from deadline import Deadline
+
+# Estimated time in seconds needed to publish log message.
+# This corresponds to the socket timeout used in mqtt_client_setup().
+LOG_PUBLISH_TIME = 1
+
 
 class MQTTHandler(Handler):
     """
     Log handler that emits log records as MQTT PUBLISH messages.
     """
 
-    def __init__(self, mqtt_client: MQTT.MQTT, topic: str) -> None:
+    def __init__(
+        self, mqtt_client: MQTT.MQTT, topic: str, deadline: Deadline | None = None
+    ) -> None:
         """
         Assumes that the MQTT client object is already connected.
+        If the deadline is set, the log records will be dropped if the time budget is tight.
         """
         super().__init__()
 
         self._mqtt_client = mqtt_client
         self._topic = topic
+        self._deadline = deadline
 
         # To make it work also in CPython.
         self.level = NOTSET
@@ -32,10 +42,14 @@ class MQTTHandler(Handler):
         """
         Publish message from the LogRecord to the MQTT broker, if connected.
         """
+        if self._deadline and not self._deadline.allows(LOG_PUBLISH_TIME):
+            return
+
         try:
             if self._mqtt_client.is_connected():
                 self._mqtt_client.publish(self._topic, record.msg)
-        except MQTT.MMQTTException:
+        except (MQTT.MMQTTException, OSError):
+            # The connection is recovered elsewhere.
             pass
 
     # To make this work also in CPython's logging.
@@ -16,3 +16,36 @@ LOG_LEVEL = "log_level"
 TX_POWER = "tx_power"
 ENCRYPTION_KEY = "encryption_key"
 LIGHT_GAIN = "light_gain"
+LBT_RSSI_THRESHOLD = "lbt_rssi_threshold"
+LBT_MAX_ATTEMPTS = "lbt_max_attempts"
+SLEEP_JITTER = "sleep_jitter"
+AGGREGATION_WINDOW = "aggregation_window"
+SAMPLE_INTERVAL = "sample_interval"
+BACKLOG_SIZE = "backlog_size"
+METRICS_PORT = "metrics_port"
+METRICS_TTL = "metrics_ttl"
+SAMPLING_PERIODS = "sampling_periods"
+MQTT_PAYLOAD_FORMAT = "mqtt_payload_format"
+ALERT_PIN = "alert_pin"
+ALERT_TEMPERATURE_DELTA = "alert_temperature_delta"
+ALERT_BACKSTOP_DURATION = "alert_backstop_duration"
+RFM69_NODE = "rfm69_node"
+RELAY_NODES = "relay_nodes"
+RELAY_HOP_LIMIT = "relay_hop_limit"
+GATEWAY_NODE = "gateway_node"
+TX_POWER_TARGET_RSSI = "tx_power_target_rssi"
+GATEWAY_TX_POWER = "gateway_tx_power"
+MODEM_PROFILE = "modem_profile"
+DUTY_CYCLE = "duty_cycle"
+CONNECTION_FAILURE_BUDGET = "connection_failure_budget"
+MAINTENANCE_PIN = "maintenance_pin"
+DOWNLINK_TIMEOUT = "downlink_timeout"
+I2C_PROFILE = "i2c_profile"
+RADIO_LOG_LEVEL = "radio_log_level"
+BROKER_TLS = "broker_tls"
+BROKER_CA = "broker_ca"
+SENSOR_PROFILES = "sensor_profiles"
+ESPNOW_PEER = "espnow_peer"
+ESPNOW_CHANNEL = "espnow_channel"
+ESPNOW_ACK_TIMEOUT = "espnow_ack_timeout"
+BLE_ADVERTISE_DURATION = "ble_advertise_duration"
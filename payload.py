@@ -0,0 +1,259 @@
+"""
+Encoding of the MQTT payload.
+
+Besides the default JSON (with the values formatted as strings), the payload can be encoded
+with CBOR (RFC 8949) using native numeric types. This makes the payload smaller
+and cheaper to produce on the microcontroller and to parse at the consumer.
+The CBOR payload is published to the MQTT topic with the /cbor suffix
+so that the consumers can tell the encoding apart.
+
+The CBOR encoder handles only the subset of types used in the messages.
+The decoder is meant for the consumers running CPython. To compare the size
+and the time needed to encode the messages in either format, run:
+
+  python3 payload.py
+
+"""
+
+import json
+import math
+import struct
+import time
+
+try:
+    from typing import Dict
+except ImportError:
+    pass
+
+JSON = "json"
+CBOR = "cbor"
+FORMATS = (JSON, CBOR)
+
+CBOR_TOPIC_SUFFIX = "/cbor"
+
+# CBOR major types
+_UNSIGNED = 0
+_NEGATIVE = 1
+_BYTES = 2
+_TEXT = 3
+_ARRAY = 4
+_MAP = 5
+_SIMPLE = 7
+
+_FALSE = b"\xf4"
+_TRUE = b"\xf5"
+_NULL = b"\xf6"
+_FLOAT32 = 0xFA
+# Half precision NaN, the shortest encoding.
+_NAN = b"\xf9\x7e\x00"
+
+
+def topic(mqtt_topic: str, payload_format: str) -> str:
+    """
+    Return the MQTT topic to publish the payload of given format to.
+    """
+    if payload_format == CBOR:
+        return mqtt_topic + CBOR_TOPIC_SUFFIX
+    return mqtt_topic
+
+
+def encode(data: Dict, payload_format: str):
+    """
+    Encode the message in given format.
+    """
+    if payload_format == CBOR:
+        return cbor_encode(data)
+    return json.dumps(data)
+
+
+def _cbor_head(major: int, value: int) -> bytes:
+    if value < 24:
+        return bytes([major << 5 | value])
+    if value < 0x100:
+        return struct.pack(">BB", major << 5 | 24, value)
+    if value < 0x10000:
+        return struct.pack(">BH", major << 5 | 25, value)
+    if value < 0x100000000:
+        return struct.pack(">BI", major << 5 | 26, value)
+    return struct.pack(">BQ", major << 5 | 27, value)
+
+
+# pylint: disable=too-many-return-statements
+def cbor_encode(obj) -> bytes:
+    """
+    Encode the object with CBOR. The floats are encoded with single precision
+    which is more than enough for the sensor readings.
+    """
+    # bool is subclass of int so has to be checked first.
+    if obj is None:
+        return _NULL
+    if obj is True:
+        return _TRUE
+    if obj is False:
+        return _FALSE
+    if isinstance(obj, int):
+        if obj >= 0:
+            return _cbor_head(_UNSIGNED, obj)
+        return _cbor_head(_NEGATIVE, -1 - obj)
+    if isinstance(obj, float):
+        if math.isnan(obj):
+            return _NAN
+        return struct.pack(">Bf", _FLOAT32, obj)
+    if isinstance(obj, str):
+        encoded = obj.encode("utf-8")
+        return _cbor_head(_TEXT, len(encoded)) + encoded
+    if isinstance(obj, (bytes, bytearray)):
+        return _cbor_head(_BYTES, len(obj)) + bytes(obj)
+    if isinstance(obj, (list, tuple)):
+        return _cbor_head(_ARRAY, len(obj)) + b"".join(cbor_encode(i) for i in obj)
+    if isinstance(obj, dict):
+        return _cbor_head(_MAP, len(obj)) + b"".join(
+            cbor_encode(key) + cbor_encode(value) for key, value in obj.items()
+        )
+    raise TypeError(f"cannot encode {type(obj)} with CBOR")
+
+
+# pylint: disable=too-many-return-statements,too-many-branches
+def _cbor_decode_item(data: bytes, offset: int) -> tuple:
+    """
+    Decode single item starting at given offset.
+    Return the item and the offset of the next one.
+    """
+    initial = data[offset]
+    major, info = initial >> 5, initial & 0x1F
+    offset += 1
+
+    if major == _SIMPLE:
+        if info == 20:
+            return False, offset
+        if info == 21:
+            return True, offset
+        if info == 22:
+            return None, offset
+        if info == 25:
+            return struct.unpack_from(">e", data, offset)[0], offset + 2
+        if info == 26:
+            return struct.unpack_from(">f", data, offset)[0], offset + 4
+        if info == 27:
+            return struct.unpack_from(">d", data, offset)[0], offset + 8
+        raise ValueError(f"unsupported simple value {info}")
+
+    if info < 24:
+        value = info
+    elif info <= 27:
+        fmt = {24: ">B", 25: ">H", 26: ">I", 27: ">Q"}[info]
+        value = struct.unpack_from(fmt, data, offset)[0]
+        offset += struct.calcsize(fmt)
+    else:
+        raise ValueError(f"unsupported additional information {info}")
+
+    if major == _UNSIGNED:
+        return value, offset
+    if major == _NEGATIVE:
+        return -1 - value, offset
+    if major == _BYTES:
+        return bytes(data[offset : offset + value]), offset + value
+    if major == _TEXT:
+        return data[offset : offset + value].decode("utf-8"), offset + value
+    if major == _ARRAY:
+        items = []
+        for _ in range(value):
+            item, offset = _cbor_decode_item(data, offset)
+            items.append(item)
+        return items, offset
+    if major == _MAP:
+        result = {}
+        for _ in range(value):
+            key, offset = _cbor_decode_item(data, offset)
+            result[key], offset = _cbor_decode_item(data, offset)
+        return result, offset
+    raise ValueError(f"unsupported major type {major}")
+
+
+def cbor_decode(data: bytes):
+    """
+    Decode CBOR encoded object, as produced by cbor_encode().
+    """
+    obj, offset = _cbor_decode_item(data, 0)
+    if offset != len(data):
+        raise ValueError(f"{len(data) - offset} trailing bytes")
+    return obj
+
+
+def decode(payload: bytes, mqtt_topic: str) -> Dict:
+    """
+    Decode the payload received on given MQTT topic.
+    """
+    if mqtt_topic.endswith(CBOR_TOPIC_SUFFIX):
+        return cbor_decode(payload)
+    return json.loads(payload)
+
+
+def _time_encoding(func, repeat: int) -> float:
+    """
+    Return the average time of single call of the function in microseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    """
+    Print the size of the payload and the time to produce it
+    for each combination of the metrics, in either format.
+    """
+    # pylint: disable=import-outside-toplevel
+    import itertools
+
+    import adafruit_logging as logging
+
+    from sensors import measurements_to_dict
+
+    logging.getLogger("").setLevel(logging.ERROR)
+
+    readings = {
+        "humidity": 45.3,
+        "temperature": 21.7,
+        "co2_ppm": 812,
+        "lux": 123.4,
+        "battery_level": 87.5,
+    }
+    repeat = 2000
+
+    def message(names, native):
+        values = {
+            name: value if name in names else None for name, value in readings.items()
+        }
+        data = measurements_to_dict(
+            values["humidity"],
+            values["temperature"],
+            values["co2_ppm"],
+            values["lux"],
+            native=native,
+        )
+        if values["battery_level"] is not None:
+            battery_level = values["battery_level"]
+            data["battery_level"] = battery_level if native else f"{battery_level:.2f}"
+        return data
+
+    print(f"{'metrics':<50} {'JSON B':>7} {'CBOR B':>7} {'JSON us':>8} {'CBOR us':>8}")
+    for count in range(1, len(readings) + 1):
+        for names in itertools.combinations(readings, count):
+            json_size = len(encode(message(names, False), JSON))
+            cbor_size = len(encode(message(names, True), CBOR))
+            json_time = _time_encoding(
+                lambda names=names: encode(message(names, False), JSON), repeat
+            )
+            cbor_time = _time_encoding(
+                lambda names=names: encode(message(names, True), CBOR), repeat
+            )
+            print(
+                f"{','.join(names):<50} {json_size:>7} {cbor_size:>7} "
+                f"{json_time:>8.1f} {cbor_time:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
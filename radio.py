@@ -0,0 +1,102 @@
+"""
+RFM69 radio utilities
+"""
+
+import random
+import time
+
+import adafruit_logging as logging
+
+import sleepmem
+
+# RSSI measurement registers/bits, see the RFM69 datasheet.
+_REG_RSSI_CONFIG = 0x23
+_RSSI_START = 0x01
+_RSSI_DONE = 0x02
+
+# The RSSI measurement takes couple of bit periods, this is well beyond that.
+RSSI_TIMEOUT = 0.01
+
+DEFAULT_LBT_MAX_ATTEMPTS = 5
+# Upper limit of the number of attempts, so that the backoffs stay within few seconds.
+LBT_MAX_ATTEMPTS_LIMIT = 10
+# Backoff interval bounds in seconds. The upper bound doubles with every busy channel check,
+# up to the cap.
+LBT_BACKOFF_MIN = 0.005
+LBT_BACKOFF_MAX = 0.05
+LBT_BACKOFF_CAP = 0.4
+
+
+def read_rssi(rfm69) -> float:
+    """
+    Switch the radio to receive mode, trigger RSSI measurement and return the value in dBm.
+    """
+    rfm69.listen()
+    # pylint: disable=protected-access
+    rfm69._write_u8(_REG_RSSI_CONFIG, _RSSI_START)
+    start = time.monotonic()
+    while not rfm69._read_u8(_REG_RSSI_CONFIG) & _RSSI_DONE:
+        if time.monotonic() - start > RSSI_TIMEOUT:
+            break
+    return rfm69.rssi
+
+
+def channel_clear(rfm69, rssi_threshold: int) -> bool:
+    """
+    Return True if the RSSI on the channel is below the threshold.
+    """
+    logger = logging.getLogger("")
+
+    rssi = read_rssi(rfm69)
+    logger.debug(f"RSSI {rssi} dBm")
+    return rssi < rssi_threshold
+
+
+def send_with_lbt(
+    rfm69,
+    data: bytes,
+    rssi_threshold: int,
+    max_attempts: int | None = None,
+    send_func=None,
+    deadline=None,
+) -> bool:
+    """
+    Send the data once the channel is clear (listen before talk).
+    If the channel is busy, back off for random interval and check again.
+    If the channel is still busy after max_attempts checks (or the deadline does not allow
+    another backoff), send the data anyway.
+    The number of checks and busy checks is kept in sleep memory.
+    The data are sent with given function (rfm69.send by default).
+    Return the result of the send call.
+    """
+    logger = logging.getLogger("")
+
+    if max_attempts is None:
+        max_attempts = DEFAULT_LBT_MAX_ATTEMPTS
+    max_attempts = min(max_attempts, LBT_MAX_ATTEMPTS_LIMIT)
+
+    backoff_max = LBT_BACKOFF_MAX
+    for _ in range(max_attempts):
+        sleepmem.increment(sleepmem.CHANNEL_CHECKS)
+        if channel_clear(rfm69, rssi_threshold):
+            break
+
+        sleepmem.increment(sleepmem.CHANNEL_BUSY)
+        backoff = random.uniform(LBT_BACKOFF_MIN, backoff_max)
+        if deadline and not deadline.allows(backoff):
+            logger.warning("Channel busy and no time left to back off, sending anyway")
+            break
+        logger.debug(f"Channel busy, backing off for {backoff:.3f} seconds")
+        time.sleep(backoff)
+        backoff_max = min(LBT_BACKOFF_CAP, backoff_max * 2)
+    else:
+        logger.warning(f"Channel busy after {max_attempts} checks, sending anyway")
+
+    logger.info(
+        f"Channel busy in {sleepmem.load(sleepmem.CHANNEL_BUSY)} "
+        f"out of {sleepmem.load(sleepmem.CHANNEL_CHECKS)} checks"
+    )
+
+    if send_func is None:
+        send_func = rfm69.send
+    return send_func(data)
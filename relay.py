@@ -0,0 +1,196 @@
+"""
+Store-and-forward relay for the radio frames.
+
+Mains powered node with RFM69 can relay the frames (in the pack_data() format)
+received from configured nodes so that distant battery powered nodes can transmit
+with lower power. If the relay is connected to MQTT broker, the data are published directly,
+otherwise the frame is re-transmitted with the original source node in the RadioHead header.
+
+The number of hops is kept in the lower 4 bits of the RadioHead header flags
+(the upper 4 bits are used by RadioHead itself) and the frames that reached the hop limit
+are not forwarded. Frames with already seen (node, sequence number) are dropped
+so that frames heard by multiple relays or relayed in a loop are forwarded only once.
+Frames with backlog records have no sequence number, so they are not deduplicated.
+
+The radio drops frames addressed to other nodes, so while relaying it listens with the broadcast
+node address, to receive also the frames addressed to the gateway.
+"""
+
+import math
+import time
+
+import adafruit_logging as logging
+
+from data import frame_seq, is_backlog_frame, is_frame, unpack_data
+from payload import JSON
+from payload import encode as encode_payload
+from payload import topic as payload_topic
+from sensors import measurements_to_dict
+from sequence import NO_SEQ
+
+HEADER_LEN = 4
+BROADCAST_ADDRESS = 255
+HOPS_MASK = 0x0F
+DEFAULT_HOP_LIMIT = 2
+# Number of recently forwarded (node, sequence number) pairs remembered.
+DUPLICATE_CACHE_SIZE = 32
+# How long to wait for single frame, in seconds.
+RECEIVE_TIMEOUT = 0.5
+# How often to service the MQTT client when relaying, in seconds.
+MQTT_LOOP_INTERVAL = 10
+
+
+def _nan_to_none(value):
+    if math.isnan(value):
+        return None
+    return value
+
+
+def publish_frame(mqtt_client, fields: tuple, payload_format: str = JSON) -> None:
+    """
+    Publish the fields of frame in the pack_data() format to the MQTT topic found in the frame.
+    Backlog record is published with timestamp derived from its age instead of sequence number.
+    """
+    _, topic, humidity, temperature, co2_ppm, battery_level, lux, seq = fields
+    mqtt_topic = topic.decode("ascii").rstrip("\x00")
+    native = payload_format != JSON
+    data = measurements_to_dict(
+        _nan_to_none(humidity),
+        _nan_to_none(temperature),
+        co2_ppm or None,
+        _nan_to_none(lux),
+        native,
+    )
+    battery_level = _nan_to_none(battery_level)
+    if battery_level is not None:
+        data["battery_level"] = battery_level if native else f"{battery_level:.2f}"
+    if is_backlog_frame(fields):
+        data["timestamp"] = int(time.time()) - seq * 60
+    elif seq != NO_SEQ:
+        data["seq"] = seq if native else f"{seq}"
+    mqtt_client.publish(
+        payload_topic(mqtt_topic, payload_format),
+        encode_payload(data, payload_format),
+    )
+
+
+# pylint: disable=too-many-instance-attributes
+class Relay:
+    """
+    Receives frames from configured nodes and forwards them.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        rfm69,
+        nodes: list,
+        mqtt_client=None,
+        hop_limit: int = DEFAULT_HOP_LIMIT,
+        payload_format: str = JSON,
+    ) -> None:
+        """
+        :param nodes: list of RFM69 node addresses whose frames should be forwarded
+        :param hop_limit: maximum number of relays a frame can pass through
+        """
+        if not 1 <= hop_limit <= HOPS_MASK:
+            raise ValueError(f"hop limit {hop_limit} out of range")
+
+        self.rfm69 = rfm69
+        self.nodes = nodes
+        self.mqtt_client = mqtt_client
+        self.hop_limit = hop_limit
+        self.payload_format = payload_format
+        self._recent: list = []
+        self.forwarded = 0
+        self.dropped = 0
+
+    def _is_duplicate(self, node: int, seq: int) -> bool:
+        """
+        Return True if frame with given source node and sequence number was seen recently.
+        """
+        if seq == NO_SEQ:
+            return False
+        if (node, seq) in self._recent:
+            return True
+        self._recent.append((node, seq))
+        if len(self._recent) > DUPLICATE_CACHE_SIZE:
+            self._recent.pop(0)
+        return False
+
+    def handle(self, packet: bytes) -> bool:
+        """
+        Forward received packet (including the RadioHead header) if it should be.
+        Return True if the packet was forwarded.
+        """
+        logger = logging.getLogger("")
+
+        destination, source, identifier, flags = packet[:HEADER_LEN]
+        payload = bytes(packet[HEADER_LEN:])
+        hops = flags & HOPS_MASK
+
+        if source not in self.nodes:
+            logger.debug(f"Ignoring frame from node {source}")
+            return False
+        if not is_frame(payload):
+            logger.debug(f"Ignoring frame of unknown format from node {source}")
+            return False
+
+        fields = unpack_data(payload)
+        if self._is_duplicate(source, frame_seq(fields)):
+            logger.debug(f"Dropping duplicate frame {fields[-1]} from node {source}")
+            self.dropped += 1
+            return False
+
+        if self.mqtt_client:
+            logger.info(f"Publishing frame from node {source}")
+            publish_frame(self.mqtt_client, fields, self.payload_format)
+        else:
+            if hops + 1 > self.hop_limit:
+                logger.debug(f"Frame from node {source} reached the hop limit")
+                self.dropped += 1
+                return False
+            logger.info(f"Re-transmitting frame from node {source}, hop {hops + 1}")
+            self.rfm69.send(
+                payload,
+                keep_listening=True,
+                destination=destination,
+                node=source,
+                identifier=identifier,
+                flags=(flags & ~HOPS_MASK & 0xFF) | (hops + 1),
+            )
+
+        self.forwarded += 1
+        return True
+
+    def poll(self, timeout: float = RECEIVE_TIMEOUT) -> bool:
+        """
+        Wait for single frame and forward it. Return True if a frame was forwarded.
+        """
+        packet = self.rfm69.receive(
+            keep_listening=True, with_header=True, timeout=timeout
+        )
+        if packet is None or len(packet) < HEADER_LEN:
+            return False
+        return self.handle(packet)
+
+    def serve_for(self, duration: float) -> None:
+        """
+        Relay the frames for given number of seconds, servicing the MQTT client in between.
+        The radio listens promiscuously meanwhile, its node address is restored afterwards.
+        """
+        node = self.rfm69.node
+        self.rfm69.node = BROADCAST_ADDRESS
+        try:
+            end = time.monotonic() + duration
+            last_loop = time.monotonic()
+            while time.monotonic() < end:
+                self.poll(min(RECEIVE_TIMEOUT, max(0.0, end - time.monotonic())))
+                if (
+                    self.mqtt_client
+                    and time.monotonic() - last_loop >= MQTT_LOOP_INTERVAL
+                ):
+                    self.mqtt_client.loop(timeout=1)
+                    last_loop = time.monotonic()
+        finally:
+            self.rfm69.node = node
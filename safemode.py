@@ -7,26 +7,14 @@ import time
 # pylint: disable=import-error
 import alarm
 import microcontroller
-import storage
 
 # pylint: disable=import-error
 import supervisor
 
-
-# safemode.py & boot.py file write
-def precode_file_write(file, data):
-    """
-    Append data to file with newline. Meant to be run before code.py gets to run.
-    """
-    storage.remount("/", False)  # writeable by CircuitPython
-    with open(file, "a+", encoding="ascii") as file_obj:
-        file_obj.write(f"{data}\n")
-        file_obj.flush()
-    storage.remount("/", True)  # writeable by USB host
-
+from events import SAFE_MODE, SAFE_MODE_REASONS, enum_code, record
 
 reason = supervisor.runtime.safe_mode_reason
-precode_file_write("/safemode.log", f"{supervisor.ticks_ms()}: {str(reason)}")
+record(SAFE_MODE, enum_code(SAFE_MODE_REASONS, reason))
 
 if reason == supervisor.SafeModeReason.HARD_FAULT:
     # pylint: disable=no-member
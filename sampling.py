@@ -0,0 +1,101 @@
+"""
+Per metric sampling scheduler.
+
+Each metric can have its own sampling period. When the period of a metric
+has not elapsed since it was last acquired, the sensors providing it are not read
+and the last value is used instead.
+
+The time of the last acquisition and the last value of each metric are kept in sleep memory
+so that the schedule works both in the main loop and across deep sleep wakes.
+The time is taken from the real time clock that keeps running in deep sleep.
+"""
+
+import math
+import time
+
+try:
+    from typing import Dict, Tuple
+except ImportError:
+    pass
+
+import adafruit_logging as logging
+
+import sleepmem
+
+HUMIDITY = "humidity"
+TEMPERATURE = "temperature"
+CO2_PPM = "co2_ppm"
+LUX = "lux"
+
+# The order matches the tuple returned from Sensors.get_measurements().
+METRICS = (HUMIDITY, TEMPERATURE, CO2_PPM, LUX)
+
+# Sleep memory slots with the time of last acquisition and the last value.
+_SLOTS = {
+    HUMIDITY: (sleepmem.HUMIDITY_TIME, sleepmem.HUMIDITY_VALUE),
+    TEMPERATURE: (sleepmem.TEMPERATURE_TIME, sleepmem.TEMPERATURE_VALUE),
+    CO2_PPM: (sleepmem.CO2_PPM_TIME, sleepmem.CO2_PPM_VALUE),
+    LUX: (sleepmem.LUX_TIME, sleepmem.LUX_VALUE),
+}
+
+
+class SamplingScheduler:
+    """
+    Decides which metrics are due for acquisition and caches the last values.
+    """
+
+    def __init__(self, periods: Dict) -> None:
+        """
+        :param periods: dictionary of metric name to sampling period in seconds.
+        Metrics without period are acquired every time.
+        """
+        for name in periods:
+            if name not in METRICS:
+                raise ValueError(f"unknown metric: {name}")
+        self.periods = periods
+
+    def due(self, now: int | None = None) -> set:
+        """
+        Return set of metrics that should be acquired now.
+        """
+        if now is None:
+            now = int(time.time())
+
+        due = set()
+        for name in METRICS:
+            period = self.periods.get(name)
+            last_time = sleepmem.load(_SLOTS[name][0])
+            # The time could have gone backwards if the clock was set.
+            if period is None or last_time == 0 or not 0 <= now - last_time < period:
+                due.add(name)
+
+        logging.getLogger("").debug(f"Metrics due: {due}")
+        return due
+
+    def update(self, measurements: Tuple, due: set, now: int | None = None) -> Tuple:
+        """
+        Store the values of the metrics that were acquired and replace the values
+        of the metrics that were not with the last values.
+        The measurements are in the form of tuple returned from Sensors.get_measurements().
+        Return tuple of the same form.
+        """
+        if now is None:
+            now = int(time.time())
+
+        result = []
+        for name, value in zip(METRICS, measurements):
+            time_slot, value_slot = _SLOTS[name]
+            if name in due:
+                sleepmem.store(time_slot, now)
+                sleepmem.store(
+                    value_slot, float("nan") if value is None else float(value)
+                )
+            else:
+                value = sleepmem.load(value_slot)
+                if math.isnan(value):
+                    value = None
+                elif name == CO2_PPM:
+                    value = int(value)
+            result.append(value)
+
+        return tuple(result)
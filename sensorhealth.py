@@ -0,0 +1,125 @@
+"""
+Per sensor fault isolation.
+
+Sensor that fails to be read (e.g. I2C glitch) is disabled for a while so that the metric
+is acquired from the sensor next in priority, rather than the whole program being reloaded.
+The disable period doubles with each consecutive failure. The number of consecutive failures
+and the end of the disable period of each sensor are kept in sleep memory
+so that the backoff works both in the main loop and across deep sleep wakes.
+Where multiple sets of the same sensors are used in single process (e.g. the hub daemon),
+each set keeps its state in its own memory instead.
+"""
+
+import time
+
+import adafruit_logging as logging
+
+import sleepmem
+
+TMP117 = "tmp117"
+SHT40 = "sht40"
+AHT20 = "aht20"
+BME280 = "bme280"
+SCD4X = "scd4x"
+STCC4 = "stcc4"
+VEML7700 = "veml7700"
+
+# The index of the sensor determines its slots in sleep memory.
+SENSORS = (TMP117, SHT40, AHT20, BME280, SCD4X, STCC4, VEML7700)
+
+# Exceptions raised by the drivers on failed read.
+READ_ERRORS = (OSError, RuntimeError)
+
+BACKOFF_BASE = 60
+BACKOFF_MAX = 24 * 3600
+
+# The failures count is kept in single byte.
+_MAX_FAILURES = 0xFF
+
+
+def _slots(name: str) -> tuple:
+    """
+    Return the sleep memory slots of the failure count and the end of the disable period.
+    """
+    offset = sleepmem.SENSOR_HEALTH + SENSORS.index(name) * 5
+    return (offset, ">B"), (offset + 1, ">I")
+
+
+class SensorHealth:
+    """
+    Keeps track of the sensor failures.
+    """
+
+    def __init__(
+        self,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_max: float = BACKOFF_MAX,
+        memory: dict | None = None,
+    ) -> None:
+        """
+        :param memory: dictionary to keep the state in instead of the sleep memory
+        """
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.memory = memory
+
+    def _load(self, slot: tuple) -> int:
+        if self.memory is None:
+            return sleepmem.load(slot)
+        return self.memory.get(slot, 0)
+
+    def _store(self, slot: tuple, value: int) -> None:
+        if self.memory is None:
+            sleepmem.store(slot, value)
+        else:
+            self.memory[slot] = value
+
+    def failures(self, name: str) -> int:
+        """
+        Return the number of consecutive failures of the sensor.
+        """
+        return self._load(_slots(name)[0])
+
+    def available(self, name: str, now: int | None = None) -> bool:
+        """
+        Return True if the sensor is not disabled.
+        """
+        if now is None:
+            now = int(time.time())
+        failures_slot, until_slot = _slots(name)
+        if self._load(failures_slot) == 0:
+            return True
+        until = self._load(until_slot)
+        # The clock could have been set back.
+        return now >= until or until - now > self.backoff_max
+
+    def failed(self, name: str, exception: Exception, now: int | None = None) -> None:
+        """
+        Record failed read of the sensor and disable it for a while.
+        """
+        if now is None:
+            now = int(time.time())
+        failures_slot, until_slot = _slots(name)
+        failures = min(_MAX_FAILURES, self._load(failures_slot) + 1)
+        backoff = min(self.backoff_max, self.backoff_base * 2 ** (failures - 1))
+        self._store(failures_slot, failures)
+        self._store(until_slot, now + int(backoff))
+        logging.getLogger("").warning(
+            f"Failed to read {name} ({failures} failures in a row): {exception}, "
+            f"disabled for {int(backoff)} seconds"
+        )
+
+    def succeeded(self, name: str) -> None:
+        """
+        Record successful read of the sensor.
+        """
+        failures_slot, _ = _slots(name)
+        if self._load(failures_slot):
+            logging.getLogger("").info(f"Sensor {name} recovered")
+            self._store(failures_slot, 0)
+
+    def failing(self) -> dict:
+        """
+        Return dictionary of the sensors with failures to the number of consecutive failures.
+        """
+        return {name: self.failures(name) for name in SENSORS if self.failures(name)}
@@ -0,0 +1,204 @@
+"""
+Sensor profiles trading accuracy against conversion time (and hence energy per reading),
+and auto-ranging of the VEML7700 light sensor.
+
+The profiles set the SHT40 precision mode, the TMP117 averaging count
+and the VEML7700 gain and integration time. The values are the register codes
+used by the drivers so that this module does not depend on the drivers being present.
+
+With the auto profile, the VEML7700 gain and integration time are adjusted
+until the raw count falls into the range where the reading is both precise and linear.
+The last good setting is kept in sleep memory so that on the next wake
+the sensor starts with it and usually needs just a single read.
+"""
+
+import time
+
+import adafruit_logging as logging
+
+import sleepmem
+from sensorhealth import SHT40, TMP117, VEML7700
+
+LOW_POWER = "low_power"
+BALANCED = "balanced"
+ACCURATE = "accurate"
+AUTO = "auto"
+
+# VEML7700 gain and integration time register codes.
+_GAIN_1_8 = 0x2
+_GAIN_1_4 = 0x3
+_GAIN_1 = 0x0
+_GAIN_2 = 0x1
+_IT_25MS = 0xC
+_IT_50MS = 0x8
+_IT_100MS = 0x0
+_IT_200MS = 0x1
+_IT_400MS = 0x2
+_IT_800MS = 0x3
+
+PROFILES: dict = {
+    # SHT40 precision mode (without heater), about 2, 5 and 9 ms conversion.
+    SHT40: {
+        LOW_POWER: 0xE0,
+        BALANCED: 0xF6,
+        # The driver default.
+        ACCURATE: 0xFD,
+    },
+    # TMP117 number of averaged conversions: 1, 8 (the default) and 64,
+    # i.e. about 16, 125 and 1000 ms of conversion.
+    TMP117: {
+        LOW_POWER: 0b00,
+        BALANCED: 0b01,
+        ACCURATE: 0b11,
+    },
+    # VEML7700 gain and integration time.
+    VEML7700: {
+        LOW_POWER: (_GAIN_1_8, _IT_25MS),
+        # The driver default.
+        BALANCED: (_GAIN_1_8, _IT_100MS),
+        ACCURATE: (_GAIN_1, _IT_400MS),
+        AUTO: None,
+    },
+}
+
+# VEML7700 ranges (gain code, gain, integration time code, integration time in ms)
+# from the least to the most sensitive. The gain is raised before the integration time
+# to keep the conversion short.
+VEML7700_RANGES = (
+    (_GAIN_1_8, 0.125, _IT_25MS, 25),
+    (_GAIN_1_8, 0.125, _IT_50MS, 50),
+    (_GAIN_1_8, 0.125, _IT_100MS, 100),
+    (_GAIN_1_4, 0.25, _IT_100MS, 100),
+    (_GAIN_1, 1, _IT_100MS, 100),
+    (_GAIN_2, 2, _IT_100MS, 100),
+    (_GAIN_2, 2, _IT_200MS, 200),
+    (_GAIN_2, 2, _IT_400MS, 400),
+    (_GAIN_2, 2, _IT_800MS, 800),
+)
+DEFAULT_RANGE = 2
+
+# Raw counts outside of this range are imprecise (too low) or non-linear (too high).
+RAW_LOW = 100
+RAW_HIGH = 10000
+RAW_MAX = 0xFFFF
+# Number of ranges to step when the count gives no estimate (zero or saturated).
+_BLIND_STEP = 3
+MAX_READS = 4
+
+# Resolution (lux per count) at gain 2 and 800 ms integration time.
+_RESOLUTION_AT_MAX = 0.0042
+
+
+def apply_profile(name: str, sensor, profile: str) -> None:
+    """
+    Apply the profile to the sensor.
+    """
+    setting = PROFILES[name][profile]
+    if name == SHT40:
+        sensor.mode = setting
+    elif name == TMP117:
+        sensor.averaged_measurements = setting
+    elif name == VEML7700 and setting is not None:
+        sensor.light_gain, sensor.light_integration_time = setting
+    logging.getLogger("").info(f"Using {profile} profile for {name}")
+
+
+def resolution(index: int) -> float:
+    """
+    Return lux per count of the VEML7700 range.
+    """
+    _, gain, _, integration_time = VEML7700_RANGES[index]
+    return _RESOLUTION_AT_MAX * (800 / integration_time) * (2 / gain)
+
+
+def next_range(index: int, raw: int) -> int:
+    """
+    Return the VEML7700 range to use after reading the raw count with given range.
+    Return the same range if the count is fine or cannot get better.
+    """
+    if RAW_LOW <= raw <= RAW_HIGH:
+        return index
+    if raw == 0:
+        return min(len(VEML7700_RANGES) - 1, index + _BLIND_STEP)
+    if raw >= RAW_MAX:
+        return max(0, index - _BLIND_STEP)
+
+    # Pick the most sensitive range where the count is expected to stay below the limit.
+    lux = raw * resolution(index)
+    best = 0
+    for candidate in range(len(VEML7700_RANGES)):
+        if lux / resolution(candidate) <= RAW_HIGH:
+            best = candidate
+    return best
+
+
+class AutoRanging:
+    """
+    VEML7700 proxy that provides lux reading with auto-ranging.
+    """
+
+    def __init__(self, sensor, memory: dict | None = None) -> None:
+        """
+        :param memory: dictionary to keep the range in instead of the sleep memory
+        """
+        self.sensor = sensor
+        self.memory = memory
+        stored = self._load()
+        self.index = stored - 1 if 0 < stored <= len(VEML7700_RANGES) else DEFAULT_RANGE
+        self._ready = 0.0
+        # Start the conversion right away so that it runs while other sensors are read.
+        self._set(self.index)
+
+    def _load(self) -> int:
+        if self.memory is None:
+            return sleepmem.load(sleepmem.VEML7700_RANGE)
+        return self.memory.get(sleepmem.VEML7700_RANGE, 0)
+
+    def _store(self, value: int) -> None:
+        if self.memory is None:
+            sleepmem.store(sleepmem.VEML7700_RANGE, value)
+        else:
+            self.memory[sleepmem.VEML7700_RANGE] = value
+
+    def _set(self, index: int) -> None:
+        gain_code, _, integration_time_code, integration_time = VEML7700_RANGES[index]
+        self.sensor.light_gain = gain_code
+        self.sensor.light_integration_time = integration_time_code
+        self.index = index
+        # The first conversion after the change may be incomplete, wait for two.
+        self._ready = time.monotonic() + 2 * integration_time / 1000
+
+    @property
+    def lux(self) -> float:
+        """
+        Read the light in lux, changing the range until the raw count is fine.
+        """
+        logger = logging.getLogger("")
+
+        raw = 0
+        read_index = self.index
+        for _ in range(MAX_READS):
+            delay = self._ready - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            raw = self.sensor.light
+            read_index = self.index
+            index = next_range(read_index, raw)
+            if index == read_index:
+                break
+            logger.debug(
+                f"VEML7700 count {raw}, changing range {read_index} -> {index}"
+            )
+            self._set(index)
+
+        self._store(self.index + 1)
+        lux = raw * resolution(read_index)
+        if VEML7700_RANGES[read_index][1] < 1:
+            # Non-linearity correction for the low gains, as in the driver.
+            lux = (
+                ((6.0135e-13 * lux - 9.3924e-9) * lux + 8.1488e-5) * lux + 1.0023
+            ) * lux
+        return lux
+
+    def __getattr__(self, name: str):
+        return getattr(self.sensor, name)
@@ -24,6 +24,21 @@ except ImportError:
 
 import adafruit_logging as logging
 
+from deadline import Deadline
+from sampling import CO2_PPM, HUMIDITY, LUX, TEMPERATURE, SamplingScheduler
+from sensorhealth import (
+    AHT20,
+    BME280,
+    READ_ERRORS,
+    SCD4X,
+    SHT40,
+    STCC4,
+    TMP117,
+    VEML7700,
+    SensorHealth,
+)
+from sensorprofile import AUTO, AutoRanging, apply_profile
+
 try:
     import adafruit_tmp117
 except ImportError:
@@ -54,20 +69,60 @@ except ImportError:
     pass
 
 
+def wait_for_data_ready(sensor, deadline: Deadline | None) -> bool:
+    """
+    Wait for the measurement of the sensor (e.g. SCD4x) to be ready.
+    Return False if the data was not ready within the time budget.
+    """
+    logger = logging.getLogger("")
+
+    for _ in range(0, 5):
+        while not sensor.data_ready:
+            if deadline and not deadline.allows(0.5):
+                return False
+            logger.debug("Sleeping for half second")
+            time.sleep(0.5)
+
+    return True
+
+
 # pylint: disable=too-few-public-methods
 class Sensors:
     """Sensor abstraction"""
 
-    # pylint: disable=too-many-statements,too-many-branches
-    def __init__(self, i2c, light_gain: int | None = None) -> None:
+    # pylint: disable=too-many-statements,too-many-branches,too-many-instance-attributes
+    def __init__(
+        self,
+        i2c,
+        light_gain: int | None = None,
+        sampling_periods: Dict | None = None,
+        profiles: Dict | None = None,
+        memory: Dict | None = None,
+    ) -> None:
         """
         Initialize the sensor objects. Assumes I2C.
+        If sampling periods (metric name to seconds) are specified,
+        each metric is acquired only once per its period.
+        The profiles (sensor name to profile name) trade the accuracy of the sensors
+        against conversion time.
+        The sensor health and the auto-ranging state are kept in the memory dictionary
+        if set, otherwise in the sleep memory.
         """
         logger = logging.getLogger("")
+        if profiles is None:
+            profiles = {}
+
+        self.scheduler = None
+        if sampling_periods:
+            self.scheduler = SamplingScheduler(sampling_periods)
+
+        self.health = SensorHealth(memory=memory)
 
         self.tmp117 = None
         try:
             self.tmp117 = adafruit_tmp117.TMP117(i2c)
+            if TMP117 in profiles:
+                apply_profile(TMP117, self.tmp117, profiles[TMP117])
             logger.info("TMP117 sensor initialized")
         except NameError:
             logger.warning("No library for the tmp117 sensor")
@@ -77,6 +132,8 @@ class Sensors:
         self.sht40 = None
         try:
             self.sht40 = adafruit_sht4x.SHT4x(i2c)
+            if SHT40 in profiles:
+                apply_profile(SHT40, self.sht40, profiles[SHT40])
             logger.info("SHT40 initialized")
         except NameError:
             logger.warning("No library for the sht40 sensor")
@@ -113,23 +170,25 @@ class Sensors:
         except NameError:
             logger.warning("No library for the SCD4x sensor")
 
+        # STCC4 is initialized even if SCD4x is present so that it can take over
+        # while SCD4x is disabled after failures. SCD4x is still preferred when reading.
         self.stcc4_sensor = None
-        # Only initialize STCC4 if SCD4x is not present (priority handling)
-        if self.scd4x_sensor is None:
-            try:
-                self.stcc4_sensor = adafruit_stcc4.STCC4(i2c)
-                if self.stcc4_sensor:
-                    logger.info("Starting continuous measurement on STCC4 sensor...")
-                    self.stcc4_sensor.continuous_measurement = True
-                logger.info("STCC4 sensor initialized")
-            except RuntimeError as exception:
-                logger.info(f"cannot find STCC4 sensor: {exception}")
-            except NameError:
-                logger.warning("No library for the STCC4 sensor")
+        try:
+            self.stcc4_sensor = adafruit_stcc4.STCC4(i2c)
+            if self.stcc4_sensor:
+                logger.info("Starting continuous measurement on STCC4 sensor...")
+                self.stcc4_sensor.continuous_measurement = True
+            logger.info("STCC4 sensor initialized")
+        except RuntimeError as exception:
+            logger.info(f"cannot find STCC4 sensor: {exception}")
+        except NameError:
+            logger.warning("No library for the STCC4 sensor")
 
         self.veml_sensor = None
         try:
             self.veml_sensor = adafruit_veml7700.VEML7700(i2c)
+            if VEML7700 in profiles:
+                apply_profile(VEML7700, self.veml_sensor, profiles[VEML7700])
             if light_gain is not None:
                 if light_gain == 1:
                     light_gain = adafruit_veml7700.VEML7700.ALS_GAIN_1
@@ -139,15 +198,14 @@ class Sensors:
                     raise ValueError(f"invalid light gain value: {light_gain}")
                 logger.info(f"Setting light gain to {light_gain}")
                 self.veml_sensor.light_gain = light_gain
+            if profiles.get(VEML7700) == AUTO:
+                self.veml_sensor = AutoRanging(self.veml_sensor, memory)
         except ValueError as exception:
             logger.info(f"cannot find VEML7700 sensor: {exception}")
         except NameError:
             logger.warning("No library for the VEML7700 sensor")
 
-    # pylint: disable=too-many-branches,too-many-locals
-    def get_measurements(
-        self,
-    ) -> Tuple[
+    def get_measurements(self, deadline: Deadline | None = None) -> Tuple[
         float | int | type[None],
         float | int | type[None],
         int | type[None],
@@ -158,78 +216,124 @@ class Sensors:
         Try various sensors, prefer higher precision measurements.
         Some of the sensors return temperature as integer, while some as float.
         Return tuple of humidity, temperature, CO2, lux (either can be None).
+        If the deadline is set, waiting for slow sensors is limited by the time budget.
+        If the sampling scheduler is set, only the metrics that are due are acquired
+        and the last values are returned for the rest.
+        Sensor that fails to be read is disabled for a while and the metric is acquired
+        from the sensor with the next lower priority.
+        """
+        if self.scheduler is None:
+            return self._read_measurements(deadline)
+
+        due = self.scheduler.due()
+        measurements = self._read_measurements(deadline, due)
+        return self.scheduler.update(measurements, due)
+
+    def _read(self, name: str, sensor, attribute: str):
+        """
+        Read the attribute of the sensor. Return None if the sensor is not present,
+        is disabled after previous failures, or fails to be read now.
+        """
+        if sensor is None or not self.health.available(name):
+            return None
+        try:
+            value = getattr(sensor, attribute)
+        except READ_ERRORS as exception:
+            self.health.failed(name, exception)
+            return None
+        self.health.succeeded(name)
+        logging.getLogger("").debug(f"Acquired {attribute} from {name}")
+        return value
+
+    # pylint: disable=too-many-branches,too-many-locals,too-many-statements
+    def _read_measurements(self, deadline: Deadline | None, metrics=None) -> Tuple[
+        float | int | type[None],
+        float | int | type[None],
+        int | type[None],
+        int | type[None],
+    ]:
+        """
+        Read the sensors. If the metrics set is specified, only the sensors needed
+        to acquire the metrics in the set are read.
+        Return tuple of humidity, temperature, CO2, lux (either can be None).
         """
 
         logger = logging.getLogger("")
 
+        want_temperature = metrics is None or TEMPERATURE in metrics
+        want_humidity = metrics is None or HUMIDITY in metrics
+        want_co2 = metrics is None or CO2_PPM in metrics
+        want_lux = metrics is None or LUX in metrics
+
         temperature = None
-        if self.tmp117:
-            temperature = self.tmp117.temperature
-            logger.debug("Acquired temperature from tmp117")
+        if want_temperature:
+            temperature = self._read(TMP117, self.tmp117, "temperature")
 
         humidity = None
-        if self.sht40:
-            if temperature is None:
-                temperature = self.sht40.temperature
-                logger.debug("Acquired temperature from sht40")
-            humidity = self.sht40.relative_humidity
-            logger.debug("Acquired humidity from sht40")
-
-        if self.aht20:
-            # Prefer temperature measurement from the tmp117/sht40 as they have higher accuracy.
-            if temperature is None:
-                temperature = self.aht20.temperature
-                logger.debug("Acquired temperature from aht20")
-            # Prefer humidity measurement from sht40 as it has higher accuracy.
-            if humidity is None:
-                humidity = self.aht20.relative_humidity
-                logger.debug("Acquired humidity from aht20")
-
-        if self.bme280:
-            if temperature is None:
-                temperature = self.bme280.temperature
-                logger.debug("Acquired temperature from bme280")
-            if humidity is None:
-                humidity = self.bme280.relative_humidity
-                logger.debug("Acquired humidity from bme280")
+        if want_temperature and temperature is None:
+            temperature = self._read(SHT40, self.sht40, "temperature")
+        if want_humidity:
+            humidity = self._read(SHT40, self.sht40, "relative_humidity")
+
+        # Prefer temperature measurement from the tmp117/sht40 as they have higher accuracy.
+        if want_temperature and temperature is None:
+            temperature = self._read(AHT20, self.aht20, "temperature")
+        # Prefer humidity measurement from sht40 as it has higher accuracy.
+        if want_humidity and humidity is None:
+            humidity = self._read(AHT20, self.aht20, "relative_humidity")
+
+        if want_temperature and temperature is None:
+            temperature = self._read(BME280, self.bme280, "temperature")
+        if want_humidity and humidity is None:
+            humidity = self._read(BME280, self.bme280, "relative_humidity")
 
         co2_ppm = None
-        if self.scd4x_sensor:
-            for _ in range(0, 5):
-                while not self.scd4x_sensor.data_ready:
-                    logger.debug("Sleeping for half second")
-                    time.sleep(0.5)
-
-            co2_ppm = self.scd4x_sensor.CO2
-            if co2_ppm is not None:
-                logger.debug(f"CO2 ppm={co2_ppm}")
-
-            if temperature is None:
-                temperature = self.scd4x_sensor.temperature
-                logger.debug("Acquired temperature from SCD4x")
-
-            if humidity is None:
-                humidity = self.scd4x_sensor.relative_humidity
-                logger.debug("Acquired humidity from SCD4x")
-
-        # Fallback to STCC4 only if SCD4x is not available.
-        if self.stcc4_sensor and self.scd4x_sensor is None:
-            co2_ppm = self.stcc4_sensor.CO2
-            if co2_ppm is not None:
-                logger.debug(f"CO2 ppm={co2_ppm}")
-
-            if temperature is None:
-                temperature = self.stcc4_sensor.temperature
-                logger.debug("Acquired temperature from STCC4")
-
-            if humidity is None:
-                humidity = self.stcc4_sensor.relative_humidity
-                logger.debug("Acquired humidity from STCC4")
+        want_co2_sensor = (
+            want_co2
+            or (want_temperature and temperature is None)
+            or (want_humidity and humidity is None)
+        )
+        scd4x_ready = False
+        if self.scd4x_sensor and want_co2_sensor and self.health.available(SCD4X):
+            try:
+                scd4x_ready = wait_for_data_ready(self.scd4x_sensor, deadline)
+            except READ_ERRORS as exception:
+                self.health.failed(SCD4X, exception)
+            else:
+                if not scd4x_ready:
+                    logger.warning(
+                        "SCD4x data not ready within the time budget, skipping"
+                    )
+        if scd4x_ready:
+            if want_co2:
+                co2_ppm = self._read(SCD4X, self.scd4x_sensor, "CO2")
+                if co2_ppm is not None:
+                    logger.debug(f"CO2 ppm={co2_ppm}")
+
+            if want_temperature and temperature is None:
+                temperature = self._read(SCD4X, self.scd4x_sensor, "temperature")
+
+            if want_humidity and humidity is None:
+                humidity = self._read(SCD4X, self.scd4x_sensor, "relative_humidity")
+
+        # Fallback to STCC4 only if SCD4x is not present or disabled after failures.
+        if want_co2_sensor and (
+            self.scd4x_sensor is None or not self.health.available(SCD4X)
+        ):
+            if want_co2 and co2_ppm is None:
+                co2_ppm = self._read(STCC4, self.stcc4_sensor, "CO2")
+                if co2_ppm is not None:
+                    logger.debug(f"CO2 ppm={co2_ppm}")
+
+            if want_temperature and temperature is None:
+                temperature = self._read(STCC4, self.stcc4_sensor, "temperature")
+
+            if want_humidity and humidity is None:
+                humidity = self._read(STCC4, self.stcc4_sensor, "relative_humidity")
 
         lux = None
-        if self.veml_sensor:
-            lux = self.veml_sensor.lux
-            logger.debug("Acquired illuminance from VEML7700")
+        if want_lux:
+            lux = self._read(VEML7700, self.veml_sensor, "lux")
 
         #
         # It seems mypy cannot check the types due to missing type information
@@ -241,23 +345,31 @@ class Sensors:
         """
         Put the metrics into dictionary and return it.
         """
-        data = {}
-        logger = logging.getLogger("")
-
-        humidity, temperature, co2_ppm, lux = self.get_measurements()
-
-        if temperature is not None:
-            logger.info(f"Temperature: {temperature:.1f} C")
-            data["temperature"] = f"{temperature:.1f}"
-        if humidity is not None:
-            logger.info(f"Humidity: {humidity:.1f} %")
-            data["humidity"] = f"{humidity:.1f}"
-        if co2_ppm is not None:
-            logger.info(f"CO2 = {co2_ppm} ppm")
-            data["co2_ppm"] = f"{co2_ppm}"
-        if lux is not None:
-            logger.info(f"light = {lux} lux")
-            data["lux"] = f"{lux}"
-
-        logger.debug(f"data: {data}")
-        return data
+        return measurements_to_dict(*self.get_measurements())
+
+
+def measurements_to_dict(
+    humidity, temperature, co2_ppm, lux, native: bool = False
+) -> Dict:
+    """
+    Put the metrics into dictionary and return it. The None values are skipped.
+    The values are formatted as strings unless native is True.
+    """
+    data = {}
+    logger = logging.getLogger("")
+
+    if temperature is not None:
+        logger.info(f"Temperature: {temperature:.1f} C")
+        data["temperature"] = temperature if native else f"{temperature:.1f}"
+    if humidity is not None:
+        logger.info(f"Humidity: {humidity:.1f} %")
+        data["humidity"] = humidity if native else f"{humidity:.1f}"
+    if co2_ppm is not None:
+        logger.info(f"CO2 = {co2_ppm} ppm")
+        data["co2_ppm"] = co2_ppm if native else f"{co2_ppm}"
+    if lux is not None:
+        logger.info(f"light = {lux} lux")
+        data["lux"] = lux if native else f"{lux}"
+
+    logger.debug(f"data: {data}")
+    return data
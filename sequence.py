@@ -0,0 +1,217 @@
+"""
+Sequence numbers of the messages and the host side loss accounting.
+
+Each fresh reading gets sequence number from a counter kept in sleep memory,
+going from 1 to SEQ_MAX and wrapping around. The value 0 means the message has no
+sequence number (e.g. records flushed from the backlog).
+
+The SequenceTracker (meant to be run on the gateway or the MQTT consumer) uses the sequence numbers
+to compute the loss rate, duplicates, reordering and inter-arrival jitter of each node.
+To track the messages published via MQTT, run:
+
+  mosquitto_sub -h broker -t 'devices/#' -v | python3 sequence.py
+
+and press Ctrl-C to print the statistics.
+"""
+
+import sys
+import time
+
+try:
+    from typing import Dict
+except ImportError:
+    pass
+
+import sleepmem
+
+SEQ_MAX = 0xFFFF
+NO_SEQ = 0
+# Sequence numbers older than the highest one by at least this much are considered
+# to come from restarted node rather than being reordered.
+REORDER_WINDOW = 64
+# Gain of the jitter estimator, as in RFC 3550.
+JITTER_GAIN = 1 / 16
+
+
+def next_sequence() -> int:
+    """
+    Advance the sequence counter in sleep memory and return the new value.
+    """
+    seq = sleepmem.load(sleepmem.SEQUENCE) % SEQ_MAX + 1
+    sleepmem.store(sleepmem.SEQUENCE, seq)
+    return seq
+
+
+def seq_distance(old: int, new: int) -> int:
+    """
+    Return the signed distance from the old sequence number to the new one,
+    taking the wrap around into account.
+    """
+    distance = (new - old) % SEQ_MAX
+    if distance > SEQ_MAX // 2:
+        distance -= SEQ_MAX
+    return distance
+
+
+# pylint: disable=too-many-instance-attributes
+class NodeStats:
+    """
+    Delivery statistics of single node.
+    """
+
+    def __init__(self) -> None:
+        self.received = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.restarts = 0
+        self.jitter = 0.0
+        # The sequence numbers are extended beyond SEQ_MAX to count the wraps.
+        self._first = 0
+        self._highest = 0
+        self._highest_seq = NO_SEQ
+        self._expected_base = 0
+        self._seen: set = set()
+        self._last_arrival = 0.0
+        self._last_interval: float | None = None
+
+    @property
+    def expected(self) -> int:
+        """
+        Number of messages the node has sent, as far as can be told.
+        """
+        if self._highest_seq == NO_SEQ:
+            return self._expected_base
+        return self._expected_base + self._highest - self._first + 1
+
+    @property
+    def lost(self) -> int:
+        """
+        Number of messages that have not arrived.
+        """
+        return max(0, self.expected - self.received)
+
+    @property
+    def loss_rate(self) -> float:
+        """
+        Ratio of the lost messages to the expected ones.
+        """
+        expected = self.expected
+        return self.lost / expected if expected else 0.0
+
+    def _start(self, seq: int, arrival: float) -> None:
+        self._first = self._highest = seq
+        self._highest_seq = seq
+        self._seen = {seq}
+        self._last_arrival = arrival
+        self._last_interval = None
+        self.received += 1
+
+    def _update_jitter(self, distance: int, arrival: float) -> None:
+        # Inter-arrival time per message, so that the losses do not count as jitter.
+        interval = (arrival - self._last_arrival) / distance
+        if self._last_interval is not None:
+            self.jitter += (abs(interval - self._last_interval) - self.jitter) * (
+                JITTER_GAIN
+            )
+        self._last_interval = interval
+        self._last_arrival = arrival
+
+    def receive(self, seq: int, arrival: float) -> None:
+        """
+        Account message with given sequence number that arrived at given time.
+        """
+        if self._highest_seq == NO_SEQ:
+            self._start(seq, arrival)
+            return
+
+        distance = seq_distance(self._highest_seq, seq)
+        extended = self._highest + distance
+        if seq <= REORDER_WINDOW < abs(distance):
+            # Sleep memory of the node was lost so the sequence numbers start again.
+            self._restart(seq, arrival)
+            return
+
+        if distance > 0:
+            self._highest = extended
+            self._highest_seq = seq
+            self._update_jitter(distance, arrival)
+        elif -distance >= REORDER_WINDOW:
+            self._restart(seq, arrival)
+            return
+        elif extended in self._seen:
+            self.duplicates += 1
+            return
+        else:
+            # Possibly older than the first message seen.
+            self._first = min(self._first, extended)
+            self.reordered += 1
+
+        self.received += 1
+        self._seen.add(extended)
+        self._seen = {s for s in self._seen if s > self._highest - REORDER_WINDOW}
+
+    def _restart(self, seq: int, arrival: float) -> None:
+        self.restarts += 1
+        self._expected_base = self.expected
+        self._start(seq, arrival)
+
+    def __str__(self) -> str:
+        return (
+            f"received {self.received}/{self.expected} "
+            f"(loss {self.loss_rate:.1%}), duplicates {self.duplicates}, "
+            f"reordered {self.reordered}, restarts {self.restarts}, "
+            f"jitter {self.jitter:.3f} s"
+        )
+
+
+class SequenceTracker:
+    """
+    Delivery statistics of multiple nodes.
+    """
+
+    def __init__(self) -> None:
+        self.nodes: Dict[str, NodeStats] = {}
+
+    def receive(self, node: str, seq: int, arrival: float | None = None) -> None:
+        """
+        Account message from given node. Messages without sequence number are ignored.
+        """
+        if seq == NO_SEQ:
+            return
+        if arrival is None:
+            arrival = time.time()
+        self.nodes.setdefault(node, NodeStats()).receive(seq, arrival)
+
+    def report(self) -> str:
+        """
+        Return the statistics of all the nodes, one per line.
+        """
+        return "\n".join(
+            f"{node}: {stats}" for node, stats in sorted(self.nodes.items())
+        )
+
+
+def main():
+    """
+    Track the messages printed by mosquitto_sub -v (topic and JSON payload on each line)
+    on standard input.
+    """
+    # pylint: disable=import-outside-toplevel
+    import json
+
+    tracker = SequenceTracker()
+    try:
+        for line in sys.stdin:
+            topic, _, message = line.strip().partition(" ")
+            try:
+                seq = int(json.loads(message).get("seq", NO_SEQ))
+            except (ValueError, AttributeError):
+                continue
+            tracker.receive(topic, seq)
+    except KeyboardInterrupt:
+        pass
+    print(tracker.report())
+
+
+if __name__ == "__main__":
+    main()
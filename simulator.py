@@ -0,0 +1,274 @@
+"""
+Host-side simulator of radio traffic generated by a fleet of battery powered nodes.
+
+Each node wakes up periodically, sends single frame produced by pack_data()
+(without waiting for the channel to be clear or for an ACK) and goes back to deep sleep.
+This is essentially unslotted ALOHA: a frame is lost if its transmission overlaps
+with transmission of any other frame.
+
+The wake period of given node is the deep sleep duration plus the time spent awake.
+Each node has its own clock drift (the RTC of the microcontrollers is not precise)
+and the time spent awake varies from wake to wake, so the transmission times
+of the nodes wander relative to each other.
+
+This is meant to be run with CPython (needs NumPy), not on the microcontroller, e.g.:
+
+  python3 simulator.py --nodes 1000 --sleep 30
+
+"""
+
+import argparse
+import math
+
+import numpy as np
+
+from data import pack_data
+from modem import RFM69_BITRATE, frame_airtime
+
+
+def frame_payload_size(mqtt_topic: str = "devices/terasa/shield") -> int:
+    """
+    Return the size of the payload (in bytes) as produced by pack_data().
+    """
+    return len(pack_data(mqtt_topic, 100.0, 400, 50.0, 20.0, 1000.0))
+
+
+# pylint: disable=too-few-public-methods,too-many-instance-attributes
+class SimulationResult:
+    """
+    Outcome of the simulation.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        duration: float,
+        airtime: float,
+        payload_len: int,
+        sent: int,
+        collided: int,
+        peak_frames_per_sec: int,
+    ):
+        self.duration = duration
+        self.airtime = airtime
+        self.payload_len = payload_len
+        self.sent = sent
+        self.collided = collided
+        self.delivered = sent - collided
+        self.peak_frames_per_sec = peak_frames_per_sec
+
+    @property
+    def collision_rate(self) -> float:
+        """
+        Ratio of frames lost due to collision.
+        """
+        if self.sent == 0:
+            return 0.0
+        return self.collided / self.sent
+
+    @property
+    def throughput(self) -> float:
+        """
+        Delivered payload bytes per second.
+        """
+        return self.delivered * self.payload_len / self.duration
+
+    @property
+    def frames_per_sec(self) -> float:
+        """
+        Average number of frames per second the gateway has to process.
+        """
+        return self.delivered / self.duration
+
+    @property
+    def channel_load(self) -> float:
+        """
+        Offered load, i.e. the ratio of time the channel is occupied
+        if there were no collisions (G in the ALOHA terms).
+        """
+        return self.sent * self.airtime / self.duration
+
+    def __str__(self):
+        return (
+            f"frame airtime: {self.airtime * 1000:.3f} ms ({self.payload_len} bytes payload)\n"
+            f"offered load: {self.channel_load:.4f}\n"
+            f"frames sent: {self.sent}\n"
+            f"frames collided: {self.collided}\n"
+            f"collision rate: {self.collision_rate * 100:.2f} %\n"
+            f"delivered throughput: {self.throughput:.1f} bytes/s\n"
+            f"gateway load: {self.frames_per_sec:.2f} frames/s on average, "
+            f"{self.peak_frames_per_sec} frames/s at peak"
+        )
+
+
+# pylint: disable=too-many-arguments
+def generate_tx_times(
+    rng: np.random.Generator,
+    nodes: int,
+    sleep_interval: float | np.ndarray,
+    duration: float,
+    *,
+    awake_time: float = 1.0,
+    awake_jitter: float = 0.1,
+    drift_ppm: float = 100.0,
+    synchronized: bool = False,
+) -> np.ndarray:
+    """
+    Generate sorted array of transmission start times (in seconds) of all the nodes.
+
+    The sleep interval can be either scalar or array with value for each node.
+    The clock drift of each node is drawn from normal distribution with drift_ppm
+    standard deviation, the time spent awake from normal distribution
+    with awake_jitter standard deviation.
+    If synchronized is True, all the nodes start at the same time
+    (e.g. after a power outage), otherwise the start is spread randomly across
+    the first period.
+    """
+    sleep_interval = np.broadcast_to(np.asarray(sleep_interval, dtype=float), (nodes,))
+    drift = rng.normal(0.0, drift_ppm * 1e-6, nodes)
+    period = (sleep_interval + awake_time) * (1.0 + drift)
+
+    if synchronized:
+        start = np.zeros(nodes)
+    else:
+        start = rng.uniform(0.0, period)
+
+    # Bound the number of wakes by the shortest period; the excess is masked below.
+    wakes = int(math.ceil(duration / period.min())) + 1
+    steps = period[:, np.newaxis] + rng.normal(0.0, awake_jitter, (nodes, wakes))
+    steps[:, 0] = start
+    times = np.cumsum(steps, axis=1)
+
+    times = times[(times >= 0) & (times < duration)]
+    times.sort()
+    return times
+
+
+def find_collisions(starts: np.ndarray, airtime: float) -> np.ndarray:
+    """
+    Given sorted array of transmission start times of frames with the same airtime,
+    return boolean array marking the frames that overlap with another frame.
+    """
+    collided = np.zeros(len(starts), dtype=bool)
+    if len(starts) < 2:
+        return collided
+
+    overlap = np.diff(starts) < airtime
+    # Frame collides with its predecessor or its successor.
+    collided[1:] |= overlap
+    collided[:-1] |= overlap
+    return collided
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def simulate(
+    nodes: int,
+    sleep_interval: float | np.ndarray,
+    duration: float,
+    *,
+    payload_len: int | None = None,
+    bitrate: float = RFM69_BITRATE,
+    encrypted: bool = False,
+    awake_time: float = 1.0,
+    awake_jitter: float = 0.1,
+    drift_ppm: float = 100.0,
+    synchronized: bool = False,
+    seed: int | None = None,
+) -> SimulationResult:
+    """
+    Simulate the traffic of the fleet of nodes for given duration (in seconds).
+    """
+    if payload_len is None:
+        payload_len = frame_payload_size()
+    airtime = frame_airtime(payload_len, bitrate=bitrate, encrypted=encrypted)
+
+    rng = np.random.default_rng(seed)
+    starts = generate_tx_times(
+        rng,
+        nodes,
+        sleep_interval,
+        duration,
+        awake_time=awake_time,
+        awake_jitter=awake_jitter,
+        drift_ppm=drift_ppm,
+        synchronized=synchronized,
+    )
+    collided = find_collisions(starts, airtime)
+
+    peak = 0
+    delivered = starts[~collided]
+    if len(delivered) > 0:
+        peak = int(np.bincount(delivered.astype(np.int64)).max())
+
+    return SimulationResult(
+        duration, airtime, payload_len, len(starts), int(collided.sum()), peak
+    )
+
+
+def main():
+    """
+    Command line interface.
+    """
+    parser = argparse.ArgumentParser(
+        description="Simulate radio traffic of a fleet of nodes"
+    )
+    parser.add_argument("--nodes", type=int, default=100, help="number of nodes")
+    parser.add_argument(
+        "--sleep",
+        type=float,
+        nargs="+",
+        default=[30.0],
+        help="deep sleep duration in seconds, either single value or one value per node",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=3600.0, help="simulated time in seconds"
+    )
+    parser.add_argument(
+        "--awake", type=float, default=1.0, help="mean time spent awake in seconds"
+    )
+    parser.add_argument(
+        "--awake-jitter",
+        type=float,
+        default=0.1,
+        help="standard deviation of the time spent awake in seconds",
+    )
+    parser.add_argument(
+        "--drift", type=float, default=100.0, help="clock drift deviation in ppm"
+    )
+    parser.add_argument(
+        "--bitrate", type=float, default=RFM69_BITRATE, help="radio bitrate"
+    )
+    parser.add_argument(
+        "--payload", type=int, help="payload length (default is pack_data() size)"
+    )
+    parser.add_argument(
+        "--encrypted", action="store_true", help="account for AES padding"
+    )
+    parser.add_argument(
+        "--synchronized", action="store_true", help="all nodes start at once"
+    )
+    parser.add_argument("--seed", type=int, help="random seed")
+    args = parser.parse_args()
+
+    if len(args.sleep) not in (1, args.nodes):
+        parser.error("number of sleep values has to be 1 or match the number of nodes")
+    sleep_interval = args.sleep[0] if len(args.sleep) == 1 else np.array(args.sleep)
+
+    result = simulate(
+        args.nodes,
+        sleep_interval,
+        args.duration,
+        payload_len=args.payload,
+        bitrate=args.bitrate,
+        encrypted=args.encrypted,
+        awake_time=args.awake,
+        awake_jitter=args.awake_jitter,
+        drift_ppm=args.drift,
+        synchronized=args.synchronized,
+        seed=args.seed,
+    )
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 Utility functions and class for putting the microcontroller to sleep.
 """
 
+import random
 import time
 
 import adafruit_logging as logging
@@ -44,9 +45,10 @@ class SleepKind:
         return "N/A"
 
 
-def enter_sleep(sleep_period: int, sleep_kind: SleepKind) -> None:
+def enter_sleep(sleep_period: float, sleep_kind: SleepKind, pin_alarm=None) -> None:
     """
     Enters light or deep sleep.
+    If the pin alarm is set, the sleep also ends when the pin alarm triggers.
     """
     logger = logging.getLogger("")
 
@@ -63,17 +65,21 @@ def enter_sleep(sleep_period: int, sleep_kind: SleepKind) -> None:
     logger.debug(f"alarm time: {now + sleep_period}")
     # Create an alarm that will trigger sleep_period number of seconds from now.
     time_alarm = alarm.time.TimeAlarm(monotonic_time=now + sleep_period)
+    alarms = [time_alarm]
+    if pin_alarm:
+        logger.info("Will also wake on sensor alert")
+        alarms.append(pin_alarm)
 
     if sleep_kind.kind == SleepKind.LIGHT:
-        alarm.light_sleep_until_alarms(time_alarm)
+        alarm.light_sleep_until_alarms(*alarms)
     else:
         # Exit and deep sleep until the alarm wakes us.
-        alarm.exit_and_deep_sleep_until_alarms(time_alarm)
+        alarm.exit_and_deep_sleep_until_alarms(*alarms)
 
 
-def get_deep_sleep_duration(secrets: dict, battery_monitor, logger) -> int:
+def get_deep_sleep_duration(secrets: dict, battery_monitor, logger) -> float:
     """
-    Get sleep duration, either default or shortened.
+    Get sleep duration, either default or shortened, with random jitter added.
     Assumes the device is running on battery.
     Return sleep duration in seconds.
     """
@@ -101,4 +107,19 @@ def get_deep_sleep_duration(secrets: dict, battery_monitor, logger) -> int:
             )
             sleep_duration = sleep_duration_short
 
+    return add_sleep_jitter(secrets, sleep_duration, logger)
+
+
+def add_sleep_jitter(secrets: dict, sleep_duration: float, logger) -> float:
+    """
+    Return the sleep duration with random jitter added, if configured.
+    """
+    # Randomize the wake up time so that the transmissions of nodes
+    # with the same sleep duration do not keep colliding.
+    sleep_jitter = secrets.get(SLEEP_JITTER)
+    if sleep_jitter:
+        jitter = random.uniform(0, sleep_jitter)
+        logger.debug(f"Adding {jitter:.3f} seconds of sleep jitter")
+        sleep_duration += jitter
+
     return sleep_duration
@@ -0,0 +1,111 @@
+"""
+Values persisted in the sleep memory, i.e. retained across deep sleep.
+
+Each value has a fixed slot, described by a tuple of offset and struct format.
+The memory starts with a magic number. If it does not match (e.g. after power on
+when the memory contains garbage), the memory is zeroed so all values start at 0.
+"""
+
+import struct
+
+try:
+    # pylint: disable=import-error
+    import alarm
+
+    _MEMORY = alarm.sleep_memory
+except ImportError:
+    # for testing
+    _MEMORY = bytearray(256)
+
+_MAGIC = 0x5348  # "SH"
+_MAGIC_SLOT = (0, ">H")
+
+# Listen before talk statistics.
+CHANNEL_CHECKS = (2, ">I")
+CHANNEL_BUSY = (6, ">I")
+
+# Sequence numbers of the last written and last flushed backlog record.
+BACKLOG_SEQ = (10, ">I")
+BACKLOG_FLUSHED = (14, ">I")
+
+# Sequence numbers of the last recorded and last reported event in the NVM event ring.
+EVENTS_SEQ = (18, ">I")
+EVENTS_REPORTED = (22, ">I")
+# Number of wakes (runs of the code).
+WAKE_COUNT = (26, ">H")
+
+# Sampling scheduler: time of last acquisition and the last value of each metric.
+HUMIDITY_TIME = (28, ">I")
+HUMIDITY_VALUE = (32, ">f")
+TEMPERATURE_TIME = (36, ">I")
+TEMPERATURE_VALUE = (40, ">f")
+CO2_PPM_TIME = (44, ">I")
+CO2_PPM_VALUE = (48, ">f")
+LUX_TIME = (52, ">I")
+LUX_VALUE = (56, ">f")
+
+# Sequence number of the last message.
+SEQUENCE = (60, ">H")
+
+# Transmit power chosen by the power control, with offset.
+TX_POWER_LEVEL = (62, ">B")
+
+# Duty cycle ledger: the airtime used and the time of the last update.
+DUTY_CYCLE_USED = (63, ">f")
+DUTY_CYCLE_TIME = (67, ">I")
+
+# Set to open the maintenance window on the next wake.
+MAINTENANCE_REQUESTED = (71, ">B")
+
+# Sensor health: failure count (">B") and end of the disable period (">I") of each sensor,
+# in the order given by sensorhealth.SENSORS.
+SENSOR_HEALTH = 72
+
+# Last good VEML7700 range (gain and integration time) of the auto-ranging, plus one.
+VEML7700_RANGE = (107, ">B")
+
+SIZE = 108
+
+
+def reset() -> None:
+    """
+    Zero the memory and mark it as valid.
+    """
+    for i in range(SIZE):
+        _MEMORY[i] = 0
+    struct.pack_into(_MAGIC_SLOT[1], _MEMORY, _MAGIC_SLOT[0], _MAGIC)
+
+
+def _check() -> None:
+    """
+    Reset the memory if it does not contain valid data.
+    """
+    if struct.unpack_from(_MAGIC_SLOT[1], _MEMORY, _MAGIC_SLOT[0])[0] != _MAGIC:
+        reset()
+
+
+def load(slot: tuple):
+    """
+    Return value stored in given slot.
+    """
+    _check()
+    offset, fmt = slot
+    return struct.unpack_from(fmt, _MEMORY, offset)[0]
+
+
+def store(slot: tuple, value) -> None:
+    """
+    Store value into given slot.
+    """
+    _check()
+    offset, fmt = slot
+    struct.pack_into(fmt, _MEMORY, offset, value)
+
+
+def increment(slot: tuple) -> int:
+    """
+    Increment the counter in given slot (wrapping around) and return the new value.
+    """
+    value = (load(slot) + 1) % (1 << (8 * struct.calcsize(slot[1])))
+    store(slot, value)
+    return value
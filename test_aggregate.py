@@ -0,0 +1,40 @@
+"""
+test the windowed aggregation
+"""
+
+import pytest
+
+from aggregate import Aggregator
+
+
+def test_aggregate():
+    """
+    The aggregated values should preserve the peaks and the last value.
+    """
+    aggregator = Aggregator()
+    for co2_ppm in [400, 1500, 600, 500]:
+        aggregator.add_measurements(40.0, 21.0, co2_ppm, None)
+
+    data = aggregator.get_dict()
+    assert data["co2_ppm"] == "500"
+    assert data["co2_ppm_min"] == "400"
+    assert data["co2_ppm_max"] == "1500"
+    assert data["co2_ppm_mean"] == "750.0"
+    assert data["temperature"] == "21.0"
+    assert data["humidity_mean"] == "40.0"
+    assert data["samples"] == "4"
+    assert "lux" not in data
+
+    metric = aggregator.metrics["co2_ppm"]
+    assert metric.mean == pytest.approx(750)
+
+
+def test_aggregate_reset():
+    """
+    New window should start empty.
+    """
+    aggregator = Aggregator()
+    aggregator.add_measurements(40.0, 21.0, 400, 10.5)
+    aggregator.reset()
+    assert not aggregator.get_dict()
+    assert aggregator.elapsed() >= 0
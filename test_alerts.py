@@ -0,0 +1,99 @@
+"""
+test the event driven wakes
+"""
+
+from unittest.mock import Mock
+
+from adafruit_tmp117 import AlertMode
+
+import alerts
+from alerts import arm_alerts, arm_battery_alert, arm_temperature_alert
+
+
+def test_arm_temperature_alert():
+    """
+    The window should be centered on the current temperature.
+    """
+    tmp117 = Mock(temperature=21.5)
+    arm_temperature_alert(tmp117, 0.5)
+    assert tmp117.low_limit == 21.0
+    assert tmp117.high_limit == 22.0
+    assert tmp117.alert_mode == AlertMode.WINDOW  # pylint: disable=no-member
+
+
+def test_arm_battery_alert():
+    """
+    The voltage window should be clamped to the range of the MAX17048
+    and the alerts cleared.
+    """
+    battery_monitor = Mock(cell_voltage=5.05, active_alert=True)
+    arm_battery_alert(battery_monitor, 0.1)
+    assert battery_monitor.voltage_alert_min == 4.95
+    assert battery_monitor.voltage_alert_max == 5.1
+    assert not battery_monitor.active_alert
+
+
+def _mock_board(monkeypatch, asserted: bool):
+    line = Mock(value=not asserted)
+    digitalio = Mock()
+    digitalio.DigitalInOut.return_value.__enter__ = Mock(return_value=line)
+    digitalio.DigitalInOut.return_value.__exit__ = Mock(return_value=False)
+    alarm = Mock()
+    monkeypatch.setattr(alerts, "digitalio", digitalio, raising=False)
+    monkeypatch.setattr(alerts, "board", Mock(D5="D5"), raising=False)
+    monkeypatch.setattr(alerts, "alarm", alarm, raising=False)
+    return alarm
+
+
+def test_arm_alerts(monkeypatch):
+    """
+    Pin alarm should be armed on the pin, active low.
+    """
+    alarm = _mock_board(monkeypatch, asserted=False)
+    pin_alarm = arm_alerts("D5", Mock(temperature=20.0), Mock(cell_voltage=4.0), 1.0)
+    assert pin_alarm == alarm.pin.PinAlarm.return_value
+    alarm.pin.PinAlarm.assert_called_once_with("D5", value=False, pull=True)
+
+
+def test_arm_alerts_asserted(monkeypatch):
+    """
+    Asserted alert line should not be armed to avoid waking right away.
+    """
+    _mock_board(monkeypatch, asserted=True)
+    assert arm_alerts("D5", Mock(temperature=20.0), None, 1.0) is None
+
+
+def test_arm_alerts_no_sensor(monkeypatch):
+    """
+    Without sensor with alert output, there is nothing to wake on.
+    """
+    _mock_board(monkeypatch, asserted=False)
+    assert arm_alerts("D5", None, None, 1.0) is None
+
+
+def test_arm_alerts_failure(monkeypatch):
+    """
+    I2C failure when programming the sensor should fall back to the time alarm only.
+    """
+    _mock_board(monkeypatch, asserted=False)
+    tmp117 = Mock()
+    type(tmp117).temperature = property(Mock(side_effect=OSError("I2C")))
+    assert arm_alerts("D5", tmp117, None, 1.0) is None
+
+
+def test_arm_alerts_unknown_pin(monkeypatch):
+    """
+    Misspelled pin name should fall back to the time alarm only.
+    """
+    _mock_board(monkeypatch, asserted=False)
+    monkeypatch.setattr(alerts, "board", Mock(spec=["D5"], D5="D5"), raising=False)
+    assert arm_alerts("D55", Mock(temperature=20.0), None, 1.0) is None
+
+
+def test_arm_alerts_pin_cannot_wake(monkeypatch):
+    """
+    Pin that cannot wake from deep sleep should fall back to the time alarm only.
+    """
+    alarm = _mock_board(monkeypatch, asserted=False)
+    alarm.pin.PinAlarm.side_effect = ValueError("Cannot wake on pin edge")
+    assert arm_alerts("D5", Mock(temperature=20.0), None, 1.0) is None
@@ -0,0 +1,202 @@
+"""
+test the store-and-forward backlog
+"""
+
+import math
+from unittest.mock import Mock
+
+import pytest
+
+import sleepmem
+from backlog import RECORD_SIZE, Backlog
+from data import BACKLOG_RECORD_TIME, send_data, unpack_data
+from deadline import Deadline
+
+
+@pytest.fixture(name="backlog_path")
+def fixture_backlog_path(tmp_path):
+    """
+    Provide path to the backlog file with clean sleep memory.
+    """
+    sleepmem.reset()
+    return str(tmp_path / "backlog.bin")
+
+
+def test_append_flush(backlog_path):
+    """
+    Flushed records should match the appended ones, with None values preserved.
+    """
+    backlog = Backlog(backlog_path, 4)
+    assert backlog.append(40.5, 21.25, None, 80.0, None, timestamp=1000)
+    assert backlog.append(None, None, 600, None, 12.5, timestamp=1001)
+    assert backlog.pending() == 2
+
+    records = []
+    assert backlog.flush(lambda *values: records.append(values) or True) == 2
+    assert records == [
+        (1000, 40.5, 21.25, None, 80.0, None),
+        (1001, None, None, 600, None, 12.5),
+    ]
+    assert backlog.pending() == 0
+    assert backlog.flush(lambda *values: True) == 0
+
+
+def test_wraparound(backlog_path):
+    """
+    Hammer the ring with many wraparounds and partial flushes.
+    Only the last capacity records can be flushed and always in order.
+    """
+    capacity = 5
+    backlog = Backlog(backlog_path, capacity)
+    timestamp = 0
+    last_flushed = -1
+    for round_num in range(200):
+        for _ in range(round_num % 13):
+            timestamp += 1
+            assert backlog.append(1.0, 2.0, 3, 4.0, 5.0, timestamp=timestamp)
+        assert backlog.pending() <= capacity
+
+        limit = round_num % 4
+        flushed = []
+
+        def send(*values):
+            # pylint: disable=cell-var-from-loop
+            if len(flushed) == limit:
+                return False
+            flushed.append(values[0])
+            return True
+
+        expected = min(limit, backlog.pending())
+        assert backlog.flush(send) == expected
+        assert flushed == sorted(flushed)
+        if flushed:
+            assert flushed[0] > last_flushed
+            assert flushed[0] > timestamp - capacity
+            last_flushed = flushed[-1]
+
+    with open(backlog_path, "rb") as file_obj:
+        assert len(file_obj.read()) == capacity * RECORD_SIZE
+
+
+def test_recover(backlog_path):
+    """
+    Lost sleep memory should be recovered from the file, with the records resent.
+    """
+    backlog = Backlog(backlog_path, 3)
+    for timestamp in range(1, 8):
+        backlog.append(1.0, 2.0, 3, 4.0, 5.0, timestamp=timestamp)
+
+    sleepmem.reset()
+    backlog = Backlog(backlog_path, 3)
+    records = []
+    backlog.flush(lambda *values: records.append(values) or True)
+    assert [record[0] for record in records] == [5, 6, 7]
+
+
+def test_capacity_change(backlog_path):
+    """
+    Changing the capacity should start from scratch.
+    """
+    backlog = Backlog(backlog_path, 3)
+    backlog.append(1.0, 2.0, 3, 4.0, math.nan, timestamp=1)
+    backlog = Backlog(backlog_path, 4)
+    assert backlog.pending() == 0
+    backlog.append(1.0, 2.0, 3, 4.0, 5.0, timestamp=2)
+    assert backlog.pending() == 1
+
+
+def test_radio_flush(backlog_path, monkeypatch):
+    """
+    Over the radio, the records should be sent before the fresh reading,
+    marked as backlog records with their age in minutes.
+    """
+    monkeypatch.setattr("data.time.time", lambda: 10000)
+    backlog = Backlog(backlog_path, 4)
+    backlog.append(40.5, 21.25, None, 80.0, None, timestamp=10000 - 600)
+    backlog.append(41.0, 21.5, None, 80.0, None, timestamp=10000 - 60)
+    rfm69 = Mock()
+    rfm69.send.return_value = True
+    sensors = Mock()
+    sensors.get_measurements.return_value = (42.0, 22.0, None, None)
+
+    send_data(rfm69, None, "foo/bar", sensors, 79.0, backlog=backlog)
+
+    frames = [unpack_data(call.args[0]) for call in rfm69.send.call_args_list]
+    assert [(frame[0], frame[2], frame[-1]) for frame in frames] == [
+        (b"BKLG:", 40.5, 10),
+        (b"BKLG:", 41.0, 1),
+        (b"MQTT:", 42.0, 1),
+    ]
+    assert backlog.pending() == 0
+
+
+def _clocked_backlog(backlog_path, monkeypatch, records: int) -> tuple:
+    """
+    Return backlog with given number of records and clock (advanced by the sends).
+    """
+    clock = [100.0]
+    monkeypatch.setattr("deadline.time.monotonic", lambda: clock[0])
+    backlog = Backlog(backlog_path, 8)
+    for i in range(records):
+        backlog.append(40.0 + i, 21.0, None, 80.0, None, timestamp=1000 + i)
+
+    def advance(*_args, **_kwargs) -> bool:
+        clock[0] += BACKLOG_RECORD_TIME
+        return True
+
+    return backlog, advance
+
+
+def test_radio_flush_deadline(backlog_path, monkeypatch):
+    """
+    Backlog that does not fit into the deadline should be sent after the fresh reading,
+    only as long as the deadline allows.
+    """
+    backlog, advance = _clocked_backlog(backlog_path, monkeypatch, 4)
+    rfm69 = Mock()
+    rfm69.send.side_effect = advance
+    sensors = Mock()
+    sensors.get_measurements.return_value = (42.0, 22.0, None, None)
+
+    send_data(
+        rfm69,
+        None,
+        "foo/bar",
+        sensors,
+        79.0,
+        backlog=backlog,
+        deadline=Deadline(4 * BACKLOG_RECORD_TIME),
+    )
+
+    frames = [unpack_data(call.args[0]) for call in rfm69.send.call_args_list]
+    assert [(frame[0], frame[2]) for frame in frames] == [
+        (b"MQTT:", 42.0),
+        (b"BKLG:", 40.0),
+        (b"BKLG:", 41.0),
+        (b"BKLG:", 42.0),
+    ]
+    assert backlog.pending() == 1
+
+
+def test_mqtt_flush_deadline(backlog_path, monkeypatch):
+    """
+    The backlog records should be published only as long as the deadline allows.
+    """
+    backlog, advance = _clocked_backlog(backlog_path, monkeypatch, 4)
+    mqtt_client = Mock()
+    mqtt_client.publish.side_effect = advance
+    sensors = Mock()
+    sensors.get_measurements.return_value = (42.0, 22.0, None, None)
+
+    send_data(
+        None,
+        mqtt_client,
+        "foo/bar",
+        sensors,
+        79.0,
+        backlog=backlog,
+        deadline=Deadline(3 * BACKLOG_RECORD_TIME),
+    )
+
+    assert mqtt_client.publish.call_count == 3
+    assert backlog.pending() == 2
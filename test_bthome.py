@@ -0,0 +1,139 @@
+"""
+test the BTHome BLE advertisement transport with fake BLE module
+"""
+
+import sys
+import types
+from unittest.mock import Mock
+
+import pytest
+
+import sleepmem
+from bthome import (
+    MAX_ADVERTISEMENT_LEN,
+    BleAdvertiser,
+    decode_advertisement,
+    encode_advertisement,
+)
+from data import send_data
+
+
+class FakeAdapter:
+    """
+    BLE adapter recording the advertisements.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.advertising = False
+        self.advertised: list = []
+
+    def start_advertising(self, data, **kwargs) -> None:
+        """
+        Record the advertisement.
+        """
+        assert not kwargs.get("connectable", True)
+        self.advertising = True
+        self.advertised.append(bytes(data))
+
+    def stop_advertising(self) -> None:
+        """
+        Stop the advertising.
+        """
+        self.advertising = False
+
+
+@pytest.fixture(name="adapter")
+def fixture_adapter(monkeypatch):
+    """
+    Install fake _bleio module with the adapter.
+    """
+    adapter = FakeAdapter()
+    module = types.ModuleType("_bleio")
+    module.adapter = adapter  # type: ignore [attr-defined]
+    monkeypatch.setitem(sys.modules, "_bleio", module)
+    monkeypatch.setattr("bthome.time.sleep", lambda _: None)
+    return adapter
+
+
+def test_objects():
+    """
+    The objects follow the BTHome layout, in the order of the object IDs.
+    """
+    data = encode_advertisement(50.55, 25.06, 1250, 13460.67, 97, 0x1234)
+    # Flags, then the service data with the BTHome UUID and device information.
+    assert data[:3] == bytes.fromhex("020106")
+    assert data[4:8] == bytes.fromhex("16d2fc40")
+    # Packet ID, battery, temperature, humidity, illuminance, CO2.
+    assert data[8:] == bytes.fromhex("0034 0161 02ca09 03bf13 05138a14 12e204")
+    assert len(data) <= MAX_ADVERTISEMENT_LEN
+
+
+def test_roundtrip():
+    """
+    The decoder returns the encoded measurements, the missing ones are left out.
+    """
+    data = encode_advertisement(None, -12.5, None, 3.2, 100, 7)
+    assert decode_advertisement(data) == {
+        "packet_id": 7,
+        "battery": 100,
+        "temperature": -12.5,
+        "illuminance": 3.2,
+    }
+
+
+def test_clamped():
+    """
+    Values out of the range of the object are clamped.
+    """
+    data = encode_advertisement(None, None, None, 200000, 100.4, 0)
+    values = decode_advertisement(data)
+    assert values["illuminance"] == pytest.approx(167772.15)
+    assert values["battery"] == 100
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        bytes.fromhex("020106"),
+        bytes.fromhex("0201060616d2fc4102ca"),
+        bytes.fromhex("0201060716d2fc4002ca09")[:-1],
+        bytes.fromhex("0201060616d2fc40ff00"),
+    ],
+)
+def test_malformed(data):
+    """
+    Advertisements without valid BTHome data are rejected.
+    """
+    with pytest.raises(ValueError):
+        decode_advertisement(data)
+
+
+def test_advertise(adapter):
+    """
+    The measurements are advertised in non-connectable burst.
+    """
+    advertiser = BleAdvertiser(0.1)
+    assert adapter.enabled
+    advertiser.advertise(40.0, 21.0, None, None, 80, 1)
+    assert not adapter.advertising
+    assert decode_advertisement(adapter.advertised[0])["temperature"] == 21.0
+
+
+def test_send_data(adapter):
+    """
+    Without other transport, the data are advertised with the sequence number.
+    """
+    sleepmem.reset()
+    sensors = Mock()
+    sensors.get_measurements.return_value = (40.0, 21.0, None, None)
+
+    send_data(None, None, "foo/bar", sensors, 55.5, advertiser=BleAdvertiser())
+
+    values = decode_advertisement(adapter.advertised[0])
+    assert values == {
+        "packet_id": 1,
+        "battery": 56,
+        "temperature": 21.0,
+        "humidity": 40.0,
+    }
@@ -0,0 +1,133 @@
+"""
+test the coded logging over the radio
+"""
+
+import glob
+from unittest.mock import Mock
+
+import adafruit_logging as logging
+import pytest
+
+from codedlog import (
+    MAX_FRAME_LEN,
+    TEXT_ID,
+    RadioLogHandler,
+    decode_frame,
+    encode_record,
+    generate_table,
+)
+from logtable import TEMPLATES
+
+# The values are assigned dynamically in adafruit_logging.
+# pylint: disable=no-member
+WARNING = logging.WARNING
+INFO = logging.INFO
+
+
+def _frame(*records: bytes) -> bytes:
+    handler = RadioLogHandler()
+    handler.pending = list(records)
+    frames = handler.frames()
+    assert len(frames) == 1
+    return frames[0]
+
+
+def test_table_up_to_date():
+    """
+    The table has to be regenerated when the log calls change.
+    """
+    sources = [path for path in glob.glob("*.py") if not path.startswith("test_")]
+    assert generate_table(sources) == list(TEMPLATES)
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        ("Changing TX power from 13 to 10 dBm", None),
+        ("Estimated RSSI at the gateway -81.5 dBm, margin 3.5 dB", None),
+        (
+            "Failed to program the alerts: [Errno 19] No such device",
+            "Failed to program the alerts: [Errno 19] No su",
+        ),
+        ("Woken up by sensor alert", None),
+    ],
+)
+def test_roundtrip(message, expected):
+    """
+    Messages from the table are decoded back into the same text,
+    with long strings truncated.
+    """
+    record = encode_record(WARNING, message)
+    assert int.from_bytes(record[1:3], "big") != TEXT_ID
+    level, decoded = decode_frame(_frame(record))[0]
+    assert level == WARNING
+    assert decoded == (expected or message)
+
+
+def test_unknown_message():
+    """
+    Messages not in the table are sent as truncated text.
+    """
+    message = "Some library message " * 5
+    record = encode_record(WARNING, message)
+    assert len(record) <= MAX_FRAME_LEN - 4
+    _, decoded = decode_frame(_frame(record))[0]
+    assert message.startswith(decoded)
+
+
+def test_compact():
+    """
+    Coded record is much smaller than the text.
+    """
+    message = "Changing TX power from 13 to 10 dBm"
+    assert len(encode_record(INFO, message)) < len(message) // 2
+
+
+def test_malformed():
+    """
+    Truncated frames are rejected.
+    """
+    frame = _frame(encode_record(WARNING, "Changing TX power from 13 to 10 dBm"))
+    with pytest.raises(ValueError):
+        decode_frame(frame[:-2])
+    with pytest.raises(ValueError):
+        decode_frame(b"XX" + frame[2:])
+
+
+def test_handler():
+    """
+    Records at or above the level are sent in frames of at most RFM69 payload size.
+    """
+    handler = RadioLogHandler(WARNING)
+    logger = logging.getLogger("test_codedlog")
+    logger.addHandler(handler)
+    logger.setLevel(INFO)
+    for level in range(20):
+        logger.warning(f"Changing TX power from {level} to {level + 3} dBm")
+    logger.info("Woken up by sensor alert")
+
+    rfm69 = Mock()
+    sent = handler.send(rfm69)
+    assert sent == rfm69.send.call_count > 1
+
+    messages = []
+    for call in rfm69.send.call_args_list:
+        frame = call.args[0]
+        assert len(frame) <= MAX_FRAME_LEN
+        messages.extend(message for _, message in decode_frame(frame))
+    # Only the most recent records are kept.
+    assert messages[-1] == "Changing TX power from 19 to 22 dBm"
+    assert not any("Woken" in message for message in messages)
+    assert not handler.pending
+
+
+def test_handler_duty_cycle():
+    """
+    The frames are not sent if the airtime budget is exhausted.
+    """
+    handler = RadioLogHandler()
+    handler.emit(Mock(levelno=WARNING, msg="Woken up by sensor alert"))
+    ledger = Mock(airtime=Mock(return_value=0.1), allows=Mock(return_value=False))
+    rfm69 = Mock()
+    assert handler.send(rfm69, ledger) == 0
+    rfm69.send.assert_not_called()
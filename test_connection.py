@@ -0,0 +1,110 @@
+"""
+test the in-process connection recovery
+"""
+
+from unittest.mock import Mock
+
+import adafruit_minimqtt.adafruit_minimqtt as MQTT
+import pytest
+
+import connection
+from connection import ConnectionManager
+
+
+class FlakyBroker:  # pylint: disable=too-few-public-methods
+    """
+    MQTT client whose reconnects fail given number of times.
+    """
+
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.attempts = 0
+
+    def reconnect(self) -> None:
+        """
+        Fail while the broker is down.
+        """
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise MQTT.MMQTTException("Connection refused")
+
+
+@pytest.fixture(name="sleeps")
+def fixture_sleeps(monkeypatch):
+    """
+    Record the sleeps instead of sleeping.
+    """
+    sleeps = []
+    clock = [0.0]
+
+    def sleep(duration):
+        sleeps.append(duration)
+        clock[0] += duration
+
+    monkeypatch.setattr(connection.time, "sleep", sleep)
+    monkeypatch.setattr(connection.time, "monotonic", lambda: clock[0])
+    return sleeps
+
+
+def test_single_reconnect(sleeps):
+    """
+    Broker restart is recovered by single reconnect within the minimal backoff.
+    """
+    broker = FlakyBroker(0)
+    wifi_connect = Mock()
+    manager = ConnectionManager(broker, wifi_connect=wifi_connect)
+
+    manager.recover(OSError("Broken pipe"))
+
+    assert broker.attempts == 1
+    assert wifi_connect.call_count == 1
+    assert manager.reconnects == 1
+    assert sum(sleeps) <= connection.BACKOFF_MIN
+
+
+def test_backoff_grows(sleeps, monkeypatch):
+    """
+    The bound of the random delay doubles with each failure, up to the maximum.
+    """
+    monkeypatch.setattr(connection.random, "uniform", lambda low, high: high)
+    broker = FlakyBroker(6)
+    manager = ConnectionManager(broker, backoff_min=1, backoff_max=10)
+
+    manager.recover(OSError("Broken pipe"))
+
+    assert broker.attempts == 7
+    # The waits are split to feed the watchdog.
+    assert max(sleeps) <= connection.FEED_INTERVAL
+    assert sum(sleeps) == 1 + 2 + 4 + 8 + 10 + 10 + 10
+
+
+def test_failure_budget():
+    """
+    The original exception is re-raised once the budget is exhausted.
+    """
+    broker = FlakyBroker(100)
+    manager = ConnectionManager(broker, failure_budget=3, backoff_min=0)
+
+    with pytest.raises(ConnectionError) as exc_info:
+        manager.recover(ConnectionError("No network"))
+
+    assert isinstance(exc_info.value.__cause__, MQTT.MMQTTException)
+    assert broker.attempts == 3
+
+
+def test_budget_restored(sleeps):  # pylint: disable=unused-argument
+    """
+    Successful use of the connection restores the budget.
+    """
+    broker = FlakyBroker(2)
+    feed = Mock()
+    manager = ConnectionManager(broker, failure_budget=3, feed=feed)
+
+    manager.recover(OSError("Broken pipe"))
+    assert manager.failures == 3
+    assert feed.call_count > 0
+
+    manager.succeeded()
+    broker.failures = broker.attempts + 2
+    manager.recover(OSError("Broken pipe"))
+    assert manager.reconnects == 2
@@ -0,0 +1,58 @@
+"""
+test the deadline and shedding of optional work
+"""
+
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from deadline import Deadline
+from fakesensors import make_sensors
+
+
+def test_deadline():
+    """
+    The available time should exclude the reserve.
+    """
+    with patch("time.monotonic", return_value=100.0):
+        deadline = Deadline(10, reserve=3)
+    with patch("time.monotonic", return_value=104.0):
+        assert deadline.remaining() == pytest.approx(6)
+        assert deadline.available() == pytest.approx(3)
+        assert deadline.allows(3)
+        assert not deadline.allows(3.5)
+        assert deadline.budget(10) == pytest.approx(3)
+        assert deadline.budget(1) == pytest.approx(1)
+    with patch("time.monotonic", return_value=120.0):
+        assert deadline.available() == 0
+        deadline.restart()
+        assert deadline.available() == pytest.approx(7)
+
+
+def test_deadline_invalid_reserve():
+    """
+    Reserve cannot be bigger than the whole budget.
+    """
+    with pytest.raises(ValueError):
+        Deadline(1, reserve=2)
+
+
+def test_slow_sensor_shed(monkeypatch):
+    """
+    Waiting for sensor that is never ready should be cut short by the deadline,
+    the values from the other sensors should still be returned.
+    """
+    sensors = make_sensors(
+        monkeypatch, tmp117=Mock(temperature=21.5), scd4x=Mock(data_ready=False)
+    )
+
+    start = time.monotonic()
+    humidity, temperature, co2_ppm, lux = sensors.get_measurements(
+        Deadline(1.2, reserve=0.5)
+    )
+    assert time.monotonic() - start < 1.2
+    assert temperature == 21.5
+    assert humidity is None
+    assert co2_ppm is None
+    assert lux is None
@@ -0,0 +1,137 @@
+"""
+test the configuration overrides received over the radio
+"""
+
+from unittest.mock import Mock
+
+import pytest
+
+import downlink
+import sleepmem
+from downlink import (
+    CONFIG_PREFIX,
+    apply_overrides,
+    decode_config,
+    encode_config,
+    load_overrides,
+    receive_config,
+)
+
+GATEWAY = 1
+NODE = 2
+
+SECRETS = {
+    "log_level": "info",
+    "mqtt_topic": "devices/test",
+    "deep_sleep_duration": 60,
+    "sleep_duration_short": 30,
+}
+
+
+@pytest.fixture(autouse=True, name="nvm")
+def fixture_nvm(monkeypatch):
+    """
+    Blank NVM and sleep memory.
+    """
+    sleepmem.reset()
+    nvm = bytearray(2048)
+    monkeypatch.setattr(downlink, "_NVM", nvm)
+    return nvm
+
+
+def _radio(payload: bytes, source: int = GATEWAY):
+    return Mock(receive=Mock(return_value=bytes([NODE, source, 0, 0]) + payload))
+
+
+def test_roundtrip():
+    """
+    The overrides survive encoding of all the value formats.
+    """
+    overrides = {"deep_sleep_duration": 600, "tx_power": -2, "duty_cycle": 0.5}
+    assert decode_config(encode_config(overrides, maintenance=True)) == (
+        overrides,
+        True,
+    )
+
+
+@pytest.mark.parametrize(
+    "payload", [b"CFX", CONFIG_PREFIX + bytes([0, 0]), CONFIG_PREFIX + bytes([42])]
+)
+def test_malformed(payload):
+    """
+    Truncated values and unknown identifiers are rejected.
+    """
+    with pytest.raises(ValueError):
+        decode_config(payload)
+
+
+def test_encode_unknown():
+    """
+    Only the listed tunables can be overridden.
+    """
+    with pytest.raises(ValueError):
+        encode_config({"broker": "localhost"})
+
+
+def test_receive_and_apply():
+    """
+    Valid overrides are persisted and take precedence on the next wake.
+    """
+    radio = _radio(encode_config({"deep_sleep_duration": 600}, maintenance=True))
+    secrets = dict(SECRETS)
+    assert receive_config(radio, secrets, 0.5, GATEWAY)
+    assert secrets["deep_sleep_duration"] == 60
+    assert sleepmem.load(sleepmem.MAINTENANCE_REQUESTED)
+
+    assert apply_overrides(secrets) == {"deep_sleep_duration": 600}
+    assert secrets["deep_sleep_duration"] == 600
+
+
+def test_invalid_rejected():
+    """
+    Overrides failing the configuration checks are not stored.
+    """
+    # The short sleep must not be longer than the default one.
+    radio = _radio(encode_config({"deep_sleep_duration": 10}))
+    assert not receive_config(radio, dict(SECRETS), 0.5, GATEWAY)
+    assert not load_overrides()
+
+
+def test_other_source():
+    """
+    Only frames from the gateway are accepted.
+    """
+    radio = _radio(encode_config({"deep_sleep_duration": 600}), source=3)
+    assert not receive_config(radio, dict(SECRETS), 0.5, GATEWAY)
+    assert not load_overrides()
+
+
+def test_clear(nvm):
+    """
+    Empty frame clears the overrides, NVM is not written needlessly.
+    """
+    receive_config(
+        _radio(encode_config({"sleep_jitter": 5})), dict(SECRETS), 0.5, GATEWAY
+    )
+    assert load_overrides() == {"sleep_jitter": 5}
+
+    receive_config(_radio(encode_config({})), dict(SECRETS), 0.5, GATEWAY)
+    assert not load_overrides()
+    written = bytes(nvm)
+    receive_config(_radio(encode_config({})), dict(SECRETS), 0.5, GATEWAY)
+    assert bytes(nvm) == written
+
+
+def test_stale_overrides_ignored():
+    """
+    Overrides that are no longer valid with changed secrets are not applied.
+    """
+    receive_config(
+        _radio(encode_config({"sleep_duration_short": 50})),
+        dict(SECRETS),
+        0.5,
+        GATEWAY,
+    )
+    secrets = dict(SECRETS, deep_sleep_duration=40)
+    assert not apply_overrides(secrets)
+    assert secrets["sleep_duration_short"] == 30
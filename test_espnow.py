@@ -0,0 +1,225 @@
+"""
+test the ESP-NOW transport and bridge with fake espnow module
+"""
+
+import sys
+import types
+from unittest.mock import Mock
+
+import pytest
+
+from data import pack_data, unpack_data
+from espnow_link import (
+    EspNowBridge,
+    EspNowLink,
+    ack_for,
+    format_mac,
+    parse_mac,
+)
+
+NODE_MAC = b"\x02\x00\x00\x00\x00\x01"
+BRIDGE_MAC = b"\x02\x00\x00\x00\x00\x02"
+
+
+# pylint: disable=too-few-public-methods
+class FakePacket:
+    """
+    Received ESP-NOW packet.
+    """
+
+    def __init__(self, mac: bytes, msg: bytes) -> None:
+        self.mac = mac
+        self.msg = msg
+
+
+# pylint: disable=too-few-public-methods
+class FakePeer:
+    """
+    ESP-NOW peer.
+    """
+
+    def __init__(self, mac: bytes, channel: int = 0) -> None:
+        self.mac = mac
+        self.channel = channel
+
+
+class FakeAir:
+    """
+    Delivers the messages between the fake ESP-NOW objects by MAC address.
+    The receivers can be served right upon delivery, so that the sender gets the reply
+    while waiting for it.
+    """
+
+    def __init__(self) -> None:
+        self.stations: dict = {}
+        self.handlers: dict = {}
+        # Number of messages to lose per destination.
+        self.lose: dict = {}
+
+    def deliver(self, source: bytes, destination: bytes, msg: bytes) -> None:
+        """
+        Put the message into the inbox of the destination and let it handle it.
+        """
+        if self.lose.get(destination):
+            self.lose[destination] -= 1
+            return
+        station = self.stations.get(destination)
+        if station is None:
+            return
+        station.inbox.append(FakePacket(source, bytes(msg)))
+        if destination in self.handlers:
+            self.handlers[destination]()
+
+
+class FakeESPNow:
+    """
+    ESPNow object of given station.
+    """
+
+    def __init__(self, air: FakeAir, mac: bytes) -> None:
+        self.air = air
+        self.mac = mac
+        self.peers: list = []
+        self.inbox: list = []
+        self.sent: list = []
+        air.stations[mac] = self
+
+    def send(self, message: bytes, peer: FakePeer) -> None:
+        """
+        Send the message to the peer, which has to be added first.
+        """
+        if peer not in self.peers:
+            raise ValueError("peer not found")
+        self.sent.append(bytes(message))
+        self.air.deliver(self.mac, peer.mac, message)
+
+    def read(self):
+        """
+        Return the oldest received packet or None.
+        """
+        if not self.inbox:
+            return None
+        return self.inbox.pop(0)
+
+
+@pytest.fixture(name="air")
+def fixture_air(monkeypatch):
+    """
+    Install fake espnow module where the ESPNow objects are created for the node.
+    """
+    air = FakeAir()
+    module = types.ModuleType("espnow")
+    module.ESPNow = lambda: FakeESPNow(air, NODE_MAC)  # type: ignore [attr-defined]
+    module.Peer = FakePeer  # type: ignore [attr-defined]
+    monkeypatch.setitem(sys.modules, "espnow", module)
+    return air
+
+
+def _bridge(air: FakeAir, mqtt_client=None) -> EspNowBridge:
+    bridge = EspNowBridge(FakeESPNow(air, BRIDGE_MAC), mqtt_client or Mock())
+    air.handlers[BRIDGE_MAC] = bridge.poll
+    return bridge
+
+
+def _frame(seq: int = 7) -> bytes:
+    return pack_data("devices/garden", 80.0, 0, 45.0, 21.5, 100.0, seq=seq)
+
+
+def test_mac():
+    """
+    MAC address is converted to bytes and back.
+    """
+    assert parse_mac("02:00:00:00:00:01") == NODE_MAC
+    assert format_mac(NODE_MAC) == "02:00:00:00:00:01"
+    for invalid in ["02:00:00:00:00", "02:00:00:00:00:zz", "02:00:00:00:00:100"]:
+        with pytest.raises(ValueError):
+            parse_mac(invalid)
+
+
+def test_send_with_ack(air):
+    """
+    The frame is published by the bridge and acknowledged.
+    """
+    mqtt_client = Mock()
+    bridge = _bridge(air, mqtt_client)
+    link = EspNowLink(BRIDGE_MAC, ack_timeout=0.1)
+
+    assert link.send(_frame())
+    assert bridge.published == 1
+    topic, payload = mqtt_client.publish.call_args.args
+    assert topic == "devices/garden"
+    assert '"temperature": "21.5"' in payload
+
+
+def test_send_without_ack(air):
+    """
+    Without waiting for the ACK, the frame is considered sent once handed to ESP-NOW.
+    """
+    link = EspNowLink(BRIDGE_MAC)
+    assert link.send(_frame())
+    assert unpack_data(air.stations[NODE_MAC].sent[0])[-1] == 7
+
+
+def test_no_ack(air):
+    """
+    Lost frame is reported as not sent.
+    """
+    bridge = _bridge(air)
+    link = EspNowLink(BRIDGE_MAC, ack_timeout=0.05)
+    air.lose[BRIDGE_MAC] = 1
+    assert not link.send(_frame())
+    assert bridge.published == 0
+
+
+def test_lost_ack(air):
+    """
+    Frame re-sent after lost ACK is acknowledged but not published again.
+    """
+    mqtt_client = Mock()
+    _bridge(air, mqtt_client)
+    link = EspNowLink(BRIDGE_MAC, ack_timeout=0.05)
+
+    air.lose[NODE_MAC] = 1
+    assert not link.send(_frame())
+    assert link.send(_frame())
+    assert mqtt_client.publish.call_count == 1
+    assert air.stations[BRIDGE_MAC].sent == [ack_for(_frame())] * 2
+
+
+def test_publish_failure_not_acknowledged(air):
+    """
+    Frame that failed to be published is not acknowledged so that the node keeps it.
+    """
+    mqtt_client = Mock(publish=Mock(side_effect=OSError(104, "Connection reset")))
+    bridge = EspNowBridge(FakeESPNow(air, BRIDGE_MAC), mqtt_client)
+    link = EspNowLink(BRIDGE_MAC, ack_timeout=0.05)
+    assert not link.send(_frame())
+    with pytest.raises(OSError):
+        bridge.poll()
+    assert not air.stations[BRIDGE_MAC].sent
+
+
+def test_unknown_frame(air):
+    """
+    Frames of other format are ignored.
+    """
+    bridge = _bridge(air)
+    assert not bridge.handle(NODE_MAC, b"LG" + bytes(10))
+    assert not air.stations[BRIDGE_MAC].sent
+
+
+def test_backlog_frames(air):
+    """
+    Backlog records are acknowledged and published with timestamp, never as duplicates.
+    """
+    mqtt_client = Mock()
+    _bridge(air, mqtt_client)
+    link = EspNowLink(BRIDGE_MAC, ack_timeout=0.1)
+    frame = pack_data("devices/garden", 80.0, 0, 45.0, 21.5, 100.0, age=7)
+
+    assert link.send(frame)
+    assert link.send(frame)
+    assert mqtt_client.publish.call_count == 2
+    _, payload = mqtt_client.publish.call_args.args
+    assert '"timestamp"' in payload
+    assert '"seq"' not in payload
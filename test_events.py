@@ -0,0 +1,76 @@
+"""
+test the NVM event ring
+"""
+
+import events
+import sleepmem
+from events import (
+    CAPACITY,
+    EXCEPTION,
+    EXCEPTION_NAMES,
+    RESET,
+    RESET_REASONS,
+    decode,
+    enum_code,
+    exception_code,
+    format_entry,
+    get_events,
+    get_unreported,
+    record,
+)
+
+
+def clear():
+    """
+    Start with garbage in both memories.
+    """
+    # pylint: disable=protected-access
+    for i in range(events.EVENTS_END):
+        events._NVM[i] = 0xAA
+    sleepmem.reset()
+
+
+def test_codes():
+    """
+    Enum values and exceptions should be converted to the table index.
+    """
+    assert RESET_REASONS[enum_code(RESET_REASONS, "ResetReason.WATCHDOG")] == "WATCHDOG"
+    assert enum_code(RESET_REASONS, "ResetReason.FOO") == events.UNKNOWN_DETAIL
+    assert EXCEPTION_NAMES[exception_code(ConnectionError())] == "ConnectionError"
+
+
+def test_record_wraparound():
+    """
+    Only the last CAPACITY entries should be kept, in order.
+    """
+    clear()
+    assert not get_events()
+    for i in range(CAPACITY + 10):
+        record(EXCEPTION, i % 10)
+    entries = get_events()
+    assert len(entries) == CAPACITY
+    assert [entry[0] for entry in entries] == list(range(11, CAPACITY + 11))
+
+    # Lost sleep memory should be recovered from the ring.
+    sleepmem.reset()
+    assert get_events() == entries
+
+
+def test_unreported_and_decode(capsys):
+    """
+    Unreported entries should be returned just once, the dump should be decodable.
+    """
+    clear()
+    events.count_wake()
+    record(RESET, enum_code(RESET_REASONS, "ResetReason.POWER_ON"))
+    assert len(get_unreported()) == 1
+    assert not get_unreported()
+    record(EXCEPTION, exception_code(MemoryError()))
+    unreported = get_unreported()
+    assert len(unreported) == 1
+    assert format_entry(unreported[0]) == "2: exception MemoryError (wake 1)"
+
+    events.dump()
+    decoded = decode(bytes.fromhex(capsys.readouterr().out.strip()))
+    assert decoded == get_events()
+    assert format_entry(decoded[0]) == "1: reset POWER_ON (wake 1)"
@@ -0,0 +1,161 @@
+"""
+test the multi-bus hub daemon with stubbed buses
+"""
+
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from confchecks import ConfCheckException
+from hub import Group, Hub, build_groups, check_config
+
+# Time it takes to read the sensors of single group.
+READ_TIME = 0.1
+
+
+# pylint: disable=too-few-public-methods
+class StubSensors:
+    """
+    Sensors on stubbed bus that take fixed time to read.
+    """
+
+    def __init__(self, temperature: float = 20.0) -> None:
+        self.temperature = temperature
+
+    def get_measurements(self):
+        """
+        Block for the time of the read, like bus transactions and conversion waits do.
+        """
+        time.sleep(READ_TIME)
+        return 50.0, self.temperature, None, None
+
+
+def _groups(buses: int, per_bus: int = 1) -> list:
+    groups = []
+    for bus in range(buses):
+        lock = threading.Lock()
+        for channel in range(per_bus):
+            groups.append(Group(f"devices/bus{bus}/ch{channel}", StubSensors(), lock))
+    return groups
+
+
+def _sample_time(hub: Hub) -> float:
+    start = time.monotonic()
+    results = hub.sample()
+    elapsed = time.monotonic() - start
+    assert len(results) == len(hub.groups)
+    return elapsed
+
+
+def test_throughput_scales_with_buses():
+    """
+    Groups on separate buses are sampled concurrently.
+    """
+    throughput = {}
+    for buses in (1, 2, 4, 8):
+        hub = Hub(_groups(buses), Mock())
+        throughput[buses] = buses / _sample_time(hub)
+
+    assert throughput[2] > 1.5 * throughput[1]
+    assert throughput[4] > 3 * throughput[1]
+    assert throughput[8] > 6 * throughput[1]
+
+
+def test_same_bus_sequential():
+    """
+    Groups behind the same bus (multiplexer channels) do not overlap.
+    """
+    hub = Hub(_groups(1, per_bus=3), Mock(), workers=3)
+    assert _sample_time(hub) >= 3 * READ_TIME
+
+
+def test_failed_group_skipped():
+    """
+    Group that fails to be sampled does not prevent the others from being published.
+    """
+    groups = _groups(2)
+    groups[0].sensors = Mock(get_measurements=Mock(side_effect=OSError(5, "I/O")))
+    hub = Hub(groups, Mock())
+    results = hub.sample()
+    assert [group.topic for group, _ in results] == [groups[1].topic]
+
+
+def test_publish():
+    """
+    Each group is published to its own topic over the shared client.
+    """
+    mqtt_client = Mock()
+    hub = Hub(_groups(3), mqtt_client)
+    hub.publish(hub.sample())
+    topics = {call.args[0] for call in mqtt_client.publish.call_args_list}
+    assert topics == {group.topic for group in hub.groups}
+
+
+def test_build_groups(monkeypatch):
+    """
+    Buses and multiplexers are opened once, groups on the same bus share the lock.
+    """
+    monkeypatch.setattr(
+        "hub.Sensors", lambda i2c, **kwargs: Mock(i2c=i2c, memory=kwargs["memory"])
+    )
+    bus_opener = Mock(side_effect=lambda number: f"i2c-{number}")
+    mux_opener = Mock(
+        side_effect=lambda i2c, address: [f"{i2c}/{ch}" for ch in range(8)]
+    )
+    config = {
+        "groups": [
+            {"mqtt_topic": "a", "bus": 1},
+            {"mqtt_topic": "b", "bus": 3, "mux": 0x70, "channel": 0},
+            {"mqtt_topic": "c", "bus": 3, "mux": 0x70, "channel": 5},
+        ]
+    }
+    groups = build_groups(config, bus_opener, mux_opener)
+
+    assert bus_opener.call_count == 2
+    mux_opener.assert_called_once_with("i2c-3", 0x70)
+    assert [group.sensors.i2c for group in groups] == ["i2c-1", "i2c-3/0", "i2c-3/5"]
+    assert groups[1].bus_lock is groups[2].bus_lock
+    assert groups[0].bus_lock is not groups[1].bus_lock
+    assert groups[0].sensors.memory is not groups[1].sensors.memory
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"broker": "localhost"},
+        {"broker": "localhost", "groups": []},
+        {"broker": "localhost", "groups": [{"bus": 1}]},
+        {"broker": "localhost", "groups": [{"mqtt_topic": "a", "mux": 0x70}]},
+        {"groups": [{"mqtt_topic": "a"}]},
+        {"broker": "localhost", "groups": [{"mqtt_topic": "a", "light_gain": 3}]},
+        {
+            "broker": "localhost",
+            "groups": [{"mqtt_topic": "a", "sensor_profiles": {"sht40": "fast"}}],
+        },
+        {
+            "broker": "localhost",
+            "groups": [
+                {
+                    "mqtt_topic": "a",
+                    "light_gain": 1,
+                    "sensor_profiles": {"veml7700": "auto"},
+                }
+            ],
+        },
+    ],
+)
+def test_invalid_config(config):
+    """
+    Incomplete configuration is rejected.
+    """
+    with pytest.raises(ConfCheckException):
+        check_config(config)
+
+
+def test_valid_config():
+    """
+    Minimal configuration is accepted.
+    """
+    check_config({"broker": "localhost", "groups": [{"mqtt_topic": "a"}]})
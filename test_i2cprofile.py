@@ -0,0 +1,159 @@
+"""
+test the I2C profiling proxy with fake bus and real drivers
+"""
+
+import sys
+
+import adafruit_veml7700
+import pytest
+
+from i2cprofile import I2CProfiler
+
+VEML7700_ADDRESS = 0x10
+OTHER_ADDRESS = 0x11
+
+
+def _check_end(end) -> None:
+    # Like the native busio.I2C, which does not accept None.
+    if not isinstance(end, int):
+        raise TypeError(f"end must be int, not {type(end).__name__}")
+
+
+class FakeI2C:
+    """
+    I2C bus with devices having 8-bit register pointer and 256 bytes of registers.
+    """
+
+    def __init__(self, registers: dict) -> None:
+        """
+        :param registers: address to dictionary of initial register values
+        """
+        self.registers = {}
+        self.pointers = {}
+        for address, values in registers.items():
+            memory = bytearray(256)
+            for register, value in values.items():
+                memory[register : register + len(value)] = value
+            self.registers[address] = memory
+            self.pointers[address] = 0
+
+    def try_lock(self) -> bool:
+        """
+        The bus is always available.
+        """
+        return True
+
+    def unlock(self) -> None:
+        """
+        Nothing to unlock.
+        """
+
+    def scan(self) -> list:
+        """
+        Return the addresses of the devices.
+        """
+        return sorted(self.registers)
+
+    def _memory(self, address: int) -> bytearray:
+        if address not in self.registers:
+            raise OSError(19, "No such device")
+        return self.registers[address]
+
+    def writeto(
+        self, address: int, buffer, *, start: int = 0, end: int = sys.maxsize
+    ) -> None:
+        """
+        Set the register pointer and write the rest of the data from there.
+        """
+        _check_end(end)
+        memory = self._memory(address)
+        data = bytes(buffer[start:end])
+        if data:
+            pointer = self.pointers[address] = data[0]
+            memory[pointer : pointer + len(data) - 1] = data[1:]
+
+    def readfrom_into(
+        self, address: int, buffer, *, start: int = 0, end: int = sys.maxsize
+    ) -> None:
+        """
+        Read from the register pointer.
+        """
+        _check_end(end)
+        memory = self._memory(address)
+        end = min(end, len(buffer))
+        pointer = self.pointers[address]
+        buffer[start:end] = memory[pointer : pointer + end - start]
+
+    # pylint: disable=too-many-arguments
+    def writeto_then_readfrom(
+        self,
+        address: int,
+        out_buffer,
+        in_buffer,
+        *,
+        out_start: int = 0,
+        out_end: int = sys.maxsize,
+        in_start: int = 0,
+        in_end: int = sys.maxsize,
+    ) -> None:
+        """
+        Set the register pointer and read from there.
+        """
+        self.writeto(address, out_buffer, start=out_start, end=out_end)
+        self.readfrom_into(address, in_buffer, start=in_start, end=in_end)
+
+
+@pytest.fixture(name="profiler")
+def fixture_profiler():
+    """
+    Profiler of fake bus with two VEML7700 devices, one on non-default address.
+    """
+    bus = FakeI2C({VEML7700_ADDRESS: {}, OTHER_ADDRESS: {}})
+    return I2CProfiler(bus)
+
+
+def test_lux_read(profiler):
+    """
+    The lux reading re-reads the configuration registers besides the ALS data.
+    """
+    veml7700 = adafruit_veml7700.VEML7700(profiler)
+    profiler.reset()
+
+    _ = veml7700.lux
+
+    stats = profiler.stats[VEML7700_ADDRESS]
+    assert stats.transactions == 4
+    assert stats.read == 8
+    assert stats.errors == 0
+    assert list(profiler.stats) == [VEML7700_ADDRESS]
+
+
+def test_per_device(profiler):
+    """
+    The statistics are kept per device address.
+    """
+    adafruit_veml7700.VEML7700(profiler)
+    adafruit_veml7700.VEML7700(profiler, address=OTHER_ADDRESS)
+
+    assert set(profiler.stats) == {VEML7700_ADDRESS, OTHER_ADDRESS}
+    summary = profiler.summary()
+    assert "0x10 (VEML7700): 5 transactions" in summary
+    assert "0x11 (unknown): 5 transactions" in summary
+
+
+def test_errors(profiler):
+    """
+    Failed transactions (e.g. probing for absent device) are counted.
+    """
+    with pytest.raises(ValueError):
+        adafruit_veml7700.VEML7700(profiler, address=0x12)
+
+    assert profiler.stats[0x12].errors == 2
+
+
+def test_passthrough(profiler):
+    """
+    The rest of the bus interface is passed through.
+    """
+    assert profiler.scan() == [VEML7700_ADDRESS, OTHER_ADDRESS]
+    assert profiler.try_lock()
@@ -0,0 +1,71 @@
+"""
+test the triggers of the maintenance window
+"""
+
+from unittest.mock import Mock
+
+import pytest
+
+import maintenance
+import sleepmem
+from maintenance import maintenance_reason, request_maintenance
+
+
+@pytest.fixture(name="board")
+def fixture_board(monkeypatch):
+    """
+    Board with the button released and USB disconnected.
+    """
+    sleepmem.reset()
+    button = Mock(value=True)
+    digitalio = Mock()
+    digitalio.DigitalInOut.return_value.__enter__ = Mock(return_value=button)
+    digitalio.DigitalInOut.return_value.__exit__ = Mock(return_value=False)
+    supervisor = Mock()
+    supervisor.runtime.usb_connected = False
+    monkeypatch.setattr(maintenance, "digitalio", digitalio, raising=False)
+    monkeypatch.setattr(maintenance, "board", Mock(spec=["BUTTON"]), raising=False)
+    monkeypatch.setattr(maintenance, "supervisor", supervisor, raising=False)
+    return button, supervisor
+
+
+def test_not_requested(board):  # pylint: disable=unused-argument
+    """
+    No trigger means no maintenance window.
+    """
+    assert maintenance_reason("BUTTON") is None
+
+
+def test_pin_held(board):
+    """
+    Held button opens the window.
+    """
+    button, _ = board
+    button.value = False
+    assert maintenance_reason("BUTTON") == "pin BUTTON held"
+    assert maintenance_reason() is None
+
+
+def test_unknown_pin(board):  # pylint: disable=unused-argument
+    """
+    Misconfigured pin does not prevent the deep sleep.
+    """
+    assert maintenance_reason("D99") is None
+
+
+def test_usb_connected(board):
+    """
+    Connected USB host opens the window.
+    """
+    _, supervisor = board
+    supervisor.runtime.usb_connected = True
+    assert maintenance_reason() == "USB connected"
+
+
+def test_requested(board):  # pylint: disable=unused-argument
+    """
+    The request from the gateway opens the window once.
+    """
+    request_maintenance()
+    assert maintenance_reason() == "requested by the gateway"
+    assert maintenance_reason() is None
@@ -0,0 +1,126 @@
+"""
+test the metrics HTTP endpoint using CPython sockets
+"""
+
+import json
+import socket
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from metrics_server import MetricsServer, ReadingCache, render_openmetrics
+
+
+# pylint: disable=too-few-public-methods
+class SocketPool:
+    """
+    Stand-in for CircuitPython socketpool.SocketPool backed by plain sockets.
+    """
+
+    AF_INET = socket.AF_INET
+    SOCK_STREAM = socket.SOCK_STREAM
+    SOL_SOCKET = socket.SOL_SOCKET
+    SO_REUSEADDR = socket.SO_REUSEADDR
+
+    socket = staticmethod(socket.socket)
+
+
+def test_cache_ttl():
+    """
+    Expired values should not be returned.
+    """
+    with patch("time.monotonic", return_value=100.0):
+        cache = ReadingCache(10)
+        cache.update_measurements(40.0, 21.5, None, 100)
+    with patch("time.monotonic", return_value=105.0):
+        assert cache.snapshot() == {"temperature": 21.5, "humidity": 40.0, "lux": 100}
+        cache.update("lux", 200)
+    with patch("time.monotonic", return_value=111.0):
+        assert cache.get("temperature") is None
+        assert cache.snapshot() == {"lux": 200}
+
+
+def test_render_openmetrics():
+    """
+    Check the text format.
+    """
+    assert render_openmetrics({"temperature": 21.5}) == (
+        "# TYPE shield_temperature gauge\nshield_temperature 21.5\n# EOF\n"
+    )
+
+
+def fetch(port: int, path: str, results: list) -> None:
+    """
+    Perform HTTP GET request and append the response to the results.
+    """
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        sock.sendall(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        response = b""
+        while chunk := sock.recv(1024):
+            response += chunk
+    results.append(response)
+
+
+@pytest.mark.parametrize("clients", [1, 8])
+def test_server(clients):
+    """
+    Concurrent clients should get the cached values.
+    """
+    cache = ReadingCache(60)
+    cache.update_measurements(40.0, 21.5, 800, None)
+    server = MetricsServer(SocketPool(), cache, 0, host="127.0.0.1")
+    # pylint: disable=protected-access
+    port = server._sock.getsockname()[1]
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=fetch, args=(port, "/json" if i % 2 else "/metrics", results)
+        )
+        for i in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+
+    end = time.monotonic() + 5
+    while len(results) < clients and time.monotonic() < end:
+        server.poll()
+        time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    server.close()
+
+    assert len(results) == clients
+    for response in results:
+        header, body = response.split(b"\r\n\r\n", 1)
+        assert header.startswith(b"HTTP/1.1 200 OK")
+        if b"application/json" in header:
+            assert json.loads(body) == {
+                "temperature": 21.5,
+                "humidity": 40.0,
+                "co2_ppm": 800,
+            }
+        else:
+            assert b"shield_co2_ppm 800\n" in body
+            assert body.endswith(b"# EOF\n")
+
+
+def test_not_found():
+    """
+    Unknown path should result in 404.
+    """
+    server = MetricsServer(SocketPool(), ReadingCache(60), 0, host="127.0.0.1")
+    # pylint: disable=protected-access
+    port = server._sock.getsockname()[1]
+    results = []
+    thread = threading.Thread(target=fetch, args=(port, "/foo", results))
+    thread.start()
+    end = time.monotonic() + 5
+    while not results and time.monotonic() < end:
+        server.poll()
+        time.sleep(0.001)
+    thread.join()
+    server.close()
+    assert results[0].startswith(b"HTTP/1.1 404")
@@ -0,0 +1,147 @@
+"""
+test the modem profiles and the duty cycle ledger
+"""
+
+from unittest.mock import Mock
+
+import pytest
+
+import sleepmem
+from data import pack_data, send_data
+from modem import (
+    PROFILES,
+    DutyCycleLedger,
+    apply_profile,
+    profile_airtime,
+    rx_bandwidth_settings,
+)
+from txpower import PowerControl
+
+
+def test_rx_bandwidth_settings():
+    """
+    The narrowest bandwidth at least the requested one should be chosen.
+    """
+    # 32 MHz / (16 * 2^2)
+    assert rx_bandwidth_settings(500000) == (0, 0)
+    # 32 MHz / (24 * 2^(4 + 2))
+    assert rx_bandwidth_settings(20000) == (2, 4)
+    with pytest.raises(ValueError):
+        rx_bandwidth_settings(600000)
+
+
+def test_apply_profile():
+    """
+    The radio should be configured with the profile values.
+    """
+    rfm69 = Mock()
+    apply_profile(rfm69, PROFILES["long_range"])
+    assert rfm69.bitrate == 4800
+    assert rfm69.frequency_deviation == 9600
+    assert rfm69.preamble_length == 8
+    assert (rfm69.rx_bw_mantissa, rfm69.rx_bw_exponent) == (0, 4)
+
+
+def test_profile_airtime():
+    """
+    The airtime of the current frame should grow as the bitrate goes down.
+    """
+    payload_len = len(pack_data("devices/terasa/shield", 80, 1200, 33, 21, 4000))
+    airtimes = [profile_airtime(profile, payload_len) for profile in PROFILES.values()]
+    assert airtimes == sorted(airtimes)
+    # preamble, sync word, length, header, payload, CRC
+    assert airtimes[-1] == pytest.approx((8 + 2 + 1 + 4 + payload_len + 2) * 8 / 4800)
+
+
+def test_ledger():
+    """
+    The budget should be exhausted by the transmissions and replenished with time.
+    """
+    sleepmem.reset()
+    ledger = DutyCycleLedger(1, PROFILES["long_range"])
+    # 36 seconds of airtime per hour
+    airtime = ledger.airtime(59)
+    assert airtime == pytest.approx(0.1267, abs=0.001)
+
+    sent = 0
+    while ledger.allows(airtime, now=1000):
+        ledger.record(airtime, now=1000)
+        sent += 1
+    assert sent == int(36 / airtime)
+
+    # After a minute, 0.6 seconds of airtime is available again.
+    assert ledger.allows(airtime, now=1060)
+    assert not ledger.allows(0.61 + airtime, now=1060)
+    # The clock going backwards should not block the transmissions forever.
+    assert ledger.allows(airtime, now=10)
+
+
+def test_send_data_deferred():
+    """
+    With the budget exhausted, the data should go to the backlog instead of the radio.
+    """
+    sleepmem.reset()
+    ledger = DutyCycleLedger(0.001, PROFILES["long_range"])
+    rfm69 = Mock()
+    sensors = Mock()
+    sensors.get_measurements.return_value = (40.0, 21.0, None, None)
+    backlog = Mock()
+
+    send_data(rfm69, None, "foo/bar", sensors, None, backlog=backlog, ledger=ledger)
+
+    rfm69.send.assert_not_called()
+    backlog.append.assert_called_once()
+
+
+class LossyRFM69:
+    """
+    Radio whose frames never get ACK, retrying like adafruit_rfm69 does.
+    """
+
+    def __init__(self, ack_retries: int) -> None:
+        self.ack_retries = ack_retries
+        self.tx_power = 20
+        self.last_rssi = 0.0
+        self.sent = 0
+
+    def send(self, _data, **_kwargs) -> bool:
+        """
+        Count the transmission.
+        """
+        self.sent += 1
+        return True
+
+    def send_with_ack(self, data) -> bool:
+        """
+        Transmit the data for each retry, never getting the ACK.
+        """
+        for _ in range(self.ack_retries):
+            self.send(data, keep_listening=True)
+        return False
+
+
+def test_send_data_retries_counted():
+    """
+    Each retry of the transmission with ACK should be counted against the budget,
+    and the worst case should fit into the budget for the transmission to start.
+    """
+    sleepmem.reset()
+    ledger = DutyCycleLedger(1, PROFILES["long_range"])
+    control = PowerControl(-2, 20, -80)
+    rfm69 = LossyRFM69(ack_retries=3)
+    sensors = Mock()
+    sensors.get_measurements.return_value = (40.0, 21.0, None, None)
+
+    send_data(
+        rfm69, None, "foo/bar", sensors, None, power_control=control, ledger=ledger
+    )
+    assert rfm69.sent == 3
+    airtime = ledger.airtime(len(pack_data("foo/bar", None, None, 40.0, 21.0, None)))
+    assert ledger.used() == pytest.approx(3 * airtime, rel=0.01)
+
+    # Budget for two more transmissions only.
+    sleepmem.store(sleepmem.DUTY_CYCLE_USED, ledger.budget - 2.5 * airtime)
+    send_data(
+        rfm69, None, "foo/bar", sensors, None, power_control=control, ledger=ledger
+    )
+    assert rfm69.sent == 3
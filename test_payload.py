@@ -0,0 +1,135 @@
+"""
+test the MQTT payload encoding
+"""
+
+import json
+import struct
+from unittest.mock import Mock
+
+import pytest
+
+import sleepmem
+from aggregate import Aggregator
+from data import publish_aggregated, send_data
+from payload import CBOR, JSON, cbor_decode, cbor_encode, decode, encode, topic
+
+
+@pytest.mark.parametrize(
+    "obj, encoded",
+    [
+        (0, "00"),
+        (23, "17"),
+        (24, "1818"),
+        (1000, "1903e8"),
+        (1000000, "1a000f4240"),
+        (-1, "20"),
+        (-1000, "3903e7"),
+        (None, "f6"),
+        (True, "f5"),
+        (False, "f4"),
+        ("a", "6161"),
+        ([1, 2], "820102"),
+        ({}, "a0"),
+        ({"a": 1}, "a1616101"),
+        (1.5, "fa3fc00000"),
+    ],
+)
+def test_cbor_vectors(obj, encoded):
+    """
+    Check the encoding against the examples from RFC 8949 (with single precision floats).
+    """
+    assert cbor_encode(obj).hex() == encoded
+    assert cbor_decode(bytes.fromhex(encoded)) == obj
+
+
+def test_cbor_roundtrip():
+    """
+    Encoded message should decode to the same values (up to single precision).
+    """
+    data = {"temperature": 21.7, "humidity": 45.3, "co2_ppm": 812, "timestamp": 1700}
+    decoded = cbor_decode(cbor_encode(data))
+    assert decoded.keys() == data.keys()
+    for key, value in data.items():
+        assert decoded[key] == pytest.approx(value)
+    assert isinstance(decoded["co2_ppm"], int)
+
+
+def test_cbor_smaller():
+    """
+    CBOR payload with native values should be smaller than the JSON one.
+    """
+    data = {"temperature": 21.7, "humidity": 45.3, "co2_ppm": 812, "lux": 123.4}
+    json_data = {key: f"{value}" for key, value in data.items()}
+    assert len(encode(data, CBOR)) < len(encode(json_data, JSON))
+
+
+def test_cbor_nan():
+    """
+    NaN should be encoded as half precision float.
+    """
+    encoded = cbor_encode(float("nan"))
+    assert encoded.hex() == "f97e00"
+    assert struct.unpack(">e", encoded[1:])[0] != 0
+
+
+def test_send_data_cbor():
+    """
+    With CBOR format, the data should be published to the suffixed topic with native values.
+    """
+    sleepmem.reset()
+    sensors = Mock()
+    sensors.get_measurements.return_value = (45.3, 21.5, 812, None)
+    mqtt_client = Mock()
+
+    send_data(None, mqtt_client, "foo/bar", sensors, 87.5, payload_format=CBOR)
+
+    mqtt_topic, payload = mqtt_client.publish.call_args.args
+    assert mqtt_topic == topic("foo/bar", CBOR) == "foo/bar/cbor"
+    data = decode(payload, mqtt_topic)
+    assert data == {
+        "humidity": pytest.approx(45.3),
+        "temperature": 21.5,
+        "co2_ppm": 812,
+        "battery_level": 87.5,
+        "seq": 1,
+    }
+
+
+def test_send_data_json():
+    """
+    The default format should stay the same.
+    """
+    sleepmem.reset()
+    sensors = Mock()
+    sensors.get_measurements.return_value = (45.3, 21.5, 812, None)
+    mqtt_client = Mock()
+
+    send_data(None, mqtt_client, "foo/bar", sensors, 87.5)
+
+    mqtt_topic, payload = mqtt_client.publish.call_args.args
+    assert mqtt_topic == "foo/bar"
+    assert json.loads(payload) == {
+        "humidity": "45.3",
+        "temperature": "21.5",
+        "co2_ppm": "812",
+        "battery_level": "87.50",
+        "seq": "1",
+    }
+
+
+def test_publish_aggregated_cbor():
+    """
+    The aggregated data should be published with native values as well.
+    """
+    aggregator = Aggregator()
+    aggregator.add_measurements(40.0, 20.0, 800, None)
+    aggregator.add_measurements(50.0, 22.0, 900, None)
+    mqtt_client = Mock()
+
+    publish_aggregated(mqtt_client, "foo", aggregator, None, payload_format=CBOR)
+
+    mqtt_topic, payload = mqtt_client.publish.call_args.args
+    data = decode(payload, mqtt_topic)
+    assert data["temperature_mean"] == 21.0
+    assert data["co2_ppm_max"] == 900
+    assert data["samples"] == 2
@@ -0,0 +1,95 @@
+"""
+test the radio utilities
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+import sleepmem
+from deadline import Deadline
+from radio import LBT_BACKOFF_CAP, LBT_MAX_ATTEMPTS_LIMIT, send_with_lbt
+
+
+class FakeRFM69:
+    """
+    Radio stand-in returning given sequence of RSSI values.
+    """
+
+    def __init__(self, rssi_values):
+        self._rssi_values = iter(rssi_values)
+        self.sent = []
+
+    def listen(self):
+        """
+        Receive mode.
+        """
+
+    # pylint: disable=unused-argument
+    def _write_u8(self, address, val):
+        pass
+
+    # pylint: disable=unused-argument
+    def _read_u8(self, address):
+        return 0xFF
+
+    @property
+    def rssi(self):
+        """
+        Next RSSI value.
+        """
+        return next(self._rssi_values)
+
+    def send(self, data):
+        """
+        Record the data.
+        """
+        self.sent.append(data)
+        return True
+
+
+@pytest.mark.parametrize(
+    "rssi_values,busy",
+    [([-100], 0), ([-50, -60, -100], 2), ([-50, -50, -50], 3)],
+)
+def test_send_with_lbt(rssi_values, busy):
+    """
+    The data should be sent once the channel is clear or when running out of attempts.
+    The busy counter should reflect the busy channel checks.
+    """
+    sleepmem.reset()
+    rfm69 = FakeRFM69(rssi_values)
+    with patch("time.sleep") as sleep_mock:
+        assert send_with_lbt(rfm69, b"foo", -90, max_attempts=3)
+    assert rfm69.sent == [b"foo"]
+    assert sleep_mock.call_count == busy
+    assert sleepmem.load(sleepmem.CHANNEL_BUSY) == busy
+    assert sleepmem.load(sleepmem.CHANNEL_CHECKS) == min(busy + 1, 3)
+
+
+def test_send_with_lbt_bounded():
+    """
+    The number of attempts and the backoff intervals should be capped.
+    """
+    sleepmem.reset()
+    rfm69 = FakeRFM69([-50] * 100)
+    with patch("time.sleep") as sleep_mock:
+        assert send_with_lbt(rfm69, b"foo", -90, max_attempts=50)
+    assert rfm69.sent == [b"foo"]
+    assert sleepmem.load(sleepmem.CHANNEL_CHECKS) == LBT_MAX_ATTEMPTS_LIMIT
+    assert max(call.args[0] for call in sleep_mock.call_args_list) <= LBT_BACKOFF_CAP
+
+
+def test_send_with_lbt_deadline():
+    """
+    Without time left in the deadline, the data should be sent without backing off.
+    """
+    sleepmem.reset()
+    rfm69 = FakeRFM69([-50] * 5)
+    with patch("time.sleep") as sleep_mock:
+        assert send_with_lbt(
+            rfm69, b"foo", -90, max_attempts=5, deadline=Deadline(1, reserve=1)
+        )
+    assert rfm69.sent == [b"foo"]
+    sleep_mock.assert_not_called()
+    assert sleepmem.load(sleepmem.CHANNEL_BUSY) == 1
@@ -0,0 +1,243 @@
+"""
+test the relay mode with fake radio medium
+"""
+
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from data import pack_data
+from relay import HEADER_LEN, Relay
+
+BROADCAST = 255
+
+
+class FakeMedium:
+    """
+    Radio medium connecting the fake radios. Each radio hears only the radios
+    within its reach.
+    """
+
+    def __init__(self) -> None:
+        self.radios: dict = {}
+        self.links: set = set()
+
+    def link(self, first: int, second: int) -> None:
+        """
+        Make the two nodes hear each other.
+        """
+        self.links.add((first, second))
+        self.links.add((second, first))
+
+    def transmit(self, sender: int, packet: bytes) -> None:
+        """
+        Deliver the packet to all radios in reach of the sender.
+        """
+        for node, radio in self.radios.items():
+            if (sender, node) in self.links:
+                radio.queue.append(packet)
+
+
+class FakeRadio:
+    """
+    Fake RFM69 attached to the medium.
+    """
+
+    def __init__(self, medium: FakeMedium, node: int) -> None:
+        self.medium = medium
+        # The position in the medium; the node address can change.
+        self.station = node
+        self.node = node
+        self.queue: list = []
+        medium.radios[node] = self
+
+    # pylint: disable=too-many-arguments
+    def send(
+        self,
+        data,
+        *,
+        keep_listening=False,
+        destination=None,
+        node=None,
+        identifier=None,
+        flags=None,
+    ) -> bool:
+        """
+        Send the data with RadioHead header, like adafruit_rfm69 does.
+        """
+        _ = keep_listening
+        header = bytes(
+            [
+                BROADCAST if destination is None else destination,
+                self.node if node is None else node,
+                identifier or 0,
+                flags or 0,
+            ]
+        )
+        self.medium.transmit(self.station, header + bytes(data))
+        return True
+
+    def receive(self, *, keep_listening=True, with_header=False, timeout=None):
+        """
+        Return the oldest received packet or None. Like adafruit_rfm69, drop the packets
+        addressed to other nodes, unless having the broadcast address.
+        """
+        _ = (keep_listening, timeout)
+        while self.queue:
+            packet = self.queue.pop(0)
+            if self.node == BROADCAST or packet[0] in (BROADCAST, self.node):
+                return packet if with_header else packet[HEADER_LEN:]
+        return None
+
+
+def _frame(seq: int) -> bytes:
+    return pack_data("foo/bar", 80.0, 1200, 33.0, 21.0, 4000.0, seq=seq)
+
+
+def _setup():
+    """
+    Battery node 1 reaches only relay 2 which reaches gateway 3.
+    """
+    medium = FakeMedium()
+    node = FakeRadio(medium, 1)
+    relay_radio = FakeRadio(medium, 2)
+    gateway = FakeRadio(medium, 3)
+    medium.link(1, 2)
+    medium.link(2, 3)
+    return node, relay_radio, gateway
+
+
+def test_retransmit():
+    """
+    The frame should reach the gateway via the relay, with the original source.
+    """
+    node, relay_radio, gateway = _setup()
+    relay = Relay(relay_radio, [1])
+
+    node.send(_frame(1))
+    assert not gateway.queue
+    assert relay.poll()
+
+    packet = gateway.receive(with_header=True)
+    assert packet[1] == 1
+    assert packet[3] == 1  # hops
+    assert packet[HEADER_LEN:] == _frame(1)
+
+
+def test_duplicate():
+    """
+    The same frame should be forwarded only once.
+    """
+    node, relay_radio, gateway = _setup()
+    relay = Relay(relay_radio, [1])
+
+    node.send(_frame(7))
+    node.send(_frame(7))
+    node.send(_frame(8))
+    assert relay.poll()
+    assert not relay.poll()
+    assert relay.poll()
+    assert len(gateway.queue) == 2
+    assert relay.dropped == 1
+
+
+def test_unknown_node():
+    """
+    Frames from nodes that are not configured should not be forwarded.
+    """
+    node, relay_radio, gateway = _setup()
+    relay = Relay(relay_radio, [5])
+
+    node.send(_frame(1))
+    assert not relay.poll()
+    assert not gateway.queue
+
+
+def test_hop_limit():
+    """
+    Two relays hearing each other should not bounce the frame beyond the hop limit.
+    """
+    medium = FakeMedium()
+    node = FakeRadio(medium, 1)
+    first = Relay(FakeRadio(medium, 2), [1], hop_limit=1)
+    second = Relay(FakeRadio(medium, 4), [1], hop_limit=1)
+    medium.link(1, 2)
+    medium.link(2, 4)
+
+    node.send(_frame(1))
+    assert first.poll()
+    # The second relay hears the already relayed frame.
+    assert not second.poll()
+    assert second.dropped == 1
+
+
+def test_hop_limit_invalid():
+    """
+    The hop count has to fit into the header flags.
+    """
+    with pytest.raises(ValueError):
+        Relay(Mock(), [1], hop_limit=16)
+
+
+def test_publish():
+    """
+    With MQTT client, the frame should be published directly.
+    """
+    node, relay_radio, gateway = _setup()
+    mqtt_client = Mock()
+    relay = Relay(relay_radio, [1], mqtt_client=mqtt_client)
+
+    node.send(pack_data("foo/bar", None, 1200, 33.0, 21.5, None, seq=3))
+    assert relay.poll()
+    assert not gateway.queue
+
+    topic, payload = mqtt_client.publish.call_args.args
+    assert topic == "foo/bar"
+    assert json.loads(payload) == {
+        "temperature": "21.5",
+        "humidity": "33.0",
+        "co2_ppm": "1200",
+        "seq": "3",
+    }
+
+
+def test_publish_backlog(monkeypatch):
+    """
+    Backlog record should be published with timestamp and without deduplication.
+    """
+    monkeypatch.setattr("relay.time.time", lambda: 100000)
+    node, relay_radio, _ = _setup()
+    mqtt_client = Mock()
+    relay = Relay(relay_radio, [1], mqtt_client=mqtt_client)
+
+    frame = pack_data("foo/bar", None, None, 33.0, None, None, age=7)
+    node.send(frame)
+    node.send(frame)
+    assert relay.poll()
+    assert relay.poll()
+
+    topic, payload = mqtt_client.publish.call_args.args
+    assert topic == "foo/bar"
+    assert json.loads(payload) == {"humidity": "33.0", "timestamp": 100000 - 7 * 60}
+
+
+def test_relay_with_node_address():
+    """
+    Relay with node address should relay the frames addressed to the gateway
+    and keep its address.
+    """
+    node, relay_radio, gateway = _setup()
+    relay_radio.node = 20
+    relay = Relay(relay_radio, [1])
+
+    node.send(_frame(1), destination=3)
+    assert not relay.poll()
+    node.send(_frame(2), destination=3)
+    relay.serve_for(0.05)
+
+    assert relay.forwarded == 1
+    assert relay_radio.node == 20
+    packet = gateway.receive(with_header=True)
+    assert packet[:2] == bytes([3, 1])
+    assert packet[HEADER_LEN:] == _frame(2)
@@ -0,0 +1,67 @@
+"""
+test the per metric sampling scheduler
+"""
+
+from unittest.mock import Mock, PropertyMock
+
+import pytest
+
+import sleepmem
+from fakesensors import make_sensors
+from sampling import SamplingScheduler
+
+
+def test_scheduler():
+    """
+    Metrics should be due once per their period, the cached values used in between.
+    """
+    sleepmem.reset()
+    scheduler = SamplingScheduler({"temperature": 60, "co2_ppm": 5})
+
+    due = scheduler.due(now=1000)
+    assert due == {"humidity", "temperature", "co2_ppm", "lux"}
+    assert scheduler.update((40.0, 21.5, 800, None), due, now=1000) == (
+        40.0,
+        21.5,
+        800,
+        None,
+    )
+
+    due = scheduler.due(now=1010)
+    assert due == {"humidity", "co2_ppm", "lux"}
+    assert scheduler.update((41.0, None, 900, 5.0), due, now=1010) == (
+        41.0,
+        21.5,
+        900,
+        5.0,
+    )
+
+    assert scheduler.due(now=1060) == {"humidity", "temperature", "co2_ppm", "lux"}
+
+
+def test_scheduler_unknown_metric():
+    """
+    Unknown metric should be rejected.
+    """
+    with pytest.raises(ValueError):
+        SamplingScheduler({"pressure": 60})
+
+
+def test_sensors_read_only_due(monkeypatch):
+    """
+    The sensors for metrics that are not due should not be touched.
+    """
+    sleepmem.reset()
+    tmp117 = Mock()
+    temperature = PropertyMock(return_value=21.5)
+    type(tmp117).temperature = temperature
+    sensors = make_sensors(
+        monkeypatch,
+        tmp117=tmp117,
+        veml7700=Mock(lux=100),
+        sampling_periods={"temperature": 3600},
+    )
+
+    for _ in range(3):
+        assert sensors.get_measurements() == (None, 21.5, None, 100)
+    assert temperature.call_count == 1
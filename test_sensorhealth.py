@@ -0,0 +1,111 @@
+"""
+test the per sensor fault isolation
+"""
+
+from unittest.mock import Mock, PropertyMock
+
+import pytest
+
+import sensorhealth
+import sleepmem
+from fakesensors import make_sensors
+from sensorhealth import BACKOFF_BASE, SCD4X, SHT40, SensorHealth
+from sensors import Sensors
+
+
+@pytest.fixture(name="clock")
+def fixture_clock(monkeypatch):
+    """
+    Real time clock that can be moved forward.
+    """
+    sleepmem.reset()
+    clock = [1700000000]
+    monkeypatch.setattr(sensorhealth.time, "time", lambda: clock[0])
+    return clock
+
+
+def _sensors(monkeypatch, sht40_temperature: PropertyMock, **kwargs) -> Sensors:
+    sht40 = Mock(relative_humidity=45.0)
+    type(sht40).temperature = sht40_temperature
+    return make_sensors(
+        monkeypatch,
+        sht40=sht40,
+        aht20=Mock(temperature=22.0, relative_humidity=50.0),
+        **kwargs
+    )
+
+
+def test_fallback_and_backoff(clock, monkeypatch):
+    """
+    Failing sensor is replaced by the next one in priority and not read
+    until the backoff expires.
+    """
+    temperature = PropertyMock(side_effect=OSError(5, "Input/output error"))
+    sensors = _sensors(monkeypatch, temperature)
+
+    assert sensors.get_measurements() == (50.0, 22.0, None, None)
+    assert temperature.call_count == 1
+    assert sensors.health.failing() == {SHT40: 1}
+
+    clock[0] += BACKOFF_BASE - 1
+    assert sensors.get_measurements() == (50.0, 22.0, None, None)
+    assert temperature.call_count == 1
+
+    # Second failure doubles the backoff.
+    clock[0] += 1
+    sensors.get_measurements()
+    assert temperature.call_count == 2
+    clock[0] += 2 * BACKOFF_BASE - 1
+    sensors.get_measurements()
+    assert temperature.call_count == 2
+
+    # Recovered sensor is used again.
+    temperature.side_effect = None
+    temperature.return_value = 21.0
+    clock[0] += 1
+    assert sensors.get_measurements() == (45.0, 21.0, None, None)
+    assert not sensors.health.failing()
+
+
+def test_co2_fallback(clock, monkeypatch):
+    """
+    CO2 is read from STCC4 while the failing SCD4x is disabled.
+    """
+    scd4x = Mock()
+    data_ready = PropertyMock(side_effect=OSError(5, "Input/output error"))
+    type(scd4x).data_ready = data_ready
+    stcc4 = Mock(CO2=800)
+    sensors = _sensors(
+        monkeypatch, PropertyMock(return_value=21.0), scd4x=scd4x, stcc4=stcc4
+    )
+    # Both sensors are initialized, SCD4x is preferred.
+    assert sensors.stcc4_sensor is stcc4
+    assert stcc4.continuous_measurement
+
+    assert sensors.get_measurements() == (45.0, 21.0, 800, None)
+    assert sensors.health.failing() == {SCD4X: 1}
+
+    clock[0] += BACKOFF_BASE - 1
+    assert sensors.get_measurements() == (45.0, 21.0, 800, None)
+    assert data_ready.call_count == 1
+
+
+def test_backoff_capped(clock):
+    """
+    The disable period does not grow beyond the maximum.
+    """
+    health = SensorHealth(backoff_base=60, backoff_max=300)
+    for _ in range(10):
+        health.failed(SHT40, RuntimeError("CRC mismatch"), clock[0])
+    assert not health.available(SHT40, clock[0] + 299)
+    assert health.available(SHT40, clock[0] + 300)
+    assert health.failures(SHT40) == 10
+
+
+def test_clock_set_back(clock):
+    """
+    Disable period far in the future (the clock was set back) is not honored.
+    """
+    health = SensorHealth()
+    health.failed(SHT40, OSError(), clock[0])
+    assert health.available(SHT40, clock[0] - sensorhealth.BACKOFF_MAX)
@@ -0,0 +1,179 @@
+"""
+test the sensor profiles and the VEML7700 auto-ranging
+"""
+
+from unittest.mock import Mock
+
+import pytest
+
+import sleepmem
+from confchecks import ConfCheckException, check_tunables
+from sensorprofile import (
+    DEFAULT_RANGE,
+    RAW_HIGH,
+    RAW_LOW,
+    RAW_MAX,
+    VEML7700_RANGES,
+    AutoRanging,
+    apply_profile,
+    next_range,
+    resolution,
+)
+
+SECRETS = {
+    "log_level": "info",
+    "mqtt_topic": "devices/test",
+    "deep_sleep_duration": 60,
+}
+
+
+# pylint: disable=too-few-public-methods
+class FakeVEML7700:
+    """
+    VEML7700 with given illuminance, counting the reads.
+    """
+
+    def __init__(self, lux: float) -> None:
+        self.illuminance = lux
+        self.light_gain = None
+        self.light_integration_time = None
+        self.reads = 0
+
+    @property
+    def light(self) -> int:
+        """
+        Return the raw count for the current gain and integration time.
+        """
+        self.reads += 1
+        for index, (gain_code, _, it_code, _) in enumerate(VEML7700_RANGES):
+            if (gain_code, it_code) == (self.light_gain, self.light_integration_time):
+                return min(RAW_MAX, int(self.illuminance / resolution(index)))
+        raise ValueError("unknown range")
+
+
+@pytest.fixture(autouse=True)
+def fixture_sleepmem(monkeypatch):
+    """
+    Start with clean sleep memory, without waiting for the conversions.
+    """
+    sleepmem.reset()
+    monkeypatch.setattr("sensorprofile.time.sleep", lambda _: None)
+
+
+def test_apply_profile():
+    """
+    The profiles set the driver attributes.
+    """
+    sht40 = Mock()
+    apply_profile("sht40", sht40, "low_power")
+    assert sht40.mode == 0xE0
+
+    tmp117 = Mock()
+    apply_profile("tmp117", tmp117, "accurate")
+    assert tmp117.averaged_measurements == 0b11
+
+    veml7700 = Mock()
+    apply_profile("veml7700", veml7700, "low_power")
+    assert (veml7700.light_gain, veml7700.light_integration_time) == (0x2, 0xC)
+
+
+@pytest.mark.parametrize("index", range(len(VEML7700_RANGES)))
+@pytest.mark.parametrize("raw", [0, 1, 50, 5000, 20000, RAW_MAX])
+def test_next_range(index, raw):
+    """
+    The next range moves the count into the good range, if possible.
+    """
+    new_index = next_range(index, raw)
+    if RAW_LOW <= raw <= RAW_HIGH:
+        assert new_index == index
+    elif raw < RAW_LOW:
+        assert new_index >= index
+    else:
+        assert new_index <= index
+
+
+@pytest.mark.parametrize("lux", [0.5, 3, 80, 700])
+def test_autoranging_converges(lux):
+    """
+    The first wake takes few reads, the next one just one, as the range is persisted.
+    """
+    veml7700 = FakeVEML7700(lux)
+    assert AutoRanging(veml7700).lux == pytest.approx(lux, rel=0.2)
+    assert veml7700.reads <= 4
+    assert sleepmem.load(sleepmem.VEML7700_RANGE) > 0
+
+    veml7700 = FakeVEML7700(lux)
+    assert AutoRanging(veml7700).lux == pytest.approx(lux, rel=0.2)
+    assert veml7700.reads == 1
+
+
+def test_autoranging_bright():
+    """
+    Bright light (where the fake sensor lacks the non-linearity) ends in the least sensitive
+    ranges, without saturation.
+    """
+    veml7700 = FakeVEML7700(60000)
+    AutoRanging(veml7700).lux  # pylint: disable=expression-not-assigned
+    assert sleepmem.load(sleepmem.VEML7700_RANGE) - 1 <= 1
+
+    veml7700 = FakeVEML7700(60000)
+    AutoRanging(veml7700).lux  # pylint: disable=expression-not-assigned
+    assert veml7700.reads == 1
+
+
+def test_autoranging_memory():
+    """
+    Auto-ranging sensors with their own memory keep their own range.
+    """
+    dark: dict = {}
+    bright: dict = {}
+    _ = AutoRanging(FakeVEML7700(0.5), dark).lux
+    _ = AutoRanging(FakeVEML7700(700), bright).lux
+    assert dark[sleepmem.VEML7700_RANGE] != bright[sleepmem.VEML7700_RANGE]
+    assert sleepmem.load(sleepmem.VEML7700_RANGE) == 0
+
+    for lux, memory in [(0.5, dark), (700, bright)]:
+        veml7700 = FakeVEML7700(lux)
+        assert AutoRanging(veml7700, memory).lux == pytest.approx(lux, rel=0.2)
+        assert veml7700.reads == 1
+
+
+def test_autoranging_default():
+    """
+    Without persisted range the default one is used.
+    """
+    veml7700 = FakeVEML7700(100)
+    AutoRanging(veml7700)
+    gain_code, _, it_code, _ = VEML7700_RANGES[DEFAULT_RANGE]
+    assert (veml7700.light_gain, veml7700.light_integration_time) == (
+        gain_code,
+        it_code,
+    )
+
+
+@pytest.mark.parametrize(
+    "profiles",
+    [
+        {"sht40": "fast"},
+        {"scd4x": "low_power"},
+        {"tmp117": "auto"},
+        {"veml7700": 1},
+    ],
+)
+def test_invalid_profiles(profiles):
+    """
+    Unknown sensors and profiles are rejected.
+    """
+    with pytest.raises(ConfCheckException):
+        check_tunables(dict(SECRETS, sensor_profiles=profiles))
+
+
+def test_light_gain_with_auto():
+    """
+    Fixed light gain makes no sense with auto-ranging.
+    """
+    check_tunables(dict(SECRETS, sensor_profiles={"veml7700": "accurate"}))
+    with pytest.raises(ConfCheckException):
+        check_tunables(
+            dict(SECRETS, light_gain=1, sensor_profiles={"veml7700": "auto"})
+        )
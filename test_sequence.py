@@ -0,0 +1,133 @@
+"""
+test the sequence numbers and the loss accounting
+"""
+
+import random
+
+import pytest
+
+import sleepmem
+from sequence import (
+    SEQ_MAX,
+    NodeStats,
+    SequenceTracker,
+    next_sequence,
+    seq_distance,
+)
+
+
+# pylint: disable=too-few-public-methods
+class LossyChannel:
+    """
+    Fake channel that drops, duplicates and reorders the messages.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, loss, duplicate, reorder, period, jitter, seed=0) -> None:
+        self.random = random.Random(seed)
+        self.loss = loss
+        self.duplicate = duplicate
+        self.reorder = reorder
+        self.period = period
+        self.jitter = jitter
+
+    def transmit(self, messages: list) -> list:
+        """
+        Return list of (sequence number, arrival time) tuples in the order of arrival.
+        """
+        arrivals = []
+        for i, seq in enumerate(messages):
+            if self.random.random() < self.loss:
+                continue
+            arrival = i * self.period + self.random.uniform(0, self.jitter)
+            arrivals.append((arrival, seq))
+            if self.random.random() < self.duplicate:
+                arrivals.append((arrival + 0.1, seq))
+            if self.random.random() < self.reorder:
+                # Delay the message past the next one.
+                arrivals[-1] = (arrival + 1.5 * self.period, seq)
+        return [(seq, arrival) for arrival, seq in sorted(arrivals)]
+
+
+def test_next_sequence_wraps():
+    """
+    The sequence numbers should go from 1 to SEQ_MAX, skipping 0.
+    """
+    sleepmem.reset()
+    assert next_sequence() == 1
+    assert next_sequence() == 2
+    sleepmem.store(sleepmem.SEQUENCE, SEQ_MAX - 1)
+    assert next_sequence() == SEQ_MAX
+    assert next_sequence() == 1
+
+
+def test_seq_distance():
+    """
+    The distance should take the wrap around into account.
+    """
+    assert seq_distance(1, 2) == 1
+    assert seq_distance(2, 1) == -1
+    assert seq_distance(SEQ_MAX, 1) == 1
+    assert seq_distance(1, SEQ_MAX) == -1
+
+
+def test_perfect_channel():
+    """
+    Messages arriving in order at regular intervals, across the wrap around.
+    """
+    stats = NodeStats()
+    for i in range(100):
+        stats.receive((SEQ_MAX - 50 + i) % SEQ_MAX + 1, i * 30.0)
+    assert stats.received == stats.expected == 100
+    assert stats.loss_rate == 0
+    assert stats.duplicates == stats.reordered == stats.restarts == 0
+    assert stats.jitter == 0
+
+
+def test_lossy_channel():
+    """
+    The statistics should match what the lossy channel did.
+    """
+    channel = LossyChannel(
+        loss=0.2, duplicate=0.05, reorder=0.05, period=30.0, jitter=1.0
+    )
+    messages = [(SEQ_MAX - 500 + i) % SEQ_MAX + 1 for i in range(2000)]
+    arrivals = channel.transmit(messages)
+
+    tracker = SequenceTracker()
+    for seq, arrival in arrivals:
+        tracker.receive("node", seq, arrival)
+    stats = tracker.nodes["node"]
+
+    unique = {seq for seq, _ in arrivals}
+    assert stats.received == len(unique)
+    assert stats.duplicates == len(arrivals) - len(unique)
+    assert stats.reordered > 0
+    # The messages lost at the very start or end cannot be detected.
+    assert stats.expected <= len(messages)
+    assert stats.loss_rate == pytest.approx(0.2, abs=0.03)
+    assert 0 < stats.jitter < 1.0
+    assert "node" in tracker.report()
+
+
+def test_restart():
+    """
+    Node losing its sleep memory should be detected as restart, not as loss.
+    """
+    stats = NodeStats()
+    for seq in range(1000, 1100):
+        stats.receive(seq, float(seq))
+    for seq in range(1, 51):
+        stats.receive(seq, 2000.0 + seq)
+    assert stats.restarts == 1
+    assert stats.received == stats.expected == 150
+    assert stats.lost == 0
+
+
+def test_no_sequence_ignored():
+    """
+    Messages without sequence number should not be tracked.
+    """
+    tracker = SequenceTracker()
+    tracker.receive("node", 0, 1.0)
+    assert not tracker.nodes
@@ -0,0 +1,68 @@
+"""
+test the fleet traffic simulator
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from simulator import find_collisions, frame_airtime, frame_payload_size, simulate
+
+
+def test_payload_size():
+    """
+    The payload size should match the packed data.
+    """
+    assert frame_payload_size() == 59
+
+
+def test_frame_airtime():
+    """
+    preamble + sync word + length + header + payload + CRC at 250 kbit/s
+    """
+    assert frame_airtime(57) == pytest.approx((4 + 2 + 1 + 4 + 57 + 2) * 8 / 250000)
+    assert frame_airtime(57, encrypted=True) > frame_airtime(57)
+
+
+def test_find_collisions():
+    """
+    Only the overlapping frames should be marked.
+    """
+    starts = np.array([0.0, 1.0, 1.0005, 3.0, 5.0, 5.0001, 5.0002])
+    collided = find_collisions(starts, 0.001)
+    assert list(collided) == [False, True, True, False, True, True, True]
+
+
+def test_single_node():
+    """
+    Single node cannot collide with anything.
+    """
+    result = simulate(1, 30, 3600, seed=1)
+    assert result.sent == pytest.approx(3600 / 31, abs=2)
+    assert result.collided == 0
+    assert result.collision_rate == 0.0
+
+
+def test_synchronized_identical_nodes():
+    """
+    Nodes started at once with perfect clocks and constant awake time collide all the time.
+    """
+    result = simulate(
+        10, 30, 600, awake_jitter=0.0, drift_ppm=0.0, synchronized=True, seed=1
+    )
+    assert result.sent > 0
+    assert result.collision_rate == 1.0
+    assert result.throughput == 0.0
+
+
+def test_aloha():
+    """
+    With randomized phases the collision rate should follow the unslotted ALOHA
+    model, i.e. 1 - exp(-2G).
+    """
+    result = simulate(2000, 30, 3600, seed=42)
+    expected = 1 - math.exp(-2 * result.channel_load)
+    assert result.collision_rate == pytest.approx(expected, rel=0.1)
+    assert result.frames_per_sec == pytest.approx(result.delivered / result.duration)
+    assert result.peak_frames_per_sec >= result.frames_per_sec
@@ -8,7 +8,7 @@ import pytest
 
 # pylint: disable=unused-wildcard-import, wildcard-import
 from names import *
-from sleep import get_deep_sleep_duration
+from sleep import add_sleep_jitter, get_deep_sleep_duration
 
 
 @pytest.mark.parametrize(
@@ -42,3 +42,23 @@ def test_get_deep_sleep_duration(above: bool, is_battery: bool):
     assert (
         get_deep_sleep_duration(secrets, battery_monitor, logger) == expected_duration
     )
+
+
+def test_get_deep_sleep_duration_jitter():
+    """
+    The sleep jitter should extend the sleep duration by at most the jitter value.
+    """
+    secrets = {DEEP_SLEEP_DURATION: 42, SLEEP_JITTER: 3}
+    for _ in range(100):
+        duration = get_deep_sleep_duration(secrets, None, Mock())
+        assert 42 <= duration <= 45
+
+
+def test_add_sleep_jitter():
+    """
+    The jitter should be added to any sleep duration (e.g. the alert backstop) if configured.
+    """
+    assert add_sleep_jitter({}, 3600, Mock()) == 3600
+    durations = {add_sleep_jitter({SLEEP_JITTER: 5}, 3600, Mock()) for _ in range(20)}
+    assert all(3600 <= duration <= 3605 for duration in durations)
+    assert len(durations) > 1
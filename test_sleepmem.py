@@ -0,0 +1,60 @@
+"""
+test the sleep memory storage
+"""
+
+import sleepmem
+
+
+def get_slots():
+    """
+    Return list of all slots defined in the sleepmem module.
+    """
+    return [
+        value
+        for name, value in vars(sleepmem).items()
+        if name.isupper() and not name.startswith("_") and isinstance(value, tuple)
+    ]
+
+
+def test_slots_do_not_overlap():
+    """
+    The slots should fit into the memory and should not overlap each other.
+    """
+    # pylint: disable=protected-access
+    slots = sorted(get_slots() + [sleepmem._MAGIC_SLOT])
+    end = 0
+    for offset, fmt in slots:
+        assert offset >= end
+        end = offset + sleepmem.struct.calcsize(fmt)
+    assert end <= sleepmem.SIZE
+    assert sleepmem.SIZE <= len(sleepmem._MEMORY)
+
+
+def test_invalid_memory_reset():
+    """
+    Garbage in the memory should be zeroed on first access.
+    """
+    # pylint: disable=protected-access
+    for i in range(sleepmem.SIZE):
+        sleepmem._MEMORY[i] = 0xAA
+    for slot in get_slots():
+        assert sleepmem.load(slot) == 0
+
+
+def test_store_load():
+    """
+    Stored value should be loaded back.
+    """
+    sleepmem.reset()
+    sleepmem.store(sleepmem.CHANNEL_BUSY, 42)
+    assert sleepmem.load(sleepmem.CHANNEL_BUSY) == 42
+    assert sleepmem.load(sleepmem.CHANNEL_CHECKS) == 0
+
+
+def test_increment_wraps():
+    """
+    Counter should wrap around.
+    """
+    sleepmem.reset()
+    sleepmem.store(sleepmem.CHANNEL_BUSY, 0xFFFFFFFF)
+    assert sleepmem.increment(sleepmem.CHANNEL_BUSY) == 0
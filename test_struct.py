@@ -24,9 +24,16 @@ def test_pack_none():
     """
     expected_topic = "foo/bar"
     data = pack_data(expected_topic, None, None, None, None, None)
-    mqtt_prefix, topic_unpacked, humidity, temperature, co2_ppm, battery_level, lux = (
-        unpack_data(data)
-    )
+    (
+        mqtt_prefix,
+        topic_unpacked,
+        humidity,
+        temperature,
+        co2_ppm,
+        battery_level,
+        lux,
+        seq,
+    ) = unpack_data(data)
     assert mqtt_prefix.decode("ascii") == "MQTT:"
     mqtt_topic = topic_unpacked.decode("ascii")
     nul_idx = mqtt_topic.find("\x00")
@@ -38,6 +45,27 @@ def test_pack_none():
     assert math.isnan(humidity)
     assert math.isnan(temperature)
     assert math.isnan(lux)
+    assert seq == 0
+
+
+def test_pack_seq():
+    """
+    The sequence number should be packed at the end of the frame.
+    """
+    data = pack_data("foo/bar", 80, 1200, 33, 21, 4000, seq=65535)
+    assert len(data) <= 60
+    assert unpack_data(data)[-1] == 65535
+
+
+def test_pack_backlog():
+    """
+    Backlog record should have its own prefix and the age (clamped) instead of the sequence number.
+    """
+    data = pack_data("foo/bar", 80, 1200, 33, 21, 4000, age=100000)
+    assert len(data) <= 60
+    fields = unpack_data(data)
+    assert fields[0] == b"BKLG:"
+    assert fields[-1] == 65535
 
 
 def test_mqtt_topic_length_max():
@@ -0,0 +1,113 @@
+"""
+test the TLS setup with local TLS server
+"""
+
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+import mqtt
+from tls import TLS_PORT, create_context, tls_enabled
+
+
+def test_tls_enabled():
+    """
+    TLS is used for the TLS port unless configured otherwise.
+    """
+    assert tls_enabled(None, TLS_PORT)
+    assert not tls_enabled(None, 1883)
+    assert tls_enabled(True, 1883)
+    assert not tls_enabled(False, TLS_PORT)
+
+
+def test_plaintext_client(monkeypatch):
+    """
+    Without SSL context the MQTT client does not use TLS.
+    """
+    client = Mock()
+    monkeypatch.setattr(mqtt.MQTT, "MQTT", client)
+    mqtt.mqtt_client_setup(Mock(), "localhost", 1883, 20)
+    assert client.call_args.kwargs["is_ssl"] is False
+    assert client.call_args.kwargs["ssl_context"] is None
+
+
+@pytest.fixture(name="server")
+def fixture_server(tmp_path):
+    """
+    Local TLS server with self-signed certificate, sending single byte to each client.
+    Return the port and the certificate.
+    """
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl not available")
+    cert = tmp_path / "cert.pem"
+    key = tmp_path / "key.pem"
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "ec",
+            "-pkeyopt",
+            "ec_paramgen_curve:prime256v1",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=localhost",
+            "-addext",
+            "subjectAltName=DNS:localhost",
+            "-keyout",
+            str(key),
+            "-out",
+            str(cert),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+
+    listener = socket.create_server(("localhost", 0))
+    port = listener.getsockname()[1]
+
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            try:
+                with context.wrap_socket(conn, server_side=True) as tls_conn:
+                    tls_conn.sendall(b"x")
+                    tls_conn.recv(1)
+            except OSError:
+                pass
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield port, cert.read_text(encoding="ascii")
+    listener.close()
+
+
+def _connect(context, port: int) -> None:
+    with socket.create_connection(("localhost", port)) as sock:
+        with context.wrap_socket(sock, server_hostname="localhost") as tls_sock:
+            assert tls_sock.recv(1) == b"x"
+
+
+def test_session_resumption(server):
+    """
+    Reconnect with the same context resumes the session.
+    """
+    port, cadata = server
+    context = create_context(cadata)
+    _connect(context, port)
+    assert not context.resumed
+    _connect(context, port)
+    assert context.resumed
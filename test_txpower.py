@@ -0,0 +1,126 @@
+"""
+test the transmit power control
+"""
+
+import random
+from unittest.mock import Mock
+
+import sleepmem
+from txpower import (
+    HIGH_POWER_RANGE,
+    LOW_POWER_RANGE,
+    PowerControl,
+    power_range,
+    send_with_power_control,
+)
+
+GATEWAY_TX_POWER = 20
+SENSITIVITY = -90
+TARGET_RSSI = -80
+
+
+# pylint: disable=too-few-public-methods
+class FadingLink:
+    """
+    Symmetric link with log-distance path loss and Gaussian (log-normal) fading.
+    The frame (and the ACK) is received if its RSSI is above the receiver sensitivity.
+    """
+
+    def __init__(self, path_loss: float, fading: float, seed: int = 0) -> None:
+        self.path_loss = path_loss
+        self.fading = fading
+        self.random = random.Random(seed)
+
+    def rssi(self, tx_power: float) -> float:
+        """
+        Return the RSSI of single transmission with given power.
+        """
+        return tx_power - self.path_loss + self.random.gauss(0, self.fading)
+
+
+# pylint: disable=too-few-public-methods
+class FakeRFM69:
+    """
+    Fake radio sending over the fading link to gateway that sends ACKs.
+    """
+
+    def __init__(self, link: FadingLink) -> None:
+        self.link = link
+        self.high_power = True
+        self.tx_power = 20
+        self.last_rssi = 0.0
+        self.delivered = 0
+
+    def send_with_ack(self, _data) -> bool:
+        """
+        Return True if both the frame and the ACK got through.
+        """
+        if self.link.rssi(self.tx_power) < SENSITIVITY:
+            return False
+        self.delivered += 1
+        self.last_rssi = self.link.rssi(GATEWAY_TX_POWER)
+        return self.last_rssi >= SENSITIVITY
+
+
+def _run(rfm69, control, count: int) -> list:
+    levels = []
+    for _ in range(count):
+        send_with_power_control(rfm69, b"data", control)
+        levels.append(rfm69.tx_power)
+    return levels
+
+
+def test_power_range():
+    """
+    The range should depend on the radio kind and be capped by the configured power.
+    """
+    assert power_range(Mock(high_power=True)) == HIGH_POWER_RANGE
+    assert power_range(Mock(high_power=False)) == LOW_POWER_RANGE
+    assert power_range(Mock(high_power=True), 10) == (-2, 10)
+
+
+def test_converges_down():
+    """
+    Short link should settle at low power while keeping the delivery ratio high.
+    """
+    sleepmem.reset()
+    rfm69 = FakeRFM69(FadingLink(path_loss=90, fading=2))
+    control = PowerControl(*HIGH_POWER_RANGE, TARGET_RSSI, GATEWAY_TX_POWER)
+
+    levels = _run(rfm69, control, 500)
+
+    assert levels[0] == 20
+    settled = levels[100:]
+    # RSSI at the gateway around the target requires 10 dBm.
+    assert 8 <= sum(settled) / len(settled) <= 16
+    assert rfm69.delivered / len(levels) > 0.99
+
+
+def test_steps_up_on_worse_link():
+    """
+    When the path loss increases (e.g. obstacle), the power should go up again.
+    """
+    sleepmem.reset()
+    link = FadingLink(path_loss=80, fading=2)
+    rfm69 = FakeRFM69(link)
+    control = PowerControl(*HIGH_POWER_RANGE, TARGET_RSSI, GATEWAY_TX_POWER)
+
+    levels = _run(rfm69, control, 200)
+    assert max(levels[-50:]) <= 6
+
+    link.path_loss = 95
+    levels = _run(rfm69, control, 200)
+    assert sum(levels[-50:]) / 50 > 12
+
+
+def test_missed_ack():
+    """
+    Missed ACK should raise the power, up to the maximum.
+    """
+    sleepmem.reset()
+    control = PowerControl(-2, 20, TARGET_RSSI)
+    sleepmem.store(sleepmem.TX_POWER_LEVEL, 128 + 5)
+    assert control.level() == 5
+    assert control.update(False) == 8
+    sleepmem.store(sleepmem.TX_POWER_LEVEL, 128 + 19)
+    assert control.update(False) == 20
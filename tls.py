@@ -0,0 +1,166 @@
+"""
+TLS for the MQTT connection.
+
+The ssl module is imported and the context (which takes considerable amount of heap)
+created only if TLS is actually used, i.e. when enabled in the configuration
+or when connecting to the TLS port of the broker.
+
+Where the ssl module supports TLS sessions (CPython, e.g. under Blinka), the session
+of the previous connection is offered when reconnecting, so that the broker can resume it
+with abbreviated handshake. The ssl module of CircuitPython does not expose the sessions
+so there every connection (and hence every wake) pays the full handshake.
+
+To measure the handshake time and heap use with and without the resumption, run:
+
+  python3 tls.py broker 8883 [CA file]
+"""
+
+import sys
+import time
+
+TLS_PORT = 8883
+
+
+def tls_enabled(tls: bool | None, port: int) -> bool:
+    """
+    Return True if TLS should be used, based on the configuration or the port.
+    """
+    if tls is None:
+        return port == TLS_PORT
+    return tls
+
+
+class _SessionSocket:
+    """
+    Proxy of SSL socket that saves its session into the context before being closed,
+    as the session is no longer available afterwards.
+    """
+
+    def __init__(self, sock, context) -> None:
+        self._sock = sock
+        self._context = context
+
+    def close(self) -> None:
+        """
+        Save the session and close the socket.
+        """
+        session = getattr(self._sock, "session", None)
+        if session is not None:
+            self._context.session = session
+            self._context.resumed = self._sock.session_reused
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __getattr__(self, name: str):
+        return getattr(self._sock, name)
+
+
+class ResumingContext:
+    """
+    SSL context wrapper that offers the session of the last closed socket
+    when wrapping new one. The resumed attribute tells whether the session
+    of the last closed socket was resumed.
+    """
+
+    def __init__(self, context) -> None:
+        self.context = context
+        self.session = None
+        self.resumed = False
+
+    def wrap_socket(self, sock, server_hostname=None, **kwargs):
+        """
+        Wrap the socket, possibly with the session of the last socket.
+        """
+        if self.session is not None:
+            kwargs["session"] = self.session
+        tls_sock = self.context.wrap_socket(
+            sock, server_hostname=server_hostname, **kwargs
+        )
+        if not hasattr(tls_sock, "session"):
+            # No support for the sessions.
+            return tls_sock
+        return _SessionSocket(tls_sock, self)
+
+    def __getattr__(self, name: str):
+        return getattr(self.context, name)
+
+
+def create_context(cadata: str | None = None):
+    """
+    Create SSL context, verifying the broker certificate with given CA certificate
+    (in PEM format) or the default CA certificates.
+    """
+    # pylint: disable=import-outside-toplevel
+    import ssl
+
+    context = ssl.create_default_context()
+    if cadata:
+        context.load_verify_locations(cadata=cadata)
+    return ResumingContext(context)
+
+
+def _handshake(context, host: str, port: int) -> float:
+    """
+    Connect to given TLS server, return the time in seconds it took.
+    """
+    # pylint: disable=import-outside-toplevel
+    import socket
+
+    start = time.monotonic()
+    with socket.create_connection((host, port)) as sock:
+        with context.wrap_socket(sock, server_hostname=host) as tls_sock:
+            # With TLS 1.3 the session ticket arrives after the handshake.
+            tls_sock.settimeout(0.5)
+            try:
+                tls_sock.recv(1)
+            except OSError:
+                pass
+            return time.monotonic() - start
+
+
+def main():
+    """
+    Measure the handshake time and heap use with and without session resumption.
+    """
+    # pylint: disable=import-outside-toplevel
+    import tracemalloc
+
+    if len(sys.argv) < 3:
+        print(f"usage: {sys.argv[0]} host port [CA file]")
+        sys.exit(1)
+    host, port = sys.argv[1], int(sys.argv[2])
+    cadata = None
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], encoding="ascii") as cafile:
+            cadata = cafile.read()
+    count = 10
+
+    tracemalloc.start()
+    context = create_context(cadata)
+    print(f"Context creation: {tracemalloc.get_traced_memory()[1]} bytes of heap")
+
+    for resume in (False, True):
+        times = []
+        tracemalloc.reset_peak()
+        if resume:
+            # The first connection establishes the session.
+            _handshake(context, host, port)
+        for _ in range(count):
+            if not resume:
+                context = create_context(cadata)
+            times.append(_handshake(context, host, port))
+        print(
+            f"{'With' if resume else 'Without'} resumption: "
+            f"mean handshake {sum(times) / count * 1000:.1f} ms, "
+            f"peak heap {tracemalloc.get_traced_memory()[1]} bytes, "
+            f"last resumed: {context.resumed}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,25 @@
 """
-RFM69 or WiFi setup
+RFM69, ESP-NOW, BLE or WiFi setup
 """
 
+import gc
+
 import adafruit_logging as logging
 import board
 import busio
 import digitalio
 
+from bthome import BleAdvertiser
+from deadline import Deadline
+from espnow_link import EspNowLink, parse_mac
+from modem import PROFILES, apply_profile
+from mqtt import CONNECT_RETRIES
+
 # pylint: disable=unused-wildcard-import, wildcard-import
 from names import *
+from tls import create_context, tls_enabled
+
+WIFI_TIMEOUT = 10
 
 
 def wifi_tunables_ready(secrets: dict) -> bool:
@@ -32,11 +43,162 @@ def wifi_tunables_ready(secrets: dict) -> bool:
     return True
 
 
-# pylint: disable=too-many-locals,too-many-statements
-def setup_transport(secrets: dict):
+def connect_wifi(secrets: dict, timeout: int = WIFI_TIMEOUT) -> None:
+    """
+    Connect to Wi-Fi unless already connected.
+    """
+    logger = logging.getLogger("")
+
+    # pylint: disable=import-error,import-outside-toplevel
+    import wifi
+
+    if wifi.radio.connected:
+        return
+
+    logger.info(f"Connecting to wifi with timeout {timeout} seconds")
+    wifi.radio.connect(secrets[SSID], secrets[PASSWORD], timeout=timeout)
+    logger.info(f"Connected to {secrets[SSID]}")
+    logger.debug(f"IP: {wifi.radio.ipv4_address}")
+
+
+def setup_ssl_context(secrets: dict, broker_port: int):
+    """
+    Create the SSL context only if TLS is to be used as it takes lots of heap.
+    Return the context or None.
+    """
+    if not tls_enabled(secrets.get(BROKER_TLS), broker_port):
+        return None
+
+    # gc.mem_free() is specific to CircuitPython.
+    mem_free = getattr(gc, "mem_free", lambda: 0)
+    heap_before = mem_free()
+    ssl_context = create_context(secrets.get(BROKER_CA))
+    logging.getLogger("").debug(
+        f"SSL context takes {heap_before - mem_free()} bytes of heap"
+    )
+    return ssl_context
+
+
+def setup_mqtt(
+    secrets: dict,
+    deadline: Deadline | None = None,
+    connect_retries: int = CONNECT_RETRIES,
+):
+    """
+    Connect to Wi-Fi and MQTT broker. Return the MQTT client object.
+    """
+    logger = logging.getLogger("")
+
+    # pylint: disable=import-error,import-outside-toplevel
+    import wifi
+
+    logger.debug(f"MAC address: {wifi.radio.mac_address}")
+
+    wifi_timeout = WIFI_TIMEOUT
+    if deadline:
+        wifi_timeout = max(1, int(deadline.budget(wifi_timeout)))
+    connect_wifi(secrets, wifi_timeout)
+
+    import socketpool
+
+    # Create a socket pool
+    pool = socketpool.SocketPool(wifi.radio)  # pylint: disable=no-member
+
+    # pylint: disable=import-outside-toplevel
+    from mqtt import mqtt_client_setup
+    from mqtt_handler import MQTTHandler
+
+    broker_addr = secrets[BROKER]
+    broker_port = secrets.get(BROKER_PORT)
+    if broker_port is None:
+        broker_port = 1883
+        logger.info(
+            f"Broker port not set in secrets, using default value of {broker_port}"
+        )
+    mqtt_client = mqtt_client_setup(
+        pool,
+        broker_addr,
+        broker_port,
+        logger.getEffectiveLevel(),
+        connect_retries=connect_retries,
+        ssl_context=setup_ssl_context(secrets, broker_port),
+    )
+    try:
+        log_topic = secrets[LOG_TOPIC]
+        # Log both to the console and via MQTT messages.
+        # Up to now the logger was using the default (built-in) handler,
+        # now it is necessary to add the Stream handler explicitly as
+        # with a non-default handler set only the non-default handlers will be used.
+        if not logger.hasHandlers():
+            logger.addHandler(logging.StreamHandler())
+        logger.addHandler(MQTTHandler(mqtt_client, log_topic, deadline))
+    except KeyError:
+        pass
+
+    logger.info(f"Attempting to connect to MQTT broker {broker_addr}:{broker_port}")
+    mqtt_client.connect()
+
+    return mqtt_client
+
+
+def setup_espnow(secrets: dict) -> EspNowLink | None:
+    """
+    Set up ESP-NOW link to the bridge if configured. Return the link or None.
+    """
+    logger = logging.getLogger("")
+
+    peer = secrets.get(ESPNOW_PEER)
+    if peer is None:
+        return None
+
+    logger.info(f"Setting up ESP-NOW link to {peer}")
+    try:
+        return EspNowLink(
+            parse_mac(peer),
+            channel=secrets.get(ESPNOW_CHANNEL, 0),
+            ack_timeout=secrets.get(ESPNOW_ACK_TIMEOUT),
+        )
+    except Exception as espnow_exc:  # pylint: disable=broad-exception-caught
+        logger.info(f"ESP-NOW failed to initialize: {espnow_exc}")
+        return None
+
+
+def setup_ble(secrets: dict) -> BleAdvertiser | None:
+    """
+    Set up BLE advertising if configured. Return the advertiser or None.
+    """
+    logger = logging.getLogger("")
+
+    duration = secrets.get(BLE_ADVERTISE_DURATION)
+    if duration is None:
+        return None
+
+    logger.info(f"Setting up BLE advertising for {duration} seconds")
+    try:
+        return BleAdvertiser(duration)
+    except Exception as ble_exc:  # pylint: disable=broad-exception-caught
+        logger.info(f"BLE failed to initialize: {ble_exc}")
+        return None
+
+
+# pylint: disable=too-many-locals
+def setup_transport(
+    secrets: dict,
+    deadline: Deadline | None = None,
+    with_mqtt: bool = False,
+    connect_retries: int = CONNECT_RETRIES,
+):
     """
     Setup transport to send data.
-    Return a tuple of RFM69 object and MQTT client object, either can be None.
+    If with_mqtt is True (relay mode), connect to MQTT broker even if RFM69 is present.
+    The connect_retries is the number of MQTT connect attempts (with backoff) the client
+    makes, both initially and on reconnect.
+    If the deadline is set, the Wi-Fi connect timeout is limited by the time budget
+    and the log messages are not published via MQTT if the time budget is tight.
+    If RFM69 is not present, ESP-NOW link to the bridge is used if configured,
+    then BLE advertising if configured, otherwise Wi-Fi.
+    Return a tuple of MQTT client object, RFM69 object, ESP-NOW link and BLE advertiser,
+    any can be None.
     """
     logger = logging.getLogger("")
 
@@ -65,66 +227,47 @@ def setup_transport(secrets: dict):
             spi, cs, reset, 433
         )  # hard-coded frequency for Europe
 
+        profile = secrets.get(MODEM_PROFILE)
+        if profile:
+            logger.info(f"Using modem profile {profile}")
+            apply_profile(rfm69, PROFILES[profile])
+
         tx_power = secrets.get(TX_POWER)
         if rfm69.high_power and tx_power is not None:
             logger.debug(f"Setting TX power to {tx_power}")
             rfm69.tx_power = tx_power
 
+        node = secrets.get(RFM69_NODE)
+        if node is not None:
+            logger.debug(f"Setting RFM69 node address to {node}")
+            rfm69.node = node
+
+        gateway = secrets.get(GATEWAY_NODE)
+        if gateway is not None:
+            logger.debug(f"Setting RFM69 destination to {gateway}")
+            rfm69.destination = gateway
+
         encryption_key = secrets.get(ENCRYPTION_KEY)
         if encryption_key:
             logger.info("Setting encryption key")
             rfm69.encryption_key = encryption_key
     except Exception as rfm69_exc:  # pylint: disable=broad-exception-caught
         logger.info(f"RFM69 failed to initialize: {rfm69_exc}")
+        rfm69 = None
 
-        if not wifi_tunables_ready(secrets):
-            return None, None
-
-        logger.info("will attempt to connect to Wi-Fi")
-
-        # pylint: disable=import-outside-toplevel
-        import wifi
-
-        logger.debug(f"MAC address: {wifi.radio.mac_address}")
+    espnow_link = None
+    if rfm69 is None:
+        espnow_link = setup_espnow(secrets)
 
-        # Connect to Wi-Fi
-        logger.info("Connecting to wifi")
-        wifi.radio.connect(secrets[SSID], secrets[PASSWORD], timeout=10)
-        logger.info(f"Connected to {secrets['ssid']}")
-        logger.debug(f"IP: {wifi.radio.ipv4_address}")
+    advertiser = None
+    if rfm69 is None and espnow_link is None:
+        advertiser = setup_ble(secrets)
 
-        # pylint: disable=import-error,import-outside-toplevel
-        import socketpool
-
-        # Create a socket pool
-        pool = socketpool.SocketPool(wifi.radio)  # pylint: disable=no-member
-
-        # pylint: disable=import-outside-toplevel
-        from mqtt import mqtt_client_setup
-        from mqtt_handler import MQTTHandler
-
-        broker_addr = secrets[BROKER]
-        broker_port = secrets.get(BROKER_PORT)
-        if broker_port is None:
-            broker_port = 1883
-            logger.info(
-                f"Broker port not set in secrets, using default value of {broker_port}"
-            )
-        mqtt_client = mqtt_client_setup(
-            pool, broker_addr, broker_port, logger.getEffectiveLevel()
-        )
-        try:
-            log_topic = secrets[LOG_TOPIC]
-            # Log both to the console and via MQTT messages.
-            # Up to now the logger was using the default (built-in) handler,
-            # now it is necessary to add the Stream handler explicitly as
-            # with a non-default handler set only the non-default handlers will be used.
-            logger.addHandler(logging.StreamHandler())
-            logger.addHandler(MQTTHandler(mqtt_client, log_topic))
-        except KeyError:
-            pass
+    if (rfm69 is None and espnow_link is None and advertiser is None) or with_mqtt:
+        if not wifi_tunables_ready(secrets):
+            return None, rfm69, espnow_link, advertiser
 
-        logger.info(f"Attempting to connect to MQTT broker {broker_addr}:{broker_port}")
-        mqtt_client.connect()
+        logger.info("will attempt to connect to Wi-Fi")
+        mqtt_client = setup_mqtt(secrets, deadline, connect_retries)
 
-    return mqtt_client, rfm69
+    return mqtt_client, rfm69, espnow_link, advertiser
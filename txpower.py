@@ -0,0 +1,136 @@
+"""
+Closed loop control of the RFM69 transmit power.
+
+The frames are sent with ACK (RadioHead reliable datagram) to the gateway.
+The RSSI of the ACK received from the gateway tells the path loss and assuming symmetric link
+and known gateway transmit power, also the RSSI of the frame at the gateway.
+The transmit power is stepped down while the estimated RSSI at the gateway
+stays above the target with some margin, and stepped up if it falls below the target
+or the ACK is missed. The chosen level is kept in sleep memory.
+"""
+
+import math
+
+import adafruit_logging as logging
+
+import sleepmem
+
+# Transmit power ranges in dBm, see the tx_power property of adafruit_rfm69.
+HIGH_POWER_RANGE = (-2, 20)
+LOW_POWER_RANGE = (-18, 13)
+
+DEFAULT_GATEWAY_TX_POWER = 20
+# The estimated RSSI at the gateway has to be at least this many dB above the target
+# to step the power down, so that the level does not oscillate.
+HYSTERESIS = 3
+STEP_DOWN = 1
+STEP_UP = 3
+ACK_RETRIES = 2
+
+# The level is stored with offset so that zeroed sleep memory means no level.
+_LEVEL_OFFSET = 128
+
+
+def power_range(rfm69, max_power: int | None = None) -> tuple:
+    """
+    Return the (minimum, maximum) transmit power of the radio in dBm,
+    possibly with the maximum capped.
+    """
+    min_power, range_max = HIGH_POWER_RANGE if rfm69.high_power else LOW_POWER_RANGE
+    if max_power is not None:
+        range_max = max(min_power, min(range_max, max_power))
+    return min_power, range_max
+
+
+class PowerControl:
+    """
+    Chooses the transmit power based on the outcome of the previous transmission.
+    """
+
+    def __init__(
+        self,
+        min_power: int,
+        max_power: int,
+        target_rssi: int,
+        gateway_tx_power: int = DEFAULT_GATEWAY_TX_POWER,
+    ) -> None:
+        """
+        :param target_rssi: the RSSI (in dBm) the frames should have at the gateway
+        :param gateway_tx_power: transmit power of the gateway (in dBm), used for the ACKs
+        """
+        self.min_power = min_power
+        self.max_power = max_power
+        self.target_rssi = target_rssi
+        self.gateway_tx_power = gateway_tx_power
+
+    def level(self) -> int:
+        """
+        Return the transmit power to use. Start with the maximum power.
+        """
+        stored = sleepmem.load(sleepmem.TX_POWER_LEVEL)
+        if stored == 0:
+            return self.max_power
+        return max(self.min_power, min(self.max_power, stored - _LEVEL_OFFSET))
+
+    def _store(self, level: int) -> None:
+        sleepmem.store(sleepmem.TX_POWER_LEVEL, level + _LEVEL_OFFSET)
+
+    def update(self, acked: bool, ack_rssi: float | None = None) -> int:
+        """
+        Adjust the level given the outcome of the transmission with the current level
+        and return the new level.
+        """
+        logger = logging.getLogger("")
+
+        level = self.level()
+        if not acked or ack_rssi is None:
+            new_level = min(self.max_power, level + STEP_UP)
+            logger.info(f"ACK missed, raising TX power to {new_level} dBm")
+        else:
+            # Assuming symmetric link, the path loss is the same both ways.
+            rssi = ack_rssi - self.gateway_tx_power + level
+            margin = rssi - self.target_rssi
+            logger.debug(
+                f"Estimated RSSI at the gateway {rssi} dBm, margin {margin} dB"
+            )
+            if margin < 0:
+                new_level = min(
+                    self.max_power, level + max(STEP_UP, math.ceil(-margin))
+                )
+            elif margin >= HYSTERESIS:
+                new_level = max(self.min_power, level - STEP_DOWN)
+            else:
+                new_level = level
+            if new_level != level:
+                logger.info(f"Changing TX power from {level} to {new_level} dBm")
+
+        self._store(new_level)
+        return new_level
+
+
+def send_with_power_control(
+    rfm69, data: bytes, control: PowerControl, on_transmit=None
+) -> bool:
+    """
+    Send the data with ACK using the transmit power chosen by the control
+    and update the control with the outcome. Return True if the ACK was received.
+    The on_transmit function (if set) is called for each transmission of the frame,
+    i.e. including the retries done by send_with_ack().
+    """
+    rfm69.tx_power = control.level()
+    if on_transmit is None:
+        acked = rfm69.send_with_ack(data)
+    else:
+        send = rfm69.send
+
+        def counting_send(*args, **kwargs):
+            on_transmit()
+            return send(*args, **kwargs)
+
+        rfm69.send = counting_send
+        try:
+            acked = rfm69.send_with_ack(data)
+        finally:
+            rfm69.send = send
+    control.update(acked, rfm69.last_rssi if acked else None)
+    return acked